@@ -8,6 +8,11 @@ import os
 import sys
 from datetime import UTC, datetime
 
+try:
+    import orjson
+except ImportError:  # Optional: stdlib json is the fallback
+    orjson = None
+
 
 def _get_trace_context() -> tuple[str | None, str | None]:
     """Import trace module lazily to avoid circular imports."""
@@ -70,6 +75,16 @@ _EXCLUDED_KEYS = {
 }
 
 
+def _dumps(data: dict) -> str:
+    """Serialize one log line with orjson when installed, else stdlib json; both emit unescaped UTF-8."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:  # Integers past 64 bits, which stdlib json still handles
+            pass
+    return json.dumps(data, default=str, ensure_ascii=False)
+
+
 class JSONFormatter(logging.Formatter):
     """JSON log formatter for production environments."""
 
@@ -93,7 +108,7 @@ class JSONFormatter(logging.Formatter):
         for key in set(record.__dict__.keys()) - _EXCLUDED_KEYS:
             log_data[key] = record.__dict__[key]
 
-        return json.dumps(log_data, default=str, ensure_ascii=False)
+        return _dumps(log_data)
 
 
 class ColoredFormatter(logging.Formatter):
@@ -12,6 +12,11 @@ from dotenv import load_dotenv
 from grpc_health.v1 import health_pb2_grpc
 from PIL import Image
 
+try:
+    import uvloop
+except ImportError:  # Optional, and not available on Windows: the stock asyncio loop is the fallback
+    uvloop = None
+
 load_dotenv()
 
 import app.pb.cognition_pb2 as pb
@@ -31,12 +36,19 @@ from app.core import (
     set_trace_context,
     span,
 )
-from app.services.audio import DiarizationService, SpeakerDetectionService, TranscriptionService, VADService
-from app.services.constants import DIARIZATION_MIN_SPEAKERS, SAMPLES_PER_SECOND
+from app.services.audio import (
+    DiarizationService,
+    SpeakerDetectionService,
+    StreamingTranscriber,
+    TimedWord,
+    TranscriptionService,
+    VADService,
+)
+from app.services.constants import DIARIZATION_MIN_SPEAKERS, SAMPLES_PER_SECOND, STREAM_CHUNK_SECONDS
 from app.services.health import create_health_servicer
 from app.services.llm import LLMService
 from app.services.memory import MemoryService
-from app.services.ocr import OCRService
+from app.services.ocr import OCRService, decode_image
 
 logger = get_logger(__name__)
 
@@ -57,6 +69,16 @@ def is_question(text: str, min_length: int) -> bool:
     return text.endswith("?") or bool(QUESTION_STARTERS.match(text))
 
 
+def _transcript_segment(words: list[TimedWord], device_id: str, is_final: bool) -> pb.TranscriptSegment:
+    return pb.TranscriptSegment(
+        text="".join(w.text for w in words).strip(),
+        device_id=device_id,
+        start_ns=int(words[0].start * 1e9),
+        end_ns=int(words[-1].end * 1e9),
+        is_final=is_final,
+    )
+
+
 class TranscriptionServicer(pb_grpc.TranscriptionServiceServicer):
     def __init__(self, auth_token: str | None = None):
         self.service = TranscriptionService(model_size=get_config().audio.whisper_model)
@@ -81,35 +103,34 @@ class TranscriptionServicer(pb_grpc.TranscriptionServiceServicer):
     def Transcribe(self, request: pb.TranscribeRequest, context) -> pb.TranscribeResponse:
         ctx = TraceContext.from_grpc_context(context)
         set_trace_context(ctx)
-        with span("transcribe", audio_len=len(request.audio_data)):
-            audio = np.frombuffer(request.audio_data, dtype=np.float32)
+        # Read the payload once: every bytes-field access copies it, frombuffer then views that copy
+        audio = np.frombuffer(request.audio_data, dtype=np.float32)
+        with span("transcribe", audio_len=audio.nbytes):
             text, confidence = self.service.transcribe(audio, request.language or None)
             duration_ms = int(len(audio) / (SAMPLES_PER_SECOND / 1000))
             return pb.TranscribeResponse(text=text, confidence=confidence, duration_ms=duration_ms)
 
     def StreamTranscribe(self, request_iterator, _context):
-        """Stream transcription - accumulates chunks and transcribes on silence."""
-        buffer = []
+        """Stream transcription: re-decode a rolling buffer every second and emit words once two passes agree."""
+        stream = StreamingTranscriber(self.service)
+        step = int(STREAM_CHUNK_SECONDS * SAMPLES_PER_SECOND)
+        fresh, device_id = 0, ""
         for chunk in request_iterator:
             audio = np.frombuffer(chunk.data, dtype=np.float32)
-            buffer.extend(audio.tolist())
-
-            # Yield partial results when buffer is large enough (1 second of audio)
-            if len(buffer) >= SAMPLES_PER_SECOND:
-                text, _ = self.service.transcribe(np.array(buffer))
-                if text:
-                    yield pb.TranscriptSegment(
-                        text=text,
-                        device_id=chunk.device_id,
-                        is_final=False,
-                    )
-                buffer = []
+            stream.insert(audio)
+            fresh, device_id = fresh + audio.size, chunk.device_id
+            if fresh >= step:
+                fresh = 0
+                if words := stream.process():
+                    yield _transcript_segment(words, device_id, is_final=False)
+        if words := stream.finish():
+            yield _transcript_segment(words, device_id, is_final=True)
 
     def Diarize(self, request: pb.DiarizeRequest, context) -> pb.DiarizeResponse:
         ctx = TraceContext.from_grpc_context(context)
         set_trace_context(ctx)
-        with span("diarize", audio_len=len(request.audio_data)):
-            audio = np.frombuffer(request.audio_data, dtype=np.float32)
+        audio = np.frombuffer(request.audio_data, dtype=np.float32)
+        with span("diarize", audio_len=audio.nbytes):
             sample_rate = request.sample_rate or SAMPLES_PER_SECOND
             min_speakers = request.min_speakers or DIARIZATION_MIN_SPEAKERS
             max_speakers = request.max_speakers if request.max_speakers > 0 else None
@@ -121,8 +142,8 @@ class TranscriptionServicer(pb_grpc.TranscriptionServiceServicer):
     def DetectSpeaker(self, request: pb.DetectSpeakerRequest, context) -> pb.DetectSpeakerResponse:
         ctx = TraceContext.from_grpc_context(context)
         set_trace_context(ctx)
-        with span("detect_speaker", audio_len=len(request.audio_data), source=request.source):
-            audio = np.frombuffer(request.audio_data, dtype=np.float32)
+        audio = np.frombuffer(request.audio_data, dtype=np.float32)
+        with span("detect_speaker", audio_len=audio.nbytes, source=request.source):
             sample_rate = request.sample_rate or SAMPLES_PER_SECOND
             source = request.source or "system"
             speaker_id = self.speaker_detection.detect_speaker(audio, sample_rate, source)
@@ -156,9 +177,11 @@ class OCRServicer(pb_grpc.OCRServiceServicer):
     def ExtractText(self, request: pb.OCRRequest, context) -> pb.OCRResponse:
         ctx = TraceContext.from_grpc_context(context)
         set_trace_context(ctx)
-        with span("ocr_extract", image_size=len(request.image_data)):
-            image = Image.open(io.BytesIO(request.image_data))
-            text = self.service.extract_text(image)
+        # Read the payload once (see TranscriptionServicer.Transcribe)
+        image_data = request.image_data
+        with span("ocr_extract", image_size=len(image_data)):
+            # Encoded frame -> BGR array in one decode; OCR never touches PIL on this path
+            text = self.service.extract_text(decode_image(image_data))
 
         # Parse bounding boxes from OCR output format: [x1, y1, x2, y2] text
         boxes = []
@@ -222,8 +245,8 @@ class LLMServicer(pb_grpc.LLMServiceServicer):
 
         # Parse image if provided
         image = None
-        if request.image_data:
-            image = Image.open(io.BytesIO(request.image_data))
+        if image_data := request.image_data:
+            image = Image.open(io.BytesIO(image_data))
 
         async for chunk in service.analyze(context_text, request.user_query, image):
             yield pb.AnalyzeChunk(content=chunk, is_final=False)
@@ -252,7 +275,8 @@ class MemoryServicer(pb_grpc.MemoryServiceServicer):
         ctx = TraceContext.from_grpc_context(context)
         set_trace_context(ctx)
         metadata = dict(request.metadata) if request.metadata else None
-        doc_id = self.service.add_memory(request.text, request.source, metadata)
+        # Write through so success means the memory is stored, not merely buffered
+        doc_id = self.service.add_memory(request.text, request.source, metadata, buffered=False)
         return pb.StoreResponse(id=doc_id or "", success=doc_id is not None)
 
     def BatchStore(self, request: pb.BatchStoreRequest, context) -> pb.BatchStoreResponse:
@@ -288,13 +312,15 @@ async def warmup_models(
         await asyncio.sleep(delay)
         logger.info("starting_model_warmup")
 
-        # Trigger lazy loading by accessing properties
+        # Load each model and run one dummy inference so first requests skip load and kernel setup
         # Run in thread pool to avoid blocking the event loop during load
         loop = asyncio.get_running_loop()
 
-        await loop.run_in_executor(None, lambda: getattr(transcription.service, "model"))
-        await loop.run_in_executor(None, lambda: getattr(vad.service, "model"))
-        await loop.run_in_executor(None, lambda: getattr(ocr.service, "engine"))
+        await asyncio.gather(
+            loop.run_in_executor(None, transcription.service.warmup),
+            loop.run_in_executor(None, vad.service.warmup),
+            loop.run_in_executor(None, ocr.service.warmup),
+        )
 
         # Warm up diarization (pyannote)
         await loop.run_in_executor(None, lambda: getattr(transcription.diarization, "pipeline"))
@@ -375,11 +401,13 @@ async def serve(port: int | None = None):
 
     logger.info("graceful_shutdown_initiated", grace_period=cfg.inference.grpc_shutdown_grace_period)
     await server.stop(grace=cfg.inference.grpc_shutdown_grace_period)
+    memory_service.close()
     logger.info("grpc_server_stopped")
 
 
 def main():
-    asyncio.run(serve())
+    with asyncio.Runner(loop_factory=uvloop.new_event_loop if uvloop else None) as runner:
+        runner.run(serve())
 
 
 if __name__ == "__main__":
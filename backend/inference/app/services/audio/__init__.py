@@ -1,7 +1,8 @@
-"""Audio services: transcription, voice activity detection, and speaker diarization."""
+"""Audio services: transcription (batch and streaming), voice activity detection, and speaker diarization."""
 
 from app.services.audio.diarization import DiarizationService, SpeakerSegment
 from app.services.audio.speaker_detection import SpeakerDetectionService, SpeakerProfile
+from app.services.audio.streaming import StreamingTranscriber, TimedWord
 from app.services.audio.transcription import TranscriptionService
 from app.services.audio.vad import VADService
 
@@ -10,6 +11,8 @@ __all__ = [
     "SpeakerSegment",
     "SpeakerDetectionService",
     "SpeakerProfile",
+    "StreamingTranscriber",
+    "TimedWord",
     "TranscriptionService",
     "VADService",
 ]
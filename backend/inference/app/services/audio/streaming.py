@@ -0,0 +1,141 @@
+"""Incremental Whisper transcription with a LocalAgreement-2 commit policy.
+
+Every pass re-decodes a rolling audio buffer; a word is only committed once two consecutive
+passes agree on it, so text is emitted while the speaker is still talking without flickering.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+import app.pb.cognition_pb2 as pb
+from app.core import TranscriptionError, get_logger
+from app.services.audio.transcription import TranscriptionService
+from app.services.constants import (
+    SAMPLES_PER_SECOND,
+    STREAM_BUFFER_TRIM_SECONDS,
+    STREAM_PROMPT_WORDS,
+    WHISPER_BEAM_SIZE,
+)
+
+logger = get_logger(__name__)
+
+# Re-decoded words may drift this far (seconds) around the last committed boundary
+_BOUNDARY_TOLERANCE = 0.1
+# Longest committed tail checked for words a pass repeats across the boundary
+_MAX_OVERLAP_NGRAM = 5
+
+
+@dataclass(frozen=True, slots=True)
+class TimedWord:
+    """Word with start/end in seconds from the start of the stream."""
+
+    start: float
+    end: float
+    text: str
+
+
+def _norm(word: str) -> str:
+    return word.strip().strip(".,!?;:").lower()
+
+
+class StreamingTranscriber:
+    """Rolling-buffer transcriber: insert audio, call process() periodically, finish() at end of stream."""
+
+    def __init__(self, service: TranscriptionService, lang: str | None = "en"):
+        self._service, self._lang = service, lang
+        # Preallocated sample buffer, filled to self._size: insert() copies in place instead of
+        # re-concatenating the whole buffer per chunk; capacity doubles if trimming can't keep up
+        self._buf = np.empty(int(2 * STREAM_BUFFER_TRIM_SECONDS * SAMPLES_PER_SECOND), dtype=np.float32)
+        self._size = 0
+        self._offset = 0.0  # Stream time (s) of self._buf[0]
+        self._committed: list[TimedWord] = []
+        self._pending: list[TimedWord] = []  # Previous pass's unconfirmed words
+        self._undecoded = False  # Audio inserted since the last pass
+
+    @property
+    def _audio(self) -> np.ndarray:
+        return self._buf[: self._size]
+
+    def insert(self, audio: np.ndarray) -> None:
+        audio = audio.ravel()
+        end = self._size + audio.size
+        if end > self._buf.size:
+            grown = np.empty(max(end, 2 * self._buf.size), dtype=np.float32)
+            grown[: self._size] = self._audio
+            self._buf = grown
+        self._buf[self._size : end] = audio
+        self._size = end
+        self._undecoded = self._undecoded or audio.size > 0
+
+    def process(self) -> list[TimedWord]:
+        """Re-decode the buffer and return the words this pass confirmed (common prefix with the last pass)."""
+        if not self._size:
+            return []
+        hypothesis = self._hypothesis()
+        self._undecoded = False
+        confirmed: list[TimedWord] = []
+        for old, new in zip(self._pending, hypothesis, strict=False):
+            if _norm(old.text) != _norm(new.text):
+                break
+            confirmed.append(new)
+        self._committed.extend(confirmed)
+        self._pending = hypothesis[len(confirmed) :]
+        self._trim()
+        return confirmed
+
+    def finish(self) -> list[TimedWord]:
+        """Commit the last unconfirmed words; at end of stream there is no later pass to agree with.
+
+        Audio inserted after the last process() is decoded first, so the final partial window isn't dropped; that
+        pass covers the whole uncommitted buffer and supersedes the previous pass's pending words.
+        """
+        if self._undecoded:
+            self._pending, self._undecoded = self._hypothesis(), False
+        rest, self._pending = self._pending, []
+        self._committed.extend(rest)
+        return rest
+
+    def _hypothesis(self) -> list[TimedWord]:
+        # Word texts carry their own leading space
+        prompt = "".join(w.text for w in self._committed[-STREAM_PROMPT_WORDS:]).strip() or None
+        last_end = self._committed[-1].end if self._committed else 0.0
+        try:
+            segments, _ = self._service.model.transcribe(
+                self._audio,
+                beam_size=WHISPER_BEAM_SIZE,
+                language=self._lang,
+                initial_prompt=prompt,
+                word_timestamps=True,
+                vad_filter=True,
+                condition_on_previous_text=False,
+            )
+            words = [
+                TimedWord(self._offset + w.start, self._offset + w.end, w.word)
+                for s in segments
+                for w in s.words or ()
+                if self._offset + w.start > last_end - _BOUNDARY_TOLERANCE
+            ]
+        except TranscriptionError:
+            raise
+        except Exception as e:
+            raise TranscriptionError("Streaming transcription failed", code=pb.AUDIO_TRANSCRIPTION_FAILED, cause=e) from e
+        if not words or abs(words[0].start - last_end) > 1.0:
+            return words
+        # Drop words the decoder repeated from the committed tail at the boundary
+        for n in range(min(_MAX_OVERLAP_NGRAM, len(words), len(self._committed)), 0, -1):
+            if [_norm(w.text) for w in self._committed[-n:]] == [_norm(w.text) for w in words[:n]]:
+                return words[n:]
+        return words
+
+    def _trim(self) -> None:
+        """Cut audio already covered by committed words once the buffer grows past the trim length."""
+        if not self._committed or self._size <= STREAM_BUFFER_TRIM_SECONDS * SAMPLES_PER_SECOND:
+            return
+        cut_at = self._committed[-1].end
+        cut = min(int((cut_at - self._offset) * SAMPLES_PER_SECOND), self._size)
+        # Shift the kept tail to the front; numpy buffers overlapping slice copies
+        self._buf[: self._size - cut] = self._buf[cut : self._size]
+        self._size -= cut
+        self._offset = cut_at
+        logger.debug(f"Streaming buffer trimmed to {self._size / SAMPLES_PER_SECOND:.1f}s")
@@ -4,7 +4,7 @@ import numpy as np
 
 import app.pb.cognition_pb2 as pb
 from app.core import TranscriptionError, get_logger
-from app.services.constants import WHISPER_BEAM_SIZE
+from app.services.constants import SAMPLES_PER_SECOND, WHISPER_BATCH_MIN_SECONDS, WHISPER_BATCH_SIZE, WHISPER_BEAM_SIZE
 
 logger = get_logger(__name__)
 
@@ -31,6 +31,7 @@ class TranscriptionService:
             "num_workers": 2,
         }
         self._model = None
+        self._batched = None
 
     @property
     def model(self):
@@ -43,20 +44,39 @@ class TranscriptionService:
                 raise TranscriptionError("Model load failed", code=pb.AUDIO_MODEL_LOAD_FAILED, cause=e) from e
         return self._model
 
+    @property
+    def batched(self):
+        """BatchedInferencePipeline over the shared model: decodes several VAD segments of long audio per pass."""
+        if not self._batched:
+            from faster_whisper import BatchedInferencePipeline
+            self._batched = BatchedInferencePipeline(model=self.model)
+        return self._batched
+
+    def warmup(self) -> None:
+        """Load the model and run one decode so the first real request skips weight load and kernel setup."""
+        # Bypass transcribe(): its VAD filter would drop silent audio before the encoder ever runs
+        segments, _ = self.model.transcribe(
+            np.zeros(SAMPLES_PER_SECOND, dtype=np.float32), beam_size=WHISPER_BEAM_SIZE, language="en", vad_filter=False
+        )
+        list(segments)  # Segments decode lazily
+
     def transcribe(self, audio: np.ndarray, lang: str | None = "en") -> tuple[str, float]:
         if audio.size == 0:
             raise TranscriptionError("Empty audio", code=pb.AUDIO_EMPTY_INPUT)
+        audio = audio.ravel().astype(np.float32, copy=False)
+        opts = {
+            "beam_size": WHISPER_BEAM_SIZE,
+            "language": lang,
+            "vad_parameters": {"min_silence_duration_ms": 500},
+            "no_speech_threshold": 0.6,
+            "log_prob_threshold": -1.0,
+        }
         try:
-            segments, info = self.model.transcribe(
-                audio.ravel().astype(np.float32, copy=False),
-                beam_size=WHISPER_BEAM_SIZE,
-                language=lang,
-                vad_filter=True,
-                vad_parameters={"min_silence_duration_ms": 500},
-                condition_on_previous_text=False,
-                no_speech_threshold=0.6,
-                log_prob_threshold=-1.0,
-            )
+            if audio.size > WHISPER_BATCH_MIN_SECONDS * SAMPLES_PER_SECOND:
+                # Long audio spans several VAD segments; decode them together instead of one window at a time
+                segments, info = self.batched.transcribe(audio, batch_size=WHISPER_BATCH_SIZE, without_timestamps=True, **opts)
+            else:
+                segments, info = self.model.transcribe(audio, vad_filter=True, condition_on_previous_text=False, **opts)
             return " ".join(s.text for s in segments).strip(), getattr(info, "language_probability", 1.0)
         except Exception as e:
             raise TranscriptionError("Transcription failed", code=pb.AUDIO_TRANSCRIPTION_FAILED, cause=e) from e
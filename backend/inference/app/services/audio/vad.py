@@ -1,29 +1,103 @@
 """Silero VAD (Voice Activity Detection) service."""
 
+import hashlib
+import shutil
+import threading
+import urllib.request
+from pathlib import Path
+
 import numpy as np
 
 import app.pb.cognition_pb2 as pb
 from app.core import VADError, get_logger
-from app.services.constants import VAD_DEFAULT_SAMPLE_RATE, VAD_DEFAULT_THRESHOLD
+from app.services.constants import (
+    VAD_DEFAULT_SAMPLE_RATE,
+    VAD_DEFAULT_THRESHOLD,
+    VAD_DOWNLOAD_TIMEOUT,
+    VAD_MODEL_CACHE,
+    VAD_ONNX_SHA256,
+    VAD_ONNX_URL,
+)
 
 logger = get_logger(__name__)
 
+# Silero v5 recurrent state shape, and trailing samples of the previous chunk it expects prepended per rate
+_STATE_SHAPE = (2, 1, 128)
+_CONTEXT_SAMPLES = {16000: 64, 8000: 32}
+
+
+def _model_path() -> str:
+    """Local copy of the Silero VAD ONNX model, downloaded once into the user cache and checked against its sha256."""
+    path = Path(VAD_MODEL_CACHE).expanduser()
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_suffix(".part")
+        with urllib.request.urlopen(VAD_ONNX_URL, timeout=VAD_DOWNLOAD_TIMEOUT) as resp, partial.open("wb") as f:
+            shutil.copyfileobj(resp, f)
+        with partial.open("rb") as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+        if digest != VAD_ONNX_SHA256:
+            partial.unlink()
+            raise ValueError(f"VAD model checksum mismatch: expected {VAD_ONNX_SHA256}, got {digest}")
+        partial.replace(path)
+    return str(path)
+
+
+class _SileroOnnx:
+    """Stateful Silero VAD on ONNX Runtime: same call/reset_states contract as the torch.hub model, no torch."""
+
+    def __init__(self, path: str):
+        import onnxruntime as ort
+
+        opts = ort.SessionOptions()
+        # A ~1 kFLOP graph per chunk: thread pool handoff would cost more than the math
+        opts.intra_op_num_threads = opts.inter_op_num_threads = 1
+        self._session = ort.InferenceSession(path, sess_options=opts, providers=["CPUExecutionProvider"])
+        self._input = np.empty((1, 0), dtype=np.float32)
+        self._sr = np.zeros((), dtype=np.int64)
+        # The input buffer and recurrent state are shared by every caller; gRPC runs handlers on a thread pool
+        self._lock = threading.Lock()
+        self.reset_states()
+
+    def reset_states(self) -> None:
+        with self._lock:
+            self._state = np.zeros(_STATE_SHAPE, dtype=np.float32)
+            self._input[:] = 0
+
+    def __call__(self, chunk: np.ndarray, sample_rate: int) -> float:
+        context = _CONTEXT_SAMPLES[sample_rate]
+        with self._lock:
+            if self._sr != sample_rate or self._input.shape[1] != context + chunk.size:
+                # Reused (1, context + chunk) input; a new rate or chunk size starts from a clean state
+                self._input = np.zeros((1, context + chunk.size), dtype=np.float32)
+                self._sr = np.array(sample_rate, dtype=np.int64)
+                self._state = np.zeros(_STATE_SHAPE, dtype=np.float32)
+            self._input[0, context:] = chunk  # Copies and casts; read-only gRPC buffers are fine
+            out, self._state = self._session.run(None, {"input": self._input, "state": self._state, "sr": self._sr})
+            self._input[0, :context] = self._input[0, -context:]
+            return float(out[0, 0])
+
+    def warmup(self, chunk_size: int, sample_rate: int) -> None:
+        """Run one silent chunk on throwaway buffers; the session is thread-safe and the shared state is untouched."""
+        feeds = {
+            "input": np.zeros((1, _CONTEXT_SAMPLES[sample_rate] + chunk_size), dtype=np.float32),
+            "state": np.zeros(_STATE_SHAPE, dtype=np.float32),
+            "sr": np.array(sample_rate, dtype=np.int64),
+        }
+        self._session.run(None, feeds)
+
 
 class VADService:
     def __init__(self, threshold: float = VAD_DEFAULT_THRESHOLD):
         self.threshold = threshold
         self._model = None
-        self._torch = None
 
     @property
     def model(self):
         """Lazy-load VAD model on first use."""
         if self._model is None:
             try:
-                import torch
-                self._torch = torch
-                self._model, _ = torch.hub.load(repo_or_dir="snakers4/silero-vad", model="silero_vad", trust_repo=True)
-                self._model.reset_states()
+                self._model = _SileroOnnx(_model_path())
                 logger.info(f"VADService initialized: threshold={self.threshold}")
             except Exception as e:
                 raise VADError("Failed to load VAD model", code=pb.AUDIO_MODEL_LOAD_FAILED, cause=e) from e
@@ -32,13 +106,22 @@ class VADService:
     def detect_speech(self, audio_chunk: np.ndarray, sample_rate: int = VAD_DEFAULT_SAMPLE_RATE) -> tuple[float, bool]:
         """Detect speech in audio chunk. Args: audio_chunk (Float32 PCM, 512 samples), sample_rate. Returns: (prob, is_speech)."""
         try:
-            _ = self.model  # Ensure model is loaded (also loads torch)
-            return (p := self._model(self._torch.from_numpy(audio_chunk).float(), sample_rate).item()), p > self.threshold
+            p = self.model(audio_chunk.ravel(), sample_rate)
+            return p, p > self.threshold
         except VADError:
             raise
         except Exception as e:
             raise VADError("VAD detection failed", code=pb.AUDIO_VAD_FAILED, cause=e) from e
 
+    def warmup(self) -> None:
+        """Load the model and score one silent chunk without touching the state live streams use."""
+        try:
+            self.model.warmup(512, VAD_DEFAULT_SAMPLE_RATE)
+        except VADError:
+            raise
+        except Exception as e:
+            raise VADError("VAD warmup failed", code=pb.AUDIO_VAD_FAILED, cause=e) from e
+
     def reset_state(self) -> None:
         """Reset VAD model internal state."""
         if self._model:
@@ -4,25 +4,51 @@
 CONTEXT_TEXT_MAX_LENGTH = 5000
 SCREEN_CONTEXT_MAX_LENGTH = 2000
 MEMORY_QUERY_RESULTS = 3
+LLM_STREAM_FLUSH_CHARS = 32  # Coalesce streamed tokens until this many chars are buffered
+LLM_STREAM_FLUSH_INTERVAL = 0.025  # ...or this many seconds have passed since the last yield
+PROMPT_CACHE_SIZE = 1024  # Rendered analysis prompts kept for repeat inputs
+PROMPT_CACHE_MAX_CHARS = CONTEXT_TEXT_MAX_LENGTH  # Full-size truncated contexts still cache; longer inputs don't
 
 # Memory Service Constants
 POOL_SIZE_DEFAULT = 4
 POOL_ACQUIRE_TIMEOUT = 5.0
+# HNSW index settings applied when the collection is created; bounded sync/batch keeps persistence cost predictable
+HNSW_CONFIG_DEFAULT = {
+    "hnsw:space": "cosine",
+    "hnsw:sync_threshold": 200,
+    "hnsw:batch_size": 128,
+    "hnsw:M": 16,
+    "hnsw:construction_ef": 100,
+}
 MEMORY_PRUNE_THRESHOLD = 10000
 MEMORY_PRUNE_KEEP = 5000
+MEMORY_PRUNE_PAGE_SIZE = 2048  # Metadata rows fetched per collection.get while pruning
+MEMORY_COUNT_RECHECK_INTERVAL = 1000  # Reconcile the tracked collection size with count() this often
+MEMORY_MAINT_DEBOUNCE = 0.5  # Seconds the background pruner waits to coalesce triggers
 UNIQUENESS_SAMPLE_SIZE = 1000
 UNIQUENESS_NEIGHBOR_COUNT = 10
 UNIQUENESS_DISTANCE_EPSILON = 0.001
 DEDUP_SAMPLE_SIZE = 500
-DEDUP_NEIGHBOR_COUNT = 5
 MEMORY_QUERY_DEFAULT_RESULTS = 5
+QUERY_CACHE_SIZE = 512
+QUERY_CACHE_TTL = 300.0  # Seconds
+QUERY_CACHE_TOKEN_SIMILARITY = 0.9  # Ordered token match ratio for reusing the previous query's result
 
 # VAD Constants
 VAD_DEFAULT_THRESHOLD = 0.5
 VAD_DEFAULT_SAMPLE_RATE = 16000
+VAD_ONNX_URL = "https://github.com/snakers4/silero-vad/raw/v5.1.2/src/silero_vad/data/silero_vad.onnx"
+VAD_ONNX_SHA256 = "2623a2953f6ff3d2c1e61740c6cdb7168133479b267dfef114a4a3cc5bdd788f"  # silero_vad.onnx at v5.1.2
+VAD_DOWNLOAD_TIMEOUT = 30.0  # Seconds per socket operation while fetching the model
+VAD_MODEL_CACHE = "~/.cache/good-listener/silero_vad_v5.onnx"
 
 # Transcription Constants
 WHISPER_BEAM_SIZE = 3
+WHISPER_BATCH_SIZE = 8  # VAD segments decoded per batched-pipeline pass
+WHISPER_BATCH_MIN_SECONDS = 30  # One Whisper window; shorter audio has nothing to batch
+STREAM_CHUNK_SECONDS = 1.0  # New audio between streaming re-decodes
+STREAM_BUFFER_TRIM_SECONDS = 15.0  # Drop committed audio once the rolling buffer grows past this
+STREAM_PROMPT_WORDS = 50  # Committed words fed back as the initial prompt
 
 # Diarization Constants
 DIARIZATION_MODEL = "pyannote/speaker-diarization-3.1"
@@ -36,6 +62,10 @@ SPEAKER_MIN_AUDIO_LENGTH = 0.5  # Minimum seconds of audio for reliable embeddin
 # Question Detection Constants
 MIN_QUESTION_LENGTH = 10
 
+# OCR Constants
+OCR_MAX_DIM = 1920  # Long-side cap before detection; boxes are scaled back to the original frame
+OCR_PROCESS_WORKERS = 2  # Worker processes when OCRService(use_processes=True)
+
 # gRPC Server Constants
 GRPC_MAX_WORKERS = 10
 GRPC_SHUTDOWN_GRACE_PERIOD = 10
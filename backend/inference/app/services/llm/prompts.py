@@ -1,5 +1,10 @@
+from functools import lru_cache
+
+from langchain_core.messages import BaseMessage
 from langchain_core.prompts import ChatPromptTemplate, HumanMessagePromptTemplate, SystemMessagePromptTemplate
 
+from app.services.constants import PROMPT_CACHE_MAX_CHARS, PROMPT_CACHE_SIZE
+
 # Transcript Summarization Prompt - optimized for context compression
 SUMMARIZATION_PROMPT = ChatPromptTemplate.from_messages([
     SystemMessagePromptTemplate.from_template(
@@ -49,3 +54,22 @@ ANALYSIS_TEMPLATE = ChatPromptTemplate.from_messages(
         ),
     ]
 )
+
+
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
+def _render_analysis_cached(context_text: str, memory_context: str, user_query: str) -> tuple[BaseMessage, ...]:
+    return tuple(_render_analysis(context_text, memory_context, user_query))
+
+
+def _render_analysis(context_text: str, memory_context: str, user_query: str) -> list[BaseMessage]:
+    return ANALYSIS_TEMPLATE.invoke(
+        {"context_text": context_text, "memory_context": memory_context, "user_query": user_query}
+    ).to_messages()
+
+
+def render_analysis(context_text: str, memory_context: str, user_query: str) -> list[BaseMessage]:
+    """ANALYSIS_TEMPLATE messages as fresh copies; repeat inputs up to PROMPT_CACHE_MAX_CHARS skip re-rendering."""
+    if max(len(context_text), len(memory_context), len(user_query)) > PROMPT_CACHE_MAX_CHARS:
+        return _render_analysis(context_text, memory_context, user_query)
+    # Messages are mutable pydantic models, so callers never get the cached instances
+    return [m.model_copy(deep=True) for m in _render_analysis_cached(context_text, memory_context, user_query)]
@@ -1,19 +1,58 @@
-import base64
+import asyncio
 import io
 import json
 import os
-from collections.abc import AsyncGenerator
+import threading
+import time
+from collections.abc import AsyncGenerator, AsyncIterator
 
+import pybase64
 from langchain_core.messages import HumanMessage
 from langchain_core.tools import tool
-from PIL import Image
+from PIL import Image, ImageOps
 
 import app.pb.cognition_pb2 as pb
 from app.core import LLMError, get_config, get_logger
-from app.services.llm.prompts import ANALYSIS_TEMPLATE, SUMMARIZATION_PROMPT
+from app.services.constants import LLM_STREAM_FLUSH_CHARS, LLM_STREAM_FLUSH_INTERVAL
+from app.services.llm.prompts import SUMMARIZATION_PROMPT, render_analysis
 
 logger = get_logger(__name__)
 
+# Vision models downscale server-side; larger frames only cost encode time and upload
+IMAGE_MAX_DIM = 1568
+# Per-thread JPEG scratch buffer: keeps its grown capacity across frames instead of reallocating each time
+_jpeg_buf = threading.local()
+
+
+async def _coalesce(texts: AsyncIterator[str]) -> AsyncGenerator[str, None]:
+    """Batch streamed text so callers wake per phrase, not per token.
+
+    Text goes out once LLM_STREAM_FLUSH_CHARS are buffered or LLM_STREAM_FLUSH_INTERVAL has passed since the
+    last yield. The interval runs on a timer, not on the next chunk's arrival, so text buffered before a
+    provider stall is still delivered during the stall. The first text goes out immediately.
+    """
+    buf, last_flush, pending = "", float("-inf"), None
+    try:
+        while True:
+            pending = pending or asyncio.ensure_future(anext(texts))
+            timeout = max(0.0, last_flush + LLM_STREAM_FLUSH_INTERVAL - time.monotonic()) if buf else None
+            done, _ = await asyncio.wait({pending}, timeout=timeout)
+            if done:
+                try:
+                    buf += pending.result()
+                except StopAsyncIteration:
+                    break
+                pending = None
+            due = time.monotonic() - last_flush >= LLM_STREAM_FLUSH_INTERVAL
+            if buf and (due or len(buf) >= LLM_STREAM_FLUSH_CHARS):
+                yield buf
+                buf, last_flush = "", time.monotonic()
+        if buf:
+            yield buf
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+
 
 @tool
 def store_memory(text: str, source: str = "user"):
@@ -36,6 +75,11 @@ class LLMService:
         self._memory_query_results = cfg.memory.query_default_results
         self._ollama_host = ollama_host or cfg.llm.ollama_host
 
+        if provider not in ("gemini", "ollama"):
+            # No model to build; skip key lookup and provider setup
+            self.api_key, self.llm = api_key, None
+            return
+
         self.api_key = api_key or os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
         if self.api_key and self.provider == "gemini":
             os.environ["GOOGLE_API_KEY"] = self.api_key
@@ -63,33 +107,12 @@ class LLMService:
     ) -> AsyncGenerator[str, None]:
         if not self.llm:
             raise LLMError("LLM not configured", code=pb.LLM_NOT_CONFIGURED)
-        msgs = ANALYSIS_TEMPLATE.invoke(
-            {
-                "context_text": context_text[: self._context_max_length] if context_text else "No text detected via OCR.",
-                "memory_context": self._get_memory_context(user_query),
-                "user_query": user_query or "Analyze this screen.",
-            }
-        ).to_messages()
-        if image:
-            msgs[-1] = HumanMessage(
-                content=[
-                    {"type": "text", "text": msgs[-1].content},
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{self._encode_image(image)}"}},
-                ]
-            )
+        msgs = self._build_prompt(context_text, user_query, image)
 
         tool_calls = {}
         try:
-            async for chunk in self.llm.astream(msgs):
-                if chunk.content:
-                    yield chunk.content
-                if chunk.tool_call_chunks:
-                    for tc in chunk.tool_call_chunks:
-                        idx = tc["index"]
-                        if idx not in tool_calls:
-                            tool_calls[idx] = {"name": tc["name"], "args": tc["args"]}
-                        else:
-                            tool_calls[idx]["args"] += tc["args"]
+            async for text in _coalesce(self._stream_text(msgs, tool_calls)):
+                yield text
 
             # Execute tools
             for tc in tool_calls.values():
@@ -107,6 +130,33 @@ class LLMService:
             logger.exception("LLM Error")
             raise LLMError(str(e), code=pb.LLM_API_ERROR, cause=e) from e
 
+    async def _stream_text(self, msgs: list, tool_calls: dict) -> AsyncGenerator[str, None]:
+        """Text content of the model stream; tool call fragments are accumulated into tool_calls by index."""
+        async for chunk in self.llm.astream(msgs):
+            for tc in chunk.tool_call_chunks or ():
+                if (idx := tc["index"]) not in tool_calls:
+                    tool_calls[idx] = {"name": tc["name"], "args": tc["args"]}
+                else:
+                    tool_calls[idx]["args"] += tc["args"]
+            if chunk.content:
+                yield chunk.content
+
+    def _build_prompt(self, context_text: str, user_query: str = "", image: Image.Image | None = None) -> list:
+        """Build analysis messages; context is truncated and the image attached to the last message."""
+        msgs = render_analysis(
+            context_text[: self._context_max_length] if context_text else "No text detected via OCR.",
+            self._get_memory_context(user_query),
+            user_query or "Analyze this screen.",
+        )
+        if image:
+            msgs[-1] = HumanMessage(
+                content=[
+                    {"type": "text", "text": msgs[-1].content},
+                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{self._encode_image(image)}"}},
+                ]
+            )
+        return msgs
+
     def _get_memory_context(self, query: str) -> str:
         if (
             self.memory_service
@@ -117,9 +167,25 @@ class LLMService:
         return ""
 
     def _encode_image(self, img: Image.Image) -> str:
-        buf = io.BytesIO()
-        img.save(buf, format="JPEG")
-        return base64.b64encode(buf.getvalue()).decode()
+        if max(img.size) > IMAGE_MAX_DIM:
+            # BICUBIC: near-LANCZOS quality for screenshots at a fraction of the filter cost
+            img = ImageOps.contain(img, (IMAGE_MAX_DIM, IMAGE_MAX_DIM), Image.Resampling.BICUBIC)
+        if img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info):
+            # JPEG has no alpha: composite onto white, else transparent pixels show whatever colour sits under them
+            rgba = img.convert("RGBA")
+            img = Image.new("RGB", rgba.size, (255, 255, 255))
+            img.paste(rgba, mask=rgba.getchannel("A"))
+        elif img.mode not in ("RGB", "L"):
+            # JPEG has no palette; P/CMYK/etc. screenshots would otherwise fail to save
+            img = img.convert("RGB")
+        if (buf := getattr(_jpeg_buf, "io", None)) is None:
+            buf = _jpeg_buf.io = io.BytesIO()
+        # Overwrite from the start rather than truncate(0), which would release the capacity
+        buf.seek(0)
+        img.save(buf, format="JPEG", quality=85, optimize=False, subsampling=2)
+        # Emits str directly, skipping the bytes -> ascii decode copy; the view must be released before reuse
+        with buf.getbuffer() as view:
+            return pybase64.b64encode_as_string(view[: buf.tell()])
 
     async def summarize(self, transcript: str, max_length: int = 0) -> str:
         """Summarize transcript for context compression."""
@@ -2,7 +2,9 @@
 
 from app.core.errors import MemoryError
 from app.services.memory.chunker import ChunkResult, SemanticChunker, get_chunker
+from app.services.memory.embedding_store import EmbeddingStore
+from app.services.memory.query_cache import QueryCache
 from app.services.memory.service import ChromaPool, MemoryService
 
-__all__ = ["ChromaPool", "MemoryError", "MemoryService", "SemanticChunker", "ChunkResult", "get_chunker"]
+__all__ = ["ChromaPool", "EmbeddingStore", "MemoryError", "MemoryService", "QueryCache", "SemanticChunker", "ChunkResult", "get_chunker"]
 
@@ -0,0 +1,106 @@
+"""Memory-mapped float32 sidecar of memory embeddings, keyed by doc id."""
+
+import json
+import threading
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+
+import numpy as np
+
+from app.core import get_logger
+
+logger = get_logger(__name__)
+
+_INITIAL_CAPACITY = 1024
+
+
+class EmbeddingStore:
+    """Row-per-id embedding matrix in a numpy.memmap, with a JSON id -> row index beside it.
+
+    Rows are read straight from the mapped file, so repeated prune passes skip Chroma's
+    SQLite deserialization. Freed rows are reused before the file grows.
+    """
+
+    def __init__(self, directory: str | Path, name: str = "embeddings"):
+        self._data_path = Path(directory) / f"{name}.f32"
+        self._index_path = Path(directory) / f"{name}.json"
+        self._lock = threading.Lock()
+        self._dim = 0
+        self._rows: dict[str, int] = {}
+        self._free: list[int] = []
+        self._mmap: np.memmap | None = None
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _load(self) -> None:
+        if not (self._index_path.exists() and self._data_path.exists()):
+            return
+        try:
+            index = json.loads(self._index_path.read_text())
+            self._dim, self._rows, self._free = index["dim"], index["rows"], index["free"]
+            self._mmap = np.memmap(self._data_path, dtype=np.float32, mode="r+").reshape(-1, self._dim)
+        except Exception:
+            logger.warning("Embedding sidecar unreadable, starting empty", exc_info=True)
+            self._dim, self._rows, self._free, self._mmap = 0, {}, [], None
+
+    def _save_index(self) -> None:
+        self._index_path.write_text(json.dumps({"dim": self._dim, "rows": self._rows, "free": self._free}))
+
+    def _reserve(self, capacity: int) -> None:
+        """Grow the backing file to at least capacity rows and remap it."""
+        current = 0 if self._mmap is None else self._mmap.shape[0]
+        if capacity <= current:
+            return
+        capacity = max(capacity, current * 2, _INITIAL_CAPACITY)
+        if self._mmap is not None:
+            self._mmap.flush()
+            self._mmap = None
+        self._data_path.touch()
+        with self._data_path.open("r+b") as f:
+            f.truncate(capacity * self._dim * 4)
+        self._mmap = np.memmap(self._data_path, dtype=np.float32, mode="r+", shape=(capacity, self._dim))
+
+    def rows(self, ids: list[str]) -> list[int | None]:
+        """Row index per id, or None when the id has no stored embedding."""
+        with self._lock:
+            return [self._rows.get(id_) for id_ in ids]
+
+    def matrix(self, rows: list[int]) -> np.ndarray:
+        """(len(rows), dim) float32 copy of the given rows, read from the mapped file."""
+        with self._lock:
+            return np.asarray(self._mmap[rows], dtype=np.float32) if self._mmap is not None else np.empty((0, self._dim), np.float32)
+
+    def put(self, ids: list[str], embeddings: np.ndarray | Sequence[Sequence[float]]) -> None:
+        """Store embeddings for ids, overwriting existing rows."""
+        emb = np.asarray(embeddings, dtype=np.float32)
+        if emb.ndim != 2 or len(emb) != len(ids) or not len(ids):
+            return
+        with self._lock:
+            if emb.shape[1] != self._dim:
+                # First write, or the embedding model changed: existing rows are not comparable
+                self._dim, self._rows, self._free, self._mmap = emb.shape[1], {}, [], None
+                self._data_path.unlink(missing_ok=True)
+            targets = []
+            next_row = len(self._rows) + len(self._free)
+            for id_ in ids:
+                if (row := self._rows.get(id_)) is None:
+                    if self._free:
+                        row = self._free.pop()
+                    else:
+                        row, next_row = next_row, next_row + 1
+                    self._rows[id_] = row
+                targets.append(row)
+            self._reserve(next_row)
+            self._mmap[targets] = emb
+            self._mmap.flush()
+            self._save_index()
+
+    def discard(self, ids: Iterable[str]) -> None:
+        """Free the rows of deleted ids."""
+        with self._lock:
+            freed = [row for id_ in ids if (row := self._rows.pop(id_, None)) is not None]
+            if freed:
+                self._free.extend(freed)
+                self._save_index()
@@ -0,0 +1,100 @@
+"""Bounded LRU+TTL cache for vector store query results."""
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from difflib import SequenceMatcher
+from typing import Any
+
+from app.services.constants import (
+    QUERY_CACHE_SIZE,
+    QUERY_CACHE_TOKEN_SIMILARITY,
+    QUERY_CACHE_TTL,
+)
+
+# (bucket, normalized query text)
+_Key = tuple[Hashable, str]
+
+# Tokens that flip a query's meaning; a near-duplicate that adds, drops or changes one is not a cache hit
+_NEGATIONS = frozenset({"no", "not", "never", "none", "nor", "without", "cannot"})
+
+
+def _is_significant(token: str) -> bool:
+    return token in _NEGATIONS or token.endswith("n't") or any(c.isdigit() for c in token)
+
+
+class QueryCache:
+    """LRU+TTL query cache.
+
+    Entries match on exact key. A miss may still reuse the immediately previous query's result when the two are
+    near-duplicates: same word order, and differing by a word or two of a long sentence that is not a number or
+    a negation.
+    """
+
+    def __init__(
+        self,
+        max_size: int = QUERY_CACHE_SIZE,
+        ttl: float = QUERY_CACHE_TTL,
+        token_threshold: float = QUERY_CACHE_TOKEN_SIMILARITY,
+    ):
+        self.max_size, self.ttl, self.token_threshold = max_size, ttl, token_threshold
+        # (expiry, value, query tokens)
+        self._entries: OrderedDict[_Key, tuple[float, Any, tuple[str, ...]]] = OrderedDict()
+        # Last key stored or hit; the only candidate for a near-duplicate match
+        self._previous: _Key | None = None
+        self._lock = threading.RLock()
+        self.hits = self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, bucket: Hashable, text: str) -> Any | None:
+        """Return the cached value for text in bucket, or the previous query's if text is a near-duplicate of it."""
+        with self._lock:
+            key: _Key | None = (bucket, text)
+            if key not in self._entries:
+                key = self._previous if self._near_duplicate(bucket, text) else None
+            if key is None or (entry := self._entries.get(key)) is None:
+                self.misses += 1
+                return None
+            if entry[0] <= time.monotonic():
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._previous = key
+            self.hits += 1
+            return entry[1]
+
+    def put(self, bucket: Hashable, text: str, value: Any) -> None:
+        """Cache value, evicting the least recently used entry when full."""
+        with self._lock:
+            key = (bucket, text)
+            self._entries[key] = (time.monotonic() + self.ttl, value, tuple(text.split()))
+            self._entries.move_to_end(key)
+            self._previous = key
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self) -> None:
+        """Drop every entry; call after any write to the underlying collection."""
+        with self._lock:
+            self._entries.clear()
+            self._previous = None
+
+    def _drop(self, key: _Key) -> None:
+        del self._entries[key]
+        if key == self._previous:
+            self._previous = None
+
+    def _near_duplicate(self, bucket: Hashable, text: str) -> bool:
+        if self._previous is None or self._previous[0] != bucket or not (tokens := text.split()):
+            return False
+        cached = self._entries[self._previous][2]
+        # The ratio can't exceed the length ratio, so skip the matcher for lopsided pairs
+        if 2 * min(len(cached), len(tokens)) <= self.token_threshold * (len(cached) + len(tokens)):
+            return False
+        if any(map(_is_significant, set(cached).symmetric_difference(tokens))):
+            return False
+        return SequenceMatcher(None, cached, tokens, autojunk=False).ratio() > self.token_threshold
@@ -1,19 +1,29 @@
+import hashlib
+import itertools
+import json
 import threading
 import time
-from contextlib import contextmanager
+from collections import deque
+from contextlib import contextmanager, suppress
 from pathlib import Path
-from queue import Empty, Queue
+from queue import Empty, Full, Queue
+from typing import TYPE_CHECKING
+
+import numpy as np
 
 import app.pb.cognition_pb2 as pb
-from app.core import MemoryError, get_logger
+from app.core import MemoryError, get_config, get_logger
 from app.services.constants import (
     CHUNK_ENABLED,
     CHUNK_MAX_SIZE,
     CHUNK_MIN_SIZE,
     CHUNK_SIMILARITY_THRESHOLD,
-    DEDUP_NEIGHBOR_COUNT,
     DEDUP_SAMPLE_SIZE,
+    HNSW_CONFIG_DEFAULT,
+    MEMORY_COUNT_RECHECK_INTERVAL,
+    MEMORY_MAINT_DEBOUNCE,
     MEMORY_PRUNE_KEEP,
+    MEMORY_PRUNE_PAGE_SIZE,
     MEMORY_PRUNE_THRESHOLD,
     MEMORY_QUERY_DEFAULT_RESULTS,
     POOL_ACQUIRE_TIMEOUT,
@@ -22,22 +32,51 @@ from app.services.constants import (
     UNIQUENESS_NEIGHBOR_COUNT,
     UNIQUENESS_SAMPLE_SIZE,
 )
+from app.services.memory.embedding_store import EmbeddingStore
+from app.services.memory.query_cache import QueryCache
+
+if TYPE_CHECKING:
+    from chromadb.api import ClientAPI
 
 logger = get_logger(__name__)
 
+# One PersistentClient per absolute path: every pool slot and MemoryService on that path shares its SQLite handle and HNSW cache
+_CLIENT_REGISTRY: dict[str, "ClientAPI"] = {}
+# Likewise one EmbeddingStore per path, so services never clobber each other's index and row allocations
+_EMBEDDING_REGISTRY: dict[str, EmbeddingStore] = {}
+_CLIENT_LOCK = threading.Lock()
+
+
+def _shared_embedding_store(persistence_path: str) -> EmbeddingStore:
+    abs_path = str(Path(persistence_path).resolve())
+    with _CLIENT_LOCK:
+        if (store := _EMBEDDING_REGISTRY.get(abs_path)) is None:
+            store = _EMBEDDING_REGISTRY[abs_path] = EmbeddingStore(abs_path)
+        return store
+
 
 class ChromaPool:
     """Thread-safe connection pool for ChromaDB clients."""
 
-    def __init__(self, persistence_path: str, pool_size: int = POOL_SIZE_DEFAULT, collection_name: str = "user_context"):
+    def __init__(
+        self,
+        persistence_path: str,
+        pool_size: int = POOL_SIZE_DEFAULT,
+        collection_name: str = "user_context",
+        hnsw_config: dict | None = None,
+    ):
         self._path, self._pool_size, self._collection_name = persistence_path, pool_size, collection_name
+        self._hnsw_config = {**HNSW_CONFIG_DEFAULT, **(hnsw_config or {})}
         self._pool: Queue = Queue(maxsize=pool_size)
         self._lock, self._initialized = threading.Lock(), False
 
     def _create_client(self):
         import chromadb
-        client = chromadb.PersistentClient(path=self._path)
-        return client, client.get_or_create_collection(name=self._collection_name, metadata={"hnsw:space": "cosine"})
+        abs_path = str(Path(self._path).resolve())
+        with _CLIENT_LOCK:
+            if (client := _CLIENT_REGISTRY.get(abs_path)) is None:
+                client = _CLIENT_REGISTRY[abs_path] = chromadb.PersistentClient(path=abs_path)
+        return client, client.get_or_create_collection(name=self._collection_name, metadata=self._hnsw_config)
 
     def initialize(self) -> bool:
         """Lazy-initialize the pool with connections."""
@@ -89,17 +128,48 @@ class MemoryService:
     CLUSTER_THRESHOLD = 0.75  # Semantic cluster membership
     PROTECTED_ACCESS_COUNT = 5  # Memories with >= this access count are protected
 
-    def __init__(self, persistence_path: str = "data/chroma_db", pool_size: int = POOL_SIZE_DEFAULT, chunking_enabled: bool = CHUNK_ENABLED):
+    def __init__(
+        self,
+        persistence_path: str = "data/chroma_db",
+        *,
+        pool_size: int = POOL_SIZE_DEFAULT,
+        chunking_enabled: bool = CHUNK_ENABLED,
+        batch_size: int | None = None,
+        flush_interval_ms: int | None = None,
+        hnsw_config: dict | None = None,
+    ):
         self.persistence_path = persistence_path
         Path(persistence_path).mkdir(parents=True, exist_ok=True)
-        self._pool = ChromaPool(persistence_path, pool_size)
+        self._pool = ChromaPool(persistence_path, pool_size, hnsw_config=hnsw_config)
         self._chunking_enabled = chunking_enabled
         self._chunker = None  # Lazy-loaded SemanticChunker
+        # add_memory write buffer, drained into one collection.add per flush; sized from MemoryConfig by default
+        cfg = get_config().memory
+        self.batch_size = max(1, cfg.batch_max_size if batch_size is None else batch_size)
+        self._flush_interval = (cfg.batch_flush_delay_ms if flush_interval_ms is None else flush_interval_ms) / 1000
+        self._buffer: deque[tuple[str, dict, str]] = deque()
+        self._buffer_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        # Armed by the first buffered write so a partial buffer is written within flush_interval_ms without more traffic
+        self._flush_timer: threading.Timer | None = None
+        self._query_cache = QueryCache()
+        # Read-through embedding sidecar for dedup passes
+        self._embeddings = _shared_embedding_store(persistence_path)
+        # Unique suffix for doc ids; itertools.count.__next__ is atomic under the GIL
+        self._id_counter = itertools.count()
+        # Collection size tracked locally so writes don't pay a count() round trip each
+        self._approx_count, self._count_recheck_interval = 0, MEMORY_COUNT_RECHECK_INTERVAL
+        # Pruning runs on a background thread; a full one-slot queue means a pass is already pending
+        self._maint_queue: Queue = Queue(maxsize=1)
+        self._maint_thread: threading.Thread | None = None
+        self._maint_lock = threading.Lock()
+        self._maint_debounce = MEMORY_MAINT_DEBOUNCE
         # Legacy attributes for backwards compatibility
         self.client, self.collection = None, None
         if self._pool.initialize():
             with self._pool.acquire() as (client, collection):
                 self.client, self.collection = client, collection
+                self._approx_count = collection.count()
             logger.info(f"MemoryService initialized with pool at {self.persistence_path}")
 
     @property
@@ -114,22 +184,96 @@ class MemoryService:
             )
         return self._chunker
 
-    def add_memory(self, text: str, source: str, metadata: dict | None = None) -> str | None:
-        """Add text to vector store and prune if needed. Returns doc_id on success."""
+    def add_memory(self, text: str, source: str, metadata: dict | None = None, *, buffered: bool = True) -> str | None:
+        """Add text to the vector store. Returns doc_id.
+
+        Buffered writes flush once batch_size or flush_interval_ms is reached; a failed flush stays queued for the
+        next one. buffered=False writes through and raises MemoryError on failure.
+        """
         if not text.strip():
             return None
         m = metadata or {}
         meta = {**m, "source": source, "timestamp": m.get("timestamp", time.time()), "access_count": 0}
-        doc_id = f"{source}_{int(time.time() * 1000)}_{threading.get_ident()}"
+        doc_id = f"{source}_{time.time_ns()}_{next(self._id_counter)}"
+        if not buffered:
+            self._write([(text, meta, doc_id)])
+            return doc_id
+        with self._buffer_lock:
+            self._buffer.append((text, meta, doc_id))
+            due = len(self._buffer) >= self.batch_size or time.monotonic() - self._last_flush >= self._flush_interval
+            if not due:
+                self._arm_flush_timer()
+        if due:
+            self._try_flush("Memory flush")
+        return doc_id
+
+    def flush(self) -> int:
+        """Write any buffered memories now. Returns the number flushed; raises MemoryError if the write fails."""
+        return self._flush_buffer()
+
+    def close(self) -> None:
+        """Stop the flush timer and write any buffered memories. Call once on shutdown."""
+        with self._buffer_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        try:
+            self._flush_buffer()
+        except MemoryError:
+            logger.exception(f"Dropping {len(self._buffer)} buffered memories on close")
+
+    def _arm_flush_timer(self) -> None:
+        """Start the flush timer if none is pending. Caller holds _buffer_lock."""
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self._flush_interval, self._timed_flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def _flush_buffer(self) -> int:
+        """Drain the write buffer into a single collection.add; entries go back on the buffer if it fails."""
+        with self._buffer_lock:
+            self._last_flush = time.monotonic()
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._buffer:
+                return 0
+            entries = list(self._buffer)
+            self._buffer.clear()
+        try:
+            return self._write(entries)
+        except MemoryError:
+            with self._buffer_lock:
+                self._buffer.extendleft(reversed(entries))
+            raise
+
+    def _try_flush(self, what: str) -> bool:
+        """Flush on behalf of a caller that didn't ask for it; failures are logged and left buffered."""
+        try:
+            self._flush_buffer()
+            return True
+        except MemoryError as e:
+            logger.warning(f"{what} failed, {len(self._buffer)} memories still buffered: {e}")
+            return False
+
+    def _timed_flush(self) -> None:
+        if not self._try_flush("Timed memory flush"):
+            with self._buffer_lock:
+                self._arm_flush_timer()
+
+    def _write(self, entries: list[tuple[str, dict, str]]) -> int:
+        """Write (text, metadata, doc_id) entries in one collection.add and prune if needed."""
+        docs, metas, ids = zip(*entries, strict=True)
         try:
             with self._pool.acquire() as (_, collection):
                 if not collection:
                     raise MemoryError("No collection available", code=pb.MEMORY_POOL_EXHAUSTED)
-                collection.add(documents=[text], metadatas=[meta], ids=[doc_id])
-                logger.debug(f"Added memory: {doc_id}")
-                if collection.count() > MEMORY_PRUNE_THRESHOLD:
-                    self._prune_smart()
-            return doc_id
+                collection.add(documents=list(docs), metadatas=list(metas), ids=list(ids))
+                self._query_cache.invalidate()
+                logger.debug(f"Wrote {len(ids)} memories")
+                if self._note_added(collection, len(ids)) > MEMORY_PRUNE_THRESHOLD:
+                    self._schedule_prune()
+            return len(ids)
         except MemoryError:
             raise
         except Exception as e:
@@ -141,14 +285,14 @@ class MemoryService:
         if not items:
             return []
 
-        now, tid, ms = time.time(), threading.get_ident(), int(time.time() * 1000)
+        now, ns = time.time(), time.time_ns()
 
         # Apply semantic chunking if enabled
         if self._chunking_enabled:
             items = self._chunk_items(items)
 
         entries = [(text, {**(m := meta or {}), "source": src, "timestamp": m.get("timestamp", now), "access_count": 0},
-                    f"{src}_{ms}_{tid}_{i}") for i, (text, src, meta) in enumerate(items) if text.strip()]
+                    f"{src}_{ns}_{next(self._id_counter)}") for text, src, meta in items if text.strip()]
         if not entries:
             return []
         docs, metas, ids = zip(*entries)
@@ -157,14 +301,42 @@ class MemoryService:
                 if not collection:
                     return []
                 collection.add(documents=list(docs), metadatas=list(metas), ids=list(ids))
+                self._query_cache.invalidate()
                 logger.debug(f"Batch added {len(ids)} memories (chunking={self._chunking_enabled})")
-                if collection.count() > MEMORY_PRUNE_THRESHOLD:
-                    self._prune_smart()
+                if self._note_added(collection, len(ids)) > MEMORY_PRUNE_THRESHOLD:
+                    self._schedule_prune()
             return list(ids)
         except Exception:
             logger.exception("Error batch adding memories")
             return []
 
+    def _note_added(self, collection, n: int) -> int:
+        """Advance the tracked collection size by n, reconciling with count() each recheck interval crossed."""
+        before, self._approx_count = self._approx_count, self._approx_count + n
+        if before // self._count_recheck_interval != self._approx_count // self._count_recheck_interval:
+            self._approx_count = collection.count()
+        return self._approx_count
+
+    def _schedule_prune(self) -> None:
+        """Queue a background prune pass, starting the worker on first use; no-op if one is pending."""
+        with self._maint_lock:
+            if self._maint_thread is None:
+                self._maint_thread = threading.Thread(target=self._maint_loop, name="memory-maint", daemon=True)
+                self._maint_thread.start()
+        with suppress(Full):
+            self._maint_queue.put_nowait(None)
+
+    def _maint_loop(self) -> None:
+        while True:
+            self._maint_queue.get()
+            try:
+                # Let a burst of writes settle so one pass covers all of them
+                time.sleep(self._maint_debounce)
+                self._prune_duplicates()
+                self._prune_smart()
+            finally:
+                self._maint_queue.task_done()
+
     def _chunk_items(self, items: list[tuple[str, str, dict | None]]) -> list[tuple[str, str, dict | None]]:
         """Apply semantic chunking to batch items, grouping by source."""
         # Group items by source for better chunking context
@@ -202,15 +374,12 @@ class MemoryService:
             return uniq
         try:
             sids = ids[:sample_size] if len(ids) > sample_size else ids
-            if not (docs := collection.get(ids=sids, include=["documents", "embeddings"]).get("documents", [])):
+            res = collection.get(ids=sids, include=["embeddings"])
+            if (embs := res.get("embeddings")) is None or len(embs) == 0:
                 return uniq
-            # Query each doc's neighbors to measure semantic density
-            for id_, doc in zip(sids, docs, strict=False):
-                if not doc:
-                    continue
-                res = collection.query(query_texts=[doc], n_results=min(UNIQUENESS_NEIGHBOR_COUNT, len(ids)), include=["distances"])
-                if not (dists := res.get("distances", [[]])[0]):
-                    continue
+            # One batched neighbour search for the whole sample instead of a query per document
+            hits = collection.query(query_embeddings=embs, n_results=min(UNIQUENESS_NEIGHBOR_COUNT, len(ids)), include=["distances"])
+            for id_, dists in zip(res.get("ids", sids), hits.get("distances") or [], strict=False):
                 # Avg distance to neighbors (excluding self at distance 0)
                 if distances := [d for d in dists if d > UNIQUENESS_DISTANCE_EPSILON]:
                     uniq[id_] = min(1.0, (sum(distances) / len(distances)) / (1.0 - self.CLUSTER_THRESHOLD))
@@ -224,8 +393,16 @@ class MemoryService:
             with self._pool.acquire() as (_, collection):
                 if not collection:
                     return
-                data = collection.get(include=["metadatas"])
-                ids, metas = data["ids"], data["metadatas"]
+                if collection.count() <= keep:
+                    return
+                # Page through metadata so no single get() materializes the whole collection
+                ids, metas = [], []
+                while True:
+                    page = collection.get(limit=MEMORY_PRUNE_PAGE_SIZE, offset=len(ids), include=["metadatas"])
+                    ids += page["ids"]
+                    metas += page["metadatas"]
+                    if len(page["ids"]) < MEMORY_PRUNE_PAGE_SIZE:
+                        break
                 if len(ids) <= keep:
                     return
                 now = time.time()
@@ -237,9 +414,16 @@ class MemoryService:
                 scored = [(id_, *self._compute_importance(ts, ac, uniq.get(id_, 1.0), now, max_age, max_access))
                           for id_, ts, ac in zip(ids, ts_list, ac_list, strict=True)]
                 protected = sum(1 for _, _, p in scored if p)
-                pruneable = sorted(((id_, sc) for id_, sc, p in scored if not p), key=lambda x: x[1])
-                if to_delete := [id_ for id_, _ in pruneable[:len(ids) - keep]]:
+                pruneable = [(id_, sc) for id_, sc, p in scored if not p]
+                # Only the set of lowest scores matters, not their order: O(n) partition instead of a full sort
+                if (n_delete := min(len(ids) - keep, len(pruneable))) < len(pruneable):
+                    scores = np.fromiter((sc for _, sc in pruneable), dtype=np.float64, count=len(pruneable))
+                    pruneable = [pruneable[i] for i in np.argpartition(scores, n_delete - 1)[:n_delete]]
+                if to_delete := [id_ for id_, _ in pruneable[:n_delete]]:
                     collection.delete(ids=to_delete)
+                    self._embeddings.discard(to_delete)
+                    self._approx_count -= len(to_delete)
+                    self._query_cache.invalidate()
                     logger.info(f"Pruned {len(to_delete)} memories ({protected} protected)")
         except Exception:
             logger.exception("Smart pruning failed")
@@ -251,49 +435,92 @@ class MemoryService:
             with self._pool.acquire() as (_, collection):
                 if not collection:
                     return
-                data = collection.get(include=["documents", "metadatas"])
-                ids, docs, metas = data["ids"], data["documents"], data["metadatas"]
+                # Metadata alone picks the sample; documents are fetched for sampled rows only
+                data = collection.get(include=["metadatas"])
+                ids, metas = data["ids"], data["metadatas"]
                 if len(ids) < 2:
                     return
-                # Sample recent memories to check for duplicates
-                sample = sorted(zip(ids, docs, metas, strict=True), key=lambda x: x[2].get("timestamp", 0), reverse=True)[:sample_size]
+                # Sample recent memories (newest first)
+                sample = sorted(zip(ids, metas, strict=True), key=lambda x: x[1].get("timestamp", 0), reverse=True)[:sample_size]
+                sample_meta = dict(sample)
+                got = collection.get(ids=list(sample_meta), include=["documents"])
+                docs = dict(zip(got["ids"], got.get("documents") or [], strict=False))
+                recent = [(id_, docs.get(id_), m) for id_, m in sample]
                 to_del: set[str] = set()
-                for id1, doc1, m1 in sample:
-                    if id1 in to_del:
-                        continue
-                    res = collection.query(query_texts=[doc1], n_results=DEDUP_NEIGHBOR_COUNT, include=["metadatas", "distances"])
-                    if not res["ids"] or not res["ids"][0]:
+                # Byte-identical retranscriptions resolve by hash; keep the higher access count, or the newer if tied
+                seen: dict[bytes, tuple[str, int]] = {}
+                for id_, doc, m in recent:
+                    if doc is None:
                         continue
-                    for idx, (rid, dist) in enumerate(zip(res["ids"][0], res["distances"][0], strict=True)):
-                        if rid == id1 or rid in to_del or (1.0 - dist) < thresh:
-                            continue
-                        # Keep the one with higher access count, or more recent if tied
-                        rm = res["metadatas"][0][idx] if res["metadatas"] else {}
-                        ac1, ac2 = m1.get("access_count", 0), rm.get("access_count", 0)
-                        ts1, ts2 = m1.get("timestamp", 0), rm.get("timestamp", 0)
-                        to_del.add(rid if (ac1 > ac2 or (ac1 == ac2 and ts1 >= ts2)) else id1)
+                    key, ac = hashlib.blake2s(doc.encode(), digest_size=8).digest(), m.get("access_count", 0)
+                    if (prev := seen.get(key)) is None:
+                        seen[key] = (id_, ac)
+                    elif prev[1] >= ac:
+                        to_del.add(id_)
+                    else:
+                        to_del.add(prev[0])
+                        seen[key] = (id_, ac)
+                if len(survivors := [id_ for id_, _, _ in recent if id_ not in to_del]) >= 2:
+                    to_del |= self._similar_losers(collection, survivors, sample_meta, thresh)
                 if to_del:
                     collection.delete(ids=list(to_del))
+                    self._embeddings.discard(to_del)
+                    self._approx_count -= len(to_del)
+                    self._query_cache.invalidate()
                     logger.info(f"Deduplicated {len(to_del)} redundant memories")
         except Exception:
             logger.exception("Deduplication failed")
 
+    def _similar_losers(self, collection, ids: list[str], metas: dict[str, dict], thresh: float) -> set[str]:
+        """Near-duplicates among ids (newest first) by pairwise cosine similarity of their embeddings."""
+        # Only ids missing from the sidecar are read out of Chroma; the rest come straight from the memmap
+        if missing := [id_ for id_, row in zip(ids, self._embeddings.rows(ids), strict=True) if row is None]:
+            res = collection.get(ids=missing, include=["embeddings"])
+            if (embs := res.get("embeddings")) is not None and len(embs) == len(res["ids"]):
+                self._embeddings.put(res["ids"], embs)
+        found = [(id_, row) for id_, row in zip(ids, self._embeddings.rows(ids), strict=True) if row is not None]
+        if len(found) < 2:
+            return set()
+        sids = [id_ for id_, _ in found]
+        smetas = [metas.get(id_, {}) for id_ in sids]
+        emb = self._embeddings.matrix([row for _, row in found])
+        emb /= np.linalg.norm(emb, axis=1, keepdims=True) + 1e-8
+        sim = emb @ emb.T
+        access = np.array([m.get("access_count", 0) for m in smetas])
+        ts = np.array([m.get("timestamp", 0) for m in smetas], dtype=np.float64)
+        # Upper triangle: each pair once; keep the higher access count, or the more recent if tied
+        rows, cols = np.nonzero(np.triu(sim >= thresh, k=1))
+        keep_row = (access[rows] > access[cols]) | ((access[rows] == access[cols]) & (ts[rows] >= ts[cols]))
+        losers: set[str] = set()
+        for i, j, row_wins in zip(rows.tolist(), cols.tolist(), keep_row.tolist(), strict=True):
+            if sids[i] not in losers and sids[j] not in losers:
+                losers.add(sids[j] if row_wins else sids[i])
+        return losers
+
     def query_memory(self, query_text: str, n_results: int = MEMORY_QUERY_DEFAULT_RESULTS, filter_metadata: dict | None = None) -> list[str]:
         """Search for relevant memories and increment their access counts."""
+        self._try_flush("Pre-query memory flush")  # Pending writes must be visible to the query
+        bucket = (n_results, json.dumps(filter_metadata, sort_keys=True, default=str))
+        key = " ".join(query_text.lower().split())
         try:
             with self._pool.acquire() as (_, collection):
                 if not collection:
                     return []
-                res = collection.query(query_texts=[query_text], n_results=n_results, where=filter_metadata, include=["documents", "metadatas"])
-                if not res or not res["documents"]:
-                    return []
-                # Increment access counts for retrieved memories
+                if (hit := self._query_cache.get(bucket, key)) is None:
+                    res = collection.query(query_texts=[query_text], n_results=n_results, where=filter_metadata, include=["documents", "metadatas"])
+                    if not res or not res["documents"] or not res["documents"][0]:
+                        return []
+                    hit = (res.get("ids", [[]])[0], res["documents"][0], list(res.get("metadatas", [[]])[0]))
+                    self._query_cache.put(bucket, key, hit)
+                ids, docs, metas = hit
+                # Increment access counts for retrieved memories (cached metadata tracks the new counts)
                 try:
-                    for id_, m in zip(res["ids"][0], res["metadatas"][0], strict=True):
-                        collection.update(ids=[id_], metadatas=[{**m, "access_count": m.get("access_count", 0) + 1}])
+                    for i, id_ in enumerate(ids):
+                        metas[i] = {**metas[i], "access_count": metas[i].get("access_count", 0) + 1}
+                        collection.update(ids=[id_], metadatas=[metas[i]])
                 except Exception:
                     logger.debug("Failed to update access counts", exc_info=True)
-                return res["documents"][0]
+                return list(docs)
         except MemoryError:
             raise
         except Exception as e:
@@ -1,6 +1,6 @@
 """OCR service for text extraction."""
 
-from app.services.ocr.service import OCRService
+from app.services.ocr.service import OCRService, decode_image
 
-__all__ = ["OCRService"]
+__all__ = ["OCRService", "decode_image"]
 
@@ -1,47 +1,168 @@
 import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import numpy as np
 from PIL import Image
 
 import app.pb.cognition_pb2 as pb
 from app.core import OCRError, get_logger
+from app.services.constants import OCR_MAX_DIM, OCR_PROCESS_WORKERS
 
 logger = get_logger(__name__)
 
+# OCR gets its own workers so it never queues behind other run_in_executor(None, ...) work
+_OCR_WORKERS = min(4, os.cpu_count() or 1)
+_OCR_POOL = ThreadPoolExecutor(max_workers=_OCR_WORKERS, thread_name_prefix="ocr")
 
-class OCRService:
-    def __init__(self) -> None:
-        self._engine = None
+# One RapidOCR engine (ONNX Runtime sessions + model weights) shared by every OCRService
+_ENGINE = None
+_ENGINE_LOCK = threading.Lock()
 
-    @property
-    def engine(self):
-        """Lazy-load RapidOCR on first use."""
-        if self._engine is None:
+
+def _intra_op_threads() -> int:
+    """Per-session ORT intra-op threads: the cores split across the OCR workers."""
+    # ORT sizes each session's pool to every core by default, so parallel OCR calls would oversubscribe the CPU
+    return max(1, (os.cpu_count() or 1) // _OCR_WORKERS)
+
+
+def _get_engine():
+    """Create the shared RapidOCR engine on first use."""
+    global _ENGINE
+    with _ENGINE_LOCK:
+        if _ENGINE is None:
             try:
                 from rapidocr_onnxruntime import RapidOCR
-                self._engine = RapidOCR()
+                # RapidOCR already builds its sessions with ORT_ENABLE_ALL graph optimization
+                _ENGINE = RapidOCR(intra_op_num_threads=_intra_op_threads(), inter_op_num_threads=1)
                 logger.info("RapidOCR initialized.")
             except Exception as e:
                 logger.exception("RapidOCR init failed")
                 raise OCRError("Failed to initialize OCR engine", code=pb.OCR_INIT_FAILED, cause=e) from e
+        return _ENGINE
+
+
+# Opt-in process pool for many concurrent frames: pre/post-processing escapes the GIL, at the cost of IPC per frame
+_OCR_PROCPOOL: ProcessPoolExecutor | None = None
+_PROCPOOL_LOCK = threading.Lock()
+
+
+def _init_worker_engine() -> None:
+    """Load one engine per worker process up front so the first frame doesn't pay for it."""
+    _get_engine()
+
+
+def _get_procpool() -> ProcessPoolExecutor:
+    global _OCR_PROCPOOL
+    with _PROCPOOL_LOCK:
+        if _OCR_PROCPOOL is None:
+            _OCR_PROCPOOL = ProcessPoolExecutor(max_workers=OCR_PROCESS_WORKERS, initializer=_init_worker_engine)
+        return _OCR_PROCPOOL
+
+
+def _extract_bytes(data: bytes, mode: str, size: tuple[int, int], max_dim: int) -> str:
+    """Process-pool entry point; takes raw pixels rather than a pickled PIL image."""
+    return OCRService(max_dim=max_dim).extract_text(Image.frombytes(mode, size, data))
+
+
+def _extract_array(arr: np.ndarray, max_dim: int) -> str:
+    """Process-pool entry point for frames that are already arrays; ndarrays pickle as one raw buffer."""
+    return OCRService(max_dim=max_dim).extract_text(arr)
+
+
+def decode_image(data: bytes) -> np.ndarray:
+    """Decode encoded image bytes straight to the BGR uint8 array RapidOCR consumes, with no PIL round-trip."""
+    import cv2
+
+    if (arr := cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)) is None:
+        raise OCRError("Could not decode image", code=pb.OCR_INVALID_IMAGE)
+    return arr
+
+
+def _to_engine_array(image: Image.Image) -> np.ndarray:
+    """uint8 array in a layout RapidOCR takes as-is: BGR, or L/RGBA which it converts to BGR itself."""
+    if image.mode not in ("L", "RGB", "RGBA"):
+        image = image.convert("RGB")
+    if image.mode == "RGB":
+        # 3-channel input is assumed BGR; Pillow's raw encoder swaps channels while packing, in one pass
+        return np.frombuffer(image.tobytes("raw", "BGR"), dtype=np.uint8).reshape(image.height, image.width, 3)
+    return np.asarray(image, dtype=np.uint8)
+
+
+def _box_rects(boxes: list, inv_scale: float) -> np.ndarray:
+    """(N, 4) int [x1, y1, x2, y2] of each detection polygon, in original-image pixels."""
+    corners = np.asarray(boxes, dtype=np.float64)  # (N, points, 2)
+    return (np.concatenate((corners.min(axis=1), corners.max(axis=1)), axis=1) * inv_scale).astype(np.int64)
+
+
+class OCRService:
+    def __init__(self, max_dim: int = OCR_MAX_DIM, use_processes: bool = False) -> None:
+        self._engine = None
+        self.max_dim, self.use_processes = max_dim, use_processes
+
+    @property
+    def engine(self):
+        """Lazy-load the shared RapidOCR engine on first use."""
+        if self._engine is None:
+            self._engine = _get_engine()
         return self._engine
 
-    def extract_text(self, image: Image.Image) -> str:
-        if not image:
+    def warmup(self) -> None:
+        """Load the shared engine and run one blank frame through detection."""
+        self.extract_text(np.zeros((320, 320, 3), dtype=np.uint8))
+
+    def extract_text(self, image: Image.Image | np.ndarray | None) -> str:
+        """OCR a PIL image or a BGR/grayscale uint8 array; arrays skip PIL conversion entirely."""
+        if image is None:
             return ""
         try:
-            if not (result := self.engine(np.array(image))[0]):
-                return ""
-            return "\n".join(
-                f"[{int(min(p[0] for p in r[0]))}, {int(min(p[1] for p in r[0]))}, {int(max(p[0] for p in r[0]))}, {int(max(p[1] for p in r[0]))}] {r[1]}"
-                for r in result
-                if r[1]
-            )
+            return self._extract_from_array(*self._prepare(image))
         except OCRError:
             raise
         except Exception as e:
             logger.exception("OCR Error")
             raise OCRError("Text extraction failed", code=pb.OCR_EXTRACT_FAILED, cause=e) from e
 
-    async def extract_text_async(self, image: Image.Image) -> str:
-        return "" if not image else await asyncio.get_running_loop().run_in_executor(None, self.extract_text, image)
+    def _prepare(self, image: Image.Image | np.ndarray) -> tuple[np.ndarray, float]:
+        """Engine-ready array plus the factor mapping its pixels back to the original image."""
+        if isinstance(image, np.ndarray):
+            return self._prepare_array(image)
+        # Detector cost is O(H*W); area-average the long side down to max_dim and map boxes back
+        scale = min(1.0, self.max_dim / max(image.size))
+        if scale < 1.0:
+            image = image.resize((round(image.width * scale), round(image.height * scale)), Image.Resampling.BOX)
+        return _to_engine_array(image), 1.0 / scale
+
+    def _prepare_array(self, arr: np.ndarray) -> tuple[np.ndarray, float]:
+        h, w = arr.shape[:2]
+        scale = min(1.0, self.max_dim / max(h, w))
+        if scale < 1.0:
+            import cv2
+
+            # INTER_AREA is the cv2 counterpart of PIL's BOX filter for downscaling
+            arr = cv2.resize(arr, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA)
+        return np.ascontiguousarray(arr, dtype=np.uint8), 1.0 / scale
+
+    def _extract_from_array(self, arr: np.ndarray, inv_scale: float = 1.0) -> str:
+        if not (result := self.engine(arr)[0]):
+            return ""
+        if not (regions := [(box, text) for box, text, *_ in result if text]):
+            return ""
+        boxes, texts = zip(*regions, strict=True)
+        # One vectorized min/max over all polygons instead of a Python loop per region
+        rects = _box_rects(list(boxes), inv_scale).tolist()
+        return "\n".join([f"[{x1}, {y1}, {x2}, {y2}] {text}" for (x1, y1, x2, y2), text in zip(rects, texts, strict=True)])
+
+    async def extract_text_async(self, image: Image.Image | np.ndarray | None) -> str:
+        if image is None:
+            return ""
+        loop = asyncio.get_running_loop()
+        if self.use_processes:
+            if isinstance(image, np.ndarray):
+                return await loop.run_in_executor(_get_procpool(), _extract_array, image, self.max_dim)
+            return await loop.run_in_executor(
+                _get_procpool(), _extract_bytes, image.tobytes(), image.mode, image.size, self.max_dim
+            )
+        # Preprocessing stays on the worker too; resizing a large frame would otherwise block the event loop
+        return await loop.run_in_executor(_OCR_POOL, self.extract_text, image)
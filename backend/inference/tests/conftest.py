@@ -1,33 +1,104 @@
 """Test fixtures for inference services."""
 
-from unittest.mock import MagicMock
-
+import asyncio
+import os
+import sys
+from types import MappingProxyType, SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+# Preload heavy LangChain providers once so patch() targets don't pay a cold import inside a test body
+import langchain_google_genai  # noqa: F401
+import langchain_ollama  # noqa: F401
 import numpy as np
 import pytest
 from PIL import Image
 
+import app.core.config as cfg_module
+import app.services.llm  # noqa: F401
+import app.services.memory.service as memory_module
+import app.services.ocr.service as ocr_module
+from app.services.memory import ChromaPool, MemoryService
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _env_baseline():
+    """Snapshot os.environ once and restore it at session end; tests mutate env via monkeypatch."""
+    base = os.environ.copy()
+    yield
+    os.environ.clear()
+    os.environ.update(base)
+
+
+@pytest.fixture(scope="session")
+def event_loop_policy():
+    """Run async tests on uvloop, as the server does, when it is installed."""
+    try:
+        import uvloop
+    except ImportError:
+        return asyncio.get_event_loop_policy()
+    return uvloop.EventLoopPolicy()
+
 
 @pytest.fixture(autouse=True)
 def reset_config_singleton():
     """Reset config singleton between tests to ensure clean state."""
-    import app.core.config as cfg_module
     cfg_module._config = None
     yield
     cfg_module._config = None
 
 
-@pytest.fixture
+@pytest.fixture(autouse=True)
+def reset_chroma_clients():
+    """Clear the shared ChromaDB client registry between tests."""
+    memory_module._CLIENT_REGISTRY.clear()
+    yield
+    memory_module._CLIENT_REGISTRY.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_ocr_engine():
+    """Reset the shared OCR engine so each test constructs its own."""
+    ocr_module._ENGINE = None
+    yield
+    ocr_module._ENGINE = None
+
+
+def _frozen_silence(samples: int) -> np.ndarray:
+    audio = np.zeros(samples, dtype=np.float32)
+    audio.flags.writeable = False
+    return audio
+
+
+@pytest.fixture(scope="session")
 def sample_audio():
-    """Generate sample audio data (1 second of silence at 16kHz)."""
-    return np.zeros(16000, dtype=np.float32)
+    """One second of silence at 16kHz, shared read-only across the session."""
+    return _frozen_silence(16000)
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
+def short_audio():
+    """1000 samples of silence, below the minimum length for a speaker embedding."""
+    return _frozen_silence(1000)
+
+
+@pytest.fixture(scope="session")
+def vad_chunk():
+    """One 512-sample VAD frame of silence."""
+    return np.zeros(512, dtype=np.float32)
+
+
+@pytest.fixture(scope="session")
 def sample_image():
-    """Generate a sample test image."""
+    """Sample test image, built once per session."""
     return Image.new("RGB", (100, 100), color="white")
 
 
+@pytest.fixture(scope="session")
+def large_rgb_image():
+    """4000x3000 RGB frame (~36MB) built once; image encoding and OCR only read their input, so it is shared."""
+    return Image.new("RGB", (4000, 3000), color="green")
+
+
 @pytest.fixture
 def mock_env(monkeypatch):
     """Set up mock environment variables."""
@@ -36,10 +107,17 @@ def mock_env(monkeypatch):
     monkeypatch.setenv("LLM_MODEL", "gemini-2.0-flash")
 
 
+@pytest.fixture(scope="module")
+def _rapidocr_engine():
+    """RapidOCR engine mock allocated once per module; mock_rapidocr resets it per test."""
+    return MagicMock()
+
+
 @pytest.fixture
-def mock_rapidocr():
+def mock_rapidocr(_rapidocr_engine):
     """Mock RapidOCR engine."""
-    mock = MagicMock()
+    mock = _rapidocr_engine
+    mock.reset_mock(return_value=True, side_effect=True)
     # Return sample OCR results: list of (bbox, text, confidence)
     mock.return_value = (
         [
@@ -51,57 +129,196 @@ def mock_rapidocr():
     return mock
 
 
-@pytest.fixture
-def mock_chromadb():
-    """Mock ChromaDB collection."""
-    mock = MagicMock()
-    mock.add = MagicMock()
-    mock.query = MagicMock(
-        return_value={
-            "ids": [["id_1", "id_2"]],
-            "documents": [["Relevant memory 1", "Relevant memory 2"]],
-            "metadatas": [[{"source": "audio", "access_count": 0}, {"source": "screen", "access_count": 0}]],
-            "distances": [[0.1, 0.2]],
-        }
+@pytest.fixture(scope="module")
+def _chroma_collection():
+    """Collection mock tree allocated once per module; mock_chromadb resets it per test."""
+    return SimpleNamespace(
+        add=MagicMock(), query=MagicMock(), count=MagicMock(), get=MagicMock(), delete=MagicMock(), update=MagicMock()
     )
-    mock.count = MagicMock(return_value=100)
-    mock.get = MagicMock(return_value={"ids": [], "metadatas": []})
-    mock.delete = MagicMock()
-    mock.update = MagicMock()
-    return mock
 
 
 @pytest.fixture
-def mock_whisper_model():
-    """Mock Whisper model."""
-    mock = MagicMock()
-    segment = MagicMock()
-    segment.text = "Hello, this is a test."
-    mock.transcribe = MagicMock(return_value=([segment], MagicMock(language_probability=0.98)))
-    return mock
+def mock_chromadb(_chroma_collection):
+    """Mock ChromaDB collection exposing only the methods MemoryService calls."""
+    for method in vars(_chroma_collection).values():
+        method.reset_mock(return_value=True, side_effect=True)
+    _chroma_collection.query.return_value = {
+        "ids": [["id_1", "id_2"]],
+        "documents": [["Relevant memory 1", "Relevant memory 2"]],
+        "metadatas": [[{"source": "audio", "access_count": 0}, {"source": "screen", "access_count": 0}]],
+        "distances": [[0.1, 0.2]],
+    }
+    _chroma_collection.count.return_value = 100
+    _chroma_collection.get.return_value = {"ids": [], "metadatas": []}
+    return _chroma_collection
+
+
+@pytest.fixture(scope="session")
+def prune_payload_10k():
+    """Read-only collection.get() payload: 10001 never-accessed memories, just over the prune threshold.
+
+    Per-memory metadata stays a plain dict (pruning only reads it via .get) to keep the payload small.
+    """
+    return MappingProxyType({
+        "ids": tuple(f"audio_{i}" for i in range(10001)),
+        "metadatas": tuple({"timestamp": i, "access_count": 0} for i in range(10001)),
+        "documents": (),
+    })
+
+
+@pytest.fixture(scope="session")
+def prune_payload_6k():
+    """Read-only collection.get() payload: 6000 memories with access counts cycling 0-9."""
+    return MappingProxyType({
+        "ids": tuple(f"audio_{i}" for i in range(6000)),
+        "metadatas": tuple({"timestamp": i, "access_count": i % 10} for i in range(6000)),
+        "documents": (),
+    })
 
 
 @pytest.fixture
-def mock_vad_model():
-    """Mock Silero VAD model."""
-    mock = MagicMock()
-    mock.return_value = MagicMock(item=MagicMock(return_value=0.8))
-    mock.reset_states = MagicMock()
-    return mock
+def paged_get(mock_chromadb):
+    """Serve a collection.get payload through limit/offset pages and report its size from count()."""
+
+    def _install(payload):
+        mock_chromadb.count.return_value = len(payload["ids"])
+
+        def _get(ids=None, limit=None, offset=0, include=None):
+            if ids is not None or limit is None:
+                return payload
+            return {k: v[offset : offset + limit] for k, v in payload.items()}
+
+        mock_chromadb.get.side_effect = _get
+        return mock_chromadb
+
+    return _install
+
+
+@pytest.fixture(scope="module")
+def _chromadb_stub(_chroma_collection):
+    """Stand-in chromadb module installed once per test module rather than patched per test.
+
+    Every PersistentClient hands out the module's shared collection mock; tests that need their own
+    client class still monkeypatch sys.modules["chromadb"] on top of it.
+    """
+    client = SimpleNamespace(get_or_create_collection=lambda **_: _chroma_collection)
+    with patch.dict(sys.modules, {"chromadb": SimpleNamespace(PersistentClient=lambda **_: client)}):
+        yield client
 
 
 @pytest.fixture
-def mock_llm():
-    """Mock LLM for streaming responses."""
-    mock = MagicMock()
+def patched_chromadb(_chromadb_stub, mock_chromadb):
+    """Route ChromaPool clients to mock_chromadb instead of a real PersistentClient."""
+    return mock_chromadb
 
-    async def mock_astream(messages):
-        chunks = ["Hello", ", ", "world", "!"]
-        for chunk in chunks:
-            yield MagicMock(content=chunk)
 
-    mock.astream = mock_astream
-    return mock
+@pytest.fixture
+def failing_chromadb(monkeypatch):
+    """Make ChromaPool client creation fail."""
+
+    def _fail(self):
+        raise Exception("Failed")
+
+    monkeypatch.setattr(ChromaPool, "_create_client", _fail)
+
+
+@pytest.fixture
+def memory_service(patched_chromadb, tmp_path):
+    """MemoryService backed by mock_chromadb, with a per-test persistence dir so xdist workers never share one."""
+    service = MemoryService(persistence_path=str(tmp_path / "chroma"))
+    yield service
+    service.close()
+
+
+@pytest.fixture
+def added(mock_chromadb):
+    """Record (documents, metadatas, ids) for every collection.add call."""
+    captured: list[tuple[list, list, list]] = []
+    mock_chromadb.add.side_effect = lambda **kw: captured.append((kw["documents"], kw["metadatas"], kw["ids"]))
+    return captured
+
+
+@pytest.fixture(scope="module")
+def _whisper_model():
+    """Whisper model mock allocated once per module; mock_whisper_model resets it per test."""
+    return MagicMock()
+
+
+@pytest.fixture
+def mock_whisper_model(_whisper_model):
+    """Mock Whisper model; per-test transcribe overrides are cleared on teardown so they never leak."""
+    mock = _whisper_model
+    # Reset only the transcribe child: a deep return_value reset would also clear the mock's __bool__
+    mock.transcribe.reset_mock(return_value=True, side_effect=True)
+    mock.transcribe.return_value = (
+        [SimpleNamespace(text="Hello, this is a test.")],
+        SimpleNamespace(language_probability=0.98),
+    )
+    yield mock
+    mock.transcribe.reset_mock(return_value=True, side_effect=True)
+
+
+@pytest.fixture
+def mock_vad_session(monkeypatch):
+    """Mock Silero VAD ONNX session; onnxruntime and the model download are stubbed out."""
+    session = MagicMock()
+    session.run.return_value = (np.array([[0.8]]), np.zeros((2, 1, 128), dtype=np.float32))
+    ort = SimpleNamespace(SessionOptions=SimpleNamespace, InferenceSession=MagicMock(return_value=session))
+    monkeypatch.setitem(sys.modules, "onnxruntime", ort)
+    monkeypatch.setattr("app.services.audio.vad._model_path", lambda: "silero_vad.onnx")
+    return session
+
+
+class _ChunkStream:
+    """Async iterator over pre-built chunks; cheaper than spinning up an async generator per stream."""
+
+    __slots__ = ("_it",)
+
+    def __init__(self, chunks):
+        self._it = iter(chunks)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._it)
+        except StopIteration:
+            raise StopAsyncIteration from None
+
+
+class FakeLLM:
+    """Minimal chat model stub that streams fixed chunks and records the prompt."""
+
+    def __init__(self, chunks: list[str]):
+        self._chunks = tuple(SimpleNamespace(content=content, tool_call_chunks=[]) for content in chunks)
+        self.messages: list = []
+
+    def bind_tools(self, _tools):
+        return self
+
+    def astream(self, messages):
+        self.messages = messages
+        return _ChunkStream(self._chunks)
+
+
+class FailingLLM(FakeLLM):
+    """Chat model stub whose stream raises immediately."""
+
+    def __init__(self, error: Exception | None = None):
+        super().__init__([])
+        self._error = error or Exception("API Error")
+
+    async def astream(self, messages):
+        self.messages = messages
+        raise self._error
+        yield  # Make it a generator
+
+
+@pytest.fixture
+def mock_llm():
+    """Mock LLM for streaming responses."""
+    return FakeLLM(["Hello", ", ", "world", "!"])
 
 
 class MockSegment:
@@ -123,9 +340,9 @@ class MockDiarization:
             yield MockSegment(start, end), None, speaker
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_diarization_pipeline():
-    """Mock pyannote diarization pipeline."""
+    """Mock pyannote diarization pipeline (static output; tests never assert on its calls)."""
     mock = MagicMock()
     mock.to = MagicMock(return_value=mock)
     mock.return_value = MockDiarization([
@@ -135,7 +352,7 @@ def mock_diarization_pipeline():
     return mock
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_diarization_pipeline_multi():
     """Mock pipeline with multiple speakers."""
     mock = MagicMock()
@@ -149,7 +366,7 @@ def mock_diarization_pipeline_multi():
     return mock
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_diarization_pipeline_empty():
     """Mock pipeline with no speech detected."""
     mock = MagicMock()
@@ -5,6 +5,9 @@ from unittest.mock import MagicMock, patch
 import numpy as np
 import pytest
 
+from app.services.memory import chunker as chunker_module
+from app.services.memory.chunker import ChunkResult, SemanticChunker
+
 
 class TestSemanticChunker:
     """Tests for semantic chunking functionality."""
@@ -23,7 +26,6 @@ class TestSemanticChunker:
     @pytest.fixture
     def chunker(self, mock_sentence_transformer):
         """Create chunker with mocked model."""
-        from app.services.memory.chunker import SemanticChunker
         with patch("app.services.memory.chunker.SentenceTransformer", return_value=mock_sentence_transformer):
             c = SemanticChunker(similarity_threshold=0.5, min_chunk_size=20, max_chunk_size=200)
             c._model = mock_sentence_transformer
@@ -52,8 +54,6 @@ class TestSemanticChunker:
 
     def test_chunk_multiple_sentences_similar(self, mock_sentence_transformer):
         """Similar sentences are kept together."""
-        from app.services.memory.chunker import SemanticChunker
-        
         # Mock high similarity between all sentences
         base_embedding = np.ones(384) / np.sqrt(384)
         def high_sim_encode(texts, **kwargs):
@@ -70,8 +70,6 @@ class TestSemanticChunker:
 
     def test_chunk_multiple_sentences_dissimilar(self, mock_sentence_transformer):
         """Dissimilar sentences are split into chunks."""
-        from app.services.memory.chunker import SemanticChunker
-        
         # Mock low similarity - orthogonal embeddings
         def low_sim_encode(texts, **kwargs):
             embeddings = np.eye(max(len(texts), 384))[:len(texts), :384]
@@ -114,8 +112,6 @@ class TestSemanticChunker:
 
     def test_chunk_batch_merge_related(self, mock_sentence_transformer):
         """Merge related combines similar consecutive texts."""
-        from app.services.memory.chunker import SemanticChunker
-        
         base = np.ones(384) / np.sqrt(384)
         def high_sim_encode(texts, **kwargs):
             return np.tile(base, (len(texts), 1))
@@ -195,8 +191,6 @@ class TestSemanticChunker:
 
     def test_chunk_result_dataclass(self):
         """ChunkResult dataclass works correctly."""
-        from app.services.memory.chunker import ChunkResult
-        
         result = ChunkResult(chunks=["a", "b"], boundaries=[1])
         assert result.chunks == ["a", "b"]
         assert result.boundaries == [1]
@@ -216,8 +210,6 @@ class TestSemanticChunkerEdgeCases:
 
     def test_chunk_very_long_sentence(self, mock_model):
         """Very long sentence without breaks is handled."""
-        from app.services.memory.chunker import SemanticChunker
-        
         with patch("app.services.memory.chunker.SentenceTransformer", return_value=mock_model):
             chunker = SemanticChunker(max_chunk_size=100)
             chunker._model = mock_model
@@ -229,8 +221,6 @@ class TestSemanticChunkerEdgeCases:
 
     def test_chunk_unicode_text(self, mock_model):
         """Unicode text is handled correctly."""
-        from app.services.memory.chunker import SemanticChunker
-        
         with patch("app.services.memory.chunker.SentenceTransformer", return_value=mock_model):
             chunker = SemanticChunker()
             chunker._model = mock_model
@@ -240,8 +230,6 @@ class TestSemanticChunkerEdgeCases:
 
     def test_chunk_mixed_punctuation(self, mock_model):
         """Mixed punctuation is handled."""
-        from app.services.memory.chunker import SemanticChunker
-        
         with patch("app.services.memory.chunker.SentenceTransformer", return_value=mock_model):
             chunker = SemanticChunker()
             chunker._model = mock_model
@@ -251,8 +239,6 @@ class TestSemanticChunkerEdgeCases:
 
     def test_merge_related_single_text(self, mock_model):
         """Single text merge returns unchanged."""
-        from app.services.memory.chunker import SemanticChunker
-        
         with patch("app.services.memory.chunker.SentenceTransformer", return_value=mock_model):
             chunker = SemanticChunker()
             chunker._model = mock_model
@@ -262,8 +248,6 @@ class TestSemanticChunkerEdgeCases:
 
     def test_model_lazy_loading(self):
         """Model is loaded lazily."""
-        from app.services.memory.chunker import SemanticChunker
-        
         with patch("app.services.memory.chunker.SentenceTransformer") as mock_st:
             chunker = SemanticChunker()
             assert chunker._model is None
@@ -279,8 +263,6 @@ class TestGetChunkerSingleton:
 
     def test_get_chunker_returns_instance(self):
         """get_chunker returns a chunker instance."""
-        from app.services.memory import chunker as chunker_module
-        
         # Reset singleton
         chunker_module._chunker = None
         
@@ -290,8 +272,6 @@ class TestGetChunkerSingleton:
 
     def test_get_chunker_singleton(self):
         """get_chunker returns same instance."""
-        from app.services.memory import chunker as chunker_module
-        
         chunker_module._chunker = None
         
         with patch("app.services.memory.chunker.SentenceTransformer"):
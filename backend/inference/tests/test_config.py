@@ -1,11 +1,8 @@
 """Tests for centralized configuration."""
 
-import json
-import os
-from pathlib import Path
-
 import pytest
 
+import app.core.config as cfg_module
 from app.core.config import (
     AudioConfig,
     AutoAnswerConfig,
@@ -21,7 +18,7 @@ from app.core.config import (
 
 
 @pytest.fixture(autouse=True)
-def clean_env():
+def clean_env(monkeypatch):
     """Clear config-related env vars before each test."""
     env_vars = [
         "GRPC_PORT", "GRPC_MAX_WORKERS", "GRPC_SHUTDOWN_GRACE_PERIOD",
@@ -34,13 +31,10 @@ def clean_env():
         "AUTO_ANSWER_COOLDOWN", "MIN_QUESTION_LENGTH", "LOG_LEVEL", "LOG_FORMAT",
     ]
     for var in env_vars:
-        os.environ.pop(var, None)
+        monkeypatch.delenv(var, raising=False)
     # Reset singleton
-    import app.core.config as cfg_module
     cfg_module._config = None
     yield
-    for var in env_vars:
-        os.environ.pop(var, None)
     cfg_module._config = None
 
 
@@ -59,14 +53,14 @@ def test_load_defaults():
     assert cfg.logging.level == "INFO"
 
 
-def test_load_from_env():
+def test_load_from_env(monkeypatch):
     """Test that env vars override defaults."""
-    os.environ["GRPC_PORT"] = "50052"
-    os.environ["SAMPLE_RATE"] = "48000"
-    os.environ["VAD_THRESHOLD"] = "0.7"
-    os.environ["LLM_PROVIDER"] = "ollama"
-    os.environ["AUTO_ANSWER_ENABLED"] = "false"
-    os.environ["LOG_LEVEL"] = "debug"
+    monkeypatch.setenv("GRPC_PORT", "50052")
+    monkeypatch.setenv("SAMPLE_RATE", "48000")
+    monkeypatch.setenv("VAD_THRESHOLD", "0.7")
+    monkeypatch.setenv("LLM_PROVIDER", "ollama")
+    monkeypatch.setenv("AUTO_ANSWER_ENABLED", "false")
+    monkeypatch.setenv("LOG_LEVEL", "debug")
     
     cfg = load_config()
     
@@ -78,36 +72,23 @@ def test_load_from_env():
     assert cfg.logging.level == "DEBUG"
 
 
-def test_validation_invalid_sample_rate():
-    """Test that invalid sample rate fails validation."""
-    os.environ["SAMPLE_RATE"] = "12345"
-    
-    with pytest.raises(ValueError, match="sample_rate"):
-        load_config()
-
-
-def test_validation_vad_threshold_out_of_range():
-    """Test that VAD threshold > 1 fails validation."""
-    os.environ["VAD_THRESHOLD"] = "1.5"
-    
-    with pytest.raises(ValueError, match="vad_threshold"):
-        load_config()
-
-
-def test_validation_screen_capture_rate_too_low():
-    """Test that capture rate < 0.1 fails validation."""
-    os.environ["SCREEN_CAPTURE_RATE"] = "0.05"
-    
-    with pytest.raises(ValueError, match="capture_rate"):
-        load_config()
-
+@pytest.mark.parametrize(
+    ("env", "match"),
+    [
+        pytest.param({"SAMPLE_RATE": "12345"}, "sample_rate", id="invalid-sample-rate"),
+        pytest.param({"VAD_THRESHOLD": "1.5"}, "vad_threshold", id="vad-threshold-above-1"),
+        pytest.param({"SCREEN_CAPTURE_RATE": "0.05"}, "capture_rate", id="capture-rate-below-0.1"),
+        pytest.param(
+            {"MEMORY_PRUNE_KEEP": "15000", "MEMORY_PRUNE_THRESHOLD": "10000"}, "prune_keep", id="prune-keep-over-threshold"
+        ),
+    ],
+)
+def test_validation_rejects_out_of_range(monkeypatch, env, match):
+    """Out-of-range settings fail validation, naming the offending field."""
+    for key, value in env.items():
+        monkeypatch.setenv(key, value)
 
-def test_validation_prune_keep_exceeds_threshold():
-    """Test that prune_keep >= prune_threshold fails validation."""
-    os.environ["MEMORY_PRUNE_KEEP"] = "15000"
-    os.environ["MEMORY_PRUNE_THRESHOLD"] = "10000"
-    
-    with pytest.raises(ValueError, match="prune_keep"):
+    with pytest.raises(ValueError, match=match):
         load_config()
 
 
@@ -119,9 +100,9 @@ def test_config_immutable():
         cfg.inference.grpc_port = 9999  # type: ignore[misc]
 
 
-def test_excluded_devices_parsing():
+def test_excluded_devices_parsing(monkeypatch):
     """Test comma-separated device list parsing."""
-    os.environ["EXCLUDED_AUDIO_DEVICES"] = "iphone, airpods, teams"
+    monkeypatch.setenv("EXCLUDED_AUDIO_DEVICES", "iphone, airpods, teams")
     
     cfg = load_config()
     
@@ -133,8 +114,9 @@ def test_excluded_devices_parsing():
 class TestSchemaDrift:
     """Tests ensuring Python config stays synchronized with schema.json."""
 
-    @pytest.fixture
+    @pytest.fixture(scope="class")
     def schema(self) -> dict:
+        """schema.json parsed once for the class; the drift tests only read it."""
         return get_schema()
 
     def test_inference_fields_match_schema(self, schema: dict):
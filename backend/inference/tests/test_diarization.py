@@ -1,8 +1,7 @@
 """Tests for DiarizationService."""
 
-from unittest.mock import MagicMock, patch
+from unittest.mock import patch
 
-import numpy as np
 import pytest
 
 from app.services.audio.diarization import DiarizationService, SpeakerSegment
@@ -17,34 +16,31 @@ class TestDiarizationService:
             service = DiarizationService(device="cpu", auth_token="test-token")
             assert service.pipeline is not None
 
-    def test_diarize_single_speaker(self, mock_diarization_pipeline):
+    def test_diarize_single_speaker(self, mock_diarization_pipeline, sample_audio):
         """diarize returns segments for single speaker."""
         with patch("app.services.audio.diarization.Pipeline.from_pretrained", return_value=mock_diarization_pipeline):
             service = DiarizationService()
-            audio = np.zeros(16000 * 5, dtype=np.float32)
-            segments = service.diarize(audio)
+            segments = service.diarize(sample_audio)
 
             assert len(segments) == 2
             assert segments[0].speaker == "SPEAKER_00"
             assert segments[0].start == 0.0
             assert segments[0].end == 2.5
 
-    def test_diarize_multiple_speakers(self, mock_diarization_pipeline_multi):
+    def test_diarize_multiple_speakers(self, mock_diarization_pipeline_multi, sample_audio):
         """diarize handles multiple speakers."""
         with patch("app.services.audio.diarization.Pipeline.from_pretrained", return_value=mock_diarization_pipeline_multi):
             service = DiarizationService()
-            audio = np.zeros(16000 * 10, dtype=np.float32)
-            segments = service.diarize(audio, min_speakers=2, max_speakers=3)
+            segments = service.diarize(sample_audio, min_speakers=2, max_speakers=3)
 
             speakers = {s.speaker for s in segments}
             assert len(speakers) >= 2
 
-    def test_diarize_empty_audio(self, mock_diarization_pipeline_empty):
+    def test_diarize_empty_audio(self, mock_diarization_pipeline_empty, sample_audio):
         """diarize handles empty/silent audio."""
         with patch("app.services.audio.diarization.Pipeline.from_pretrained", return_value=mock_diarization_pipeline_empty):
             service = DiarizationService()
-            audio = np.zeros(16000, dtype=np.float32)
-            segments = service.diarize(audio)
+            segments = service.diarize(sample_audio)
 
             assert segments == []
 
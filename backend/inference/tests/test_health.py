@@ -1,7 +1,6 @@
 """Tests for health check service."""
 
-import time
-from unittest.mock import MagicMock
+from types import SimpleNamespace
 
 from grpc_health.v1 import health_pb2
 
@@ -11,13 +10,13 @@ from app.services.health import HealthServicer, create_health_servicer
 class TestHealthServicer:
     def test_initial_status_serving(self):
         servicer = HealthServicer()
-        request = MagicMock(service="")
+        request = SimpleNamespace(service="")
         response = servicer.Check(request, None)
         assert response.status == health_pb2.HealthCheckResponse.SERVING
 
     def test_unknown_service(self):
         servicer = HealthServicer()
-        request = MagicMock(service="unknown.Service")
+        request = SimpleNamespace(service="unknown.Service")
         response = servicer.Check(request, None)
         assert response.status == health_pb2.HealthCheckResponse.SERVICE_UNKNOWN
 
@@ -25,7 +24,7 @@ class TestHealthServicer:
         servicer = HealthServicer()
         servicer.register_checker("test.Service", lambda: True)
         servicer.check_all()
-        request = MagicMock(service="test.Service")
+        request = SimpleNamespace(service="test.Service")
         response = servicer.Check(request, None)
         assert response.status == health_pb2.HealthCheckResponse.SERVING
 
@@ -33,7 +32,7 @@ class TestHealthServicer:
         servicer = HealthServicer()
         servicer.register_checker("test.Service", lambda: False)
         servicer.check_all()
-        request = MagicMock(service="test.Service")
+        request = SimpleNamespace(service="test.Service")
         response = servicer.Check(request, None)
         assert response.status == health_pb2.HealthCheckResponse.NOT_SERVING
 
@@ -41,7 +40,7 @@ class TestHealthServicer:
         servicer = HealthServicer()
         servicer.register_checker("test.Service", lambda: 1 / 0)
         servicer.check_all()
-        request = MagicMock(service="test.Service")
+        request = SimpleNamespace(service="test.Service")
         response = servicer.Check(request, None)
         assert response.status == health_pb2.HealthCheckResponse.NOT_SERVING
 
@@ -50,7 +49,7 @@ class TestHealthServicer:
         servicer.register_checker("healthy.Service", lambda: True, required=True)
         servicer.register_checker("unhealthy.Service", lambda: False, required=True)
         servicer.check_all()
-        request = MagicMock(service="")
+        request = SimpleNamespace(service="")
         response = servicer.Check(request, None)
         assert response.status == health_pb2.HealthCheckResponse.NOT_SERVING
 
@@ -59,7 +58,7 @@ class TestHealthServicer:
         servicer.register_checker("healthy.Service", lambda: True, required=True)
         servicer.register_checker("optional.Service", lambda: False, required=False)
         servicer.check_all()
-        request = MagicMock(service="")
+        request = SimpleNamespace(service="")
         response = servicer.Check(request, None)
         assert response.status == health_pb2.HealthCheckResponse.SERVING
 
@@ -69,14 +68,14 @@ class TestLiveEndpoint:
         """Live endpoint returns SERVING regardless of model state."""
         servicer = HealthServicer()
         servicer.register_checker("test.Service", lambda: False, required=True)
-        request = MagicMock(service="live")
+        request = SimpleNamespace(service="live")
         response = servicer.Check(request, None)
         assert response.status == health_pb2.HealthCheckResponse.SERVING
 
     def test_live_with_no_checkers(self):
         """Live endpoint works without any registered checkers."""
         servicer = HealthServicer()
-        request = MagicMock(service="live")
+        request = SimpleNamespace(service="live")
         response = servicer.Check(request, None)
         assert response.status == health_pb2.HealthCheckResponse.SERVING
 
@@ -86,7 +85,7 @@ class TestReadyEndpoint:
         servicer = HealthServicer()
         servicer.register_checker("svc1", lambda: True, required=True)
         servicer.register_checker("svc2", lambda: True, required=False)
-        request = MagicMock(service="ready")
+        request = SimpleNamespace(service="ready")
         response = servicer.Check(request, None)
         assert response.status == health_pb2.HealthCheckResponse.SERVING
 
@@ -94,7 +93,7 @@ class TestReadyEndpoint:
         servicer = HealthServicer()
         servicer.register_checker("required", lambda: False, required=True)
         servicer.register_checker("optional", lambda: True, required=False)
-        request = MagicMock(service="ready")
+        request = SimpleNamespace(service="ready")
         response = servicer.Check(request, None)
         assert response.status == health_pb2.HealthCheckResponse.NOT_SERVING
 
@@ -103,7 +102,7 @@ class TestReadyEndpoint:
         servicer = HealthServicer()
         servicer.register_checker("required", lambda: True, required=True)
         servicer.register_checker("optional", lambda: False, required=False)
-        request = MagicMock(service="ready")
+        request = SimpleNamespace(service="ready")
         response = servicer.Check(request, None)
         assert response.status == health_pb2.HealthCheckResponse.NOT_SERVING
 
@@ -117,13 +116,15 @@ class TestReadyEndpoint:
         servicer = HealthServicer(ready_ttl=60.0)
         servicer.register_checker("svc", counter, required=True)
 
-        request = MagicMock(service="ready")
+        request = SimpleNamespace(service="ready")
         servicer.Check(request, None)
         servicer.Check(request, None)
         servicer.Check(request, None)
         assert call_count == 1  # Only called once due to caching
 
-    def test_ready_cache_expires_after_ttl(self):
+    def test_ready_cache_expires_after_ttl(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr("app.services.health.service.time", SimpleNamespace(monotonic=lambda: now[0]))
         call_count = 0
         def counter():
             nonlocal call_count
@@ -133,9 +134,9 @@ class TestReadyEndpoint:
         servicer = HealthServicer(ready_ttl=0.1)
         servicer.register_checker("svc", counter, required=True)
 
-        request = MagicMock(service="ready")
+        request = SimpleNamespace(service="ready")
         servicer.Check(request, None)
-        time.sleep(0.15)  # Exceed TTL
+        now[0] += 0.15  # Exceed TTL
         servicer.Check(request, None)
         assert call_count == 2  # Called twice after cache expired
 
@@ -149,7 +150,7 @@ class TestReadyEndpoint:
         servicer = HealthServicer(ready_ttl=60.0)
         servicer.register_checker("svc", counter, required=True)
 
-        request = MagicMock(service="ready")
+        request = SimpleNamespace(service="ready")
         servicer.Check(request, None)
         servicer.invalidate_ready_cache()
         servicer.Check(request, None)
@@ -158,74 +159,65 @@ class TestReadyEndpoint:
     def test_ready_with_no_checkers_returns_serving(self):
         """Ready with no checkers assumes healthy."""
         servicer = HealthServicer()
-        request = MagicMock(service="ready")
+        request = SimpleNamespace(service="ready")
         response = servicer.Check(request, None)
         assert response.status == health_pb2.HealthCheckResponse.SERVING
 
     def test_ready_exception_marks_not_serving(self):
         servicer = HealthServicer()
         servicer.register_checker("broken", lambda: 1 / 0, required=True)
-        request = MagicMock(service="ready")
+        request = SimpleNamespace(service="ready")
         response = servicer.Check(request, None)
         assert response.status == health_pb2.HealthCheckResponse.NOT_SERVING
 
 
 class TestCreateHealthServicer:
     def test_with_transcription_service_available(self):
-        mock_svc = MagicMock()
-        mock_svc.model = MagicMock()  # Model is available
+        mock_svc = SimpleNamespace(model=object())  # Model is available
 
         servicer = create_health_servicer(transcription_svc=mock_svc)
-        request = MagicMock(service="cognition.TranscriptionService")
+        request = SimpleNamespace(service="cognition.TranscriptionService")
         response = servicer.Check(request, None)
         assert response.status == health_pb2.HealthCheckResponse.SERVING
 
     def test_with_transcription_service_unavailable(self):
-        mock_svc = MagicMock()
-        mock_svc.model = None  # Model not loaded
+        mock_svc = SimpleNamespace(model=None)  # Model not loaded
 
         servicer = create_health_servicer(transcription_svc=mock_svc)
-        request = MagicMock(service="cognition.TranscriptionService")
+        request = SimpleNamespace(service="cognition.TranscriptionService")
         response = servicer.Check(request, None)
         assert response.status == health_pb2.HealthCheckResponse.NOT_SERVING
 
     def test_with_llm_service_available(self):
-        mock_svc = MagicMock()
-        mock_svc.llm = MagicMock()
+        mock_svc = SimpleNamespace(llm=object())
 
         servicer = create_health_servicer(llm_svc=mock_svc)
-        request = MagicMock(service="cognition.LLMService")
+        request = SimpleNamespace(service="cognition.LLMService")
         response = servicer.Check(request, None)
         assert response.status == health_pb2.HealthCheckResponse.SERVING
 
     def test_with_ocr_service_available(self):
-        mock_svc = MagicMock()
-        mock_svc.engine = MagicMock()
+        mock_svc = SimpleNamespace(engine=object())
 
         servicer = create_health_servicer(ocr_svc=mock_svc)
-        request = MagicMock(service="cognition.OCRService")
+        request = SimpleNamespace(service="cognition.OCRService")
         response = servicer.Check(request, None)
         assert response.status == health_pb2.HealthCheckResponse.SERVING
 
     def test_with_vad_service_available(self):
-        mock_svc = MagicMock()
-        mock_svc.model = MagicMock()
+        mock_svc = SimpleNamespace(model=object())
 
         servicer = create_health_servicer(vad_svc=mock_svc)
-        request = MagicMock(service="cognition.VADService")
+        request = SimpleNamespace(service="cognition.VADService")
         response = servicer.Check(request, None)
         assert response.status == health_pb2.HealthCheckResponse.SERVING
 
     def test_overall_healthy_with_llm_unavailable(self):
         """LLM service is optional, overall health should pass without it."""
-        mock_transcription = MagicMock()
-        mock_transcription.model = MagicMock()
-        mock_vad = MagicMock()
-        mock_vad.model = MagicMock()
-        mock_ocr = MagicMock()
-        mock_ocr.engine = MagicMock()
-        mock_llm = MagicMock()
-        mock_llm.llm = None  # LLM not available
+        mock_transcription = SimpleNamespace(model=object())
+        mock_vad = SimpleNamespace(model=object())
+        mock_ocr = SimpleNamespace(engine=object())
+        mock_llm = SimpleNamespace(llm=None)  # LLM not available
 
         servicer = create_health_servicer(
             transcription_svc=mock_transcription,
@@ -233,6 +225,6 @@ class TestCreateHealthServicer:
             ocr_svc=mock_ocr,
             llm_svc=mock_llm,
         )
-        request = MagicMock(service="")
+        request = SimpleNamespace(service="")
         response = servicer.Check(request, None)
         assert response.status == health_pb2.HealthCheckResponse.SERVING
@@ -1,236 +1,219 @@
 """Tests for LLMService."""
 
-import os
-from unittest.mock import MagicMock, patch
+import asyncio
+import io
+from types import SimpleNamespace
+from unittest.mock import patch
 
+import pybase64
 import pytest
 from PIL import Image
 
+from app.services.llm import LLMService
+from app.services.llm.service import IMAGE_MAX_DIM
+from tests.conftest import FailingLLM, FakeLLM
+
+
+class _MemStub:
+    """Memory service stub that records query_memory calls."""
+
+    def __init__(self, results=()):
+        self._results = list(results)
+        self.calls: list[tuple[str, int]] = []
+
+    def query_memory(self, query, n_results=3):
+        self.calls.append((query, n_results))
+        return self._results
+
+
+async def _collect(agen):
+    """Drain an async generator into a list."""
+    return [c async for c in agen]
+
+
+@pytest.fixture(scope="module")
+def unknown_service():
+    """Shared LLMService with an unknown provider (llm is None); mutate only via monkeypatch."""
+    return LLMService(provider="unknown")
+
+
+@pytest.fixture(scope="session")
+def small_rgb_image():
+    """50x50 RGB image shared across tests."""
+    return Image.new("RGB", (50, 50), color="blue")
+
+
+@pytest.fixture(scope="session")
+def tiny_rgb_image():
+    """10x10 RGB image shared across tests."""
+    return Image.new("RGB", (10, 10), color="red")
+
+
+@pytest.fixture(scope="module")
+def _gemini_cls():
+    """ChatGoogleGenerativeAI patched once per module; gemini resets it per test."""
+    with patch("langchain_google_genai.ChatGoogleGenerativeAI") as MockGemini:
+        yield MockGemini
+
+
+@pytest.fixture
+def gemini(mock_env, _gemini_cls):
+    """Patched ChatGoogleGenerativeAI with a Gemini API key set (mock_env) and no calls or return value carried over."""
+    _gemini_cls.reset_mock(return_value=True, side_effect=True)
+    return _gemini_cls
+
 
 class TestLLMService:
     """Tests for LLM analysis service."""
 
-    def test_init_gemini(self):
+    def test_init_gemini(self, gemini):
         """LLMService initializes Gemini provider."""
-        from app.services.llm import LLMService
-
-        with patch.dict(os.environ, {"GOOGLE_API_KEY": "test-key"}):
-            with patch("langchain_google_genai.ChatGoogleGenerativeAI") as MockGemini:
-                service = LLMService(provider="gemini", model_name="gemini-2.0-flash")
+        service = LLMService(provider="gemini", model_name="gemini-2.0-flash")
 
-                assert service.provider == "gemini"
-                MockGemini.assert_called_once_with(model="gemini-2.0-flash", stream=True)
+        assert service.provider == "gemini"
+        gemini.assert_called_once_with(model="gemini-2.0-flash", stream=True)
 
     def test_init_ollama(self):
         """LLMService initializes Ollama provider."""
-        from app.services.llm import LLMService
-
         with patch("langchain_ollama.ChatOllama") as MockOllama:
             service = LLMService(provider="ollama", model_name="llama2")
 
             assert service.provider == "ollama"
             MockOllama.assert_called_once()
 
-    def test_init_no_api_key(self):
+    def test_init_no_api_key(self, gemini, monkeypatch):
         """LLMService handles missing API key for Gemini."""
-        from app.services.llm import LLMService
-
-        with patch.dict(os.environ, {}, clear=True):
-            # Clear any existing keys
-            os.environ.pop("GOOGLE_API_KEY", None)
-            os.environ.pop("GEMINI_API_KEY", None)
+        monkeypatch.delenv("GOOGLE_API_KEY", raising=False)
+        monkeypatch.delenv("GEMINI_API_KEY", raising=False)
 
-            with patch("langchain_google_genai.ChatGoogleGenerativeAI"):
-                service = LLMService(provider="gemini")
+        service = LLMService(provider="gemini")
 
-                assert service.llm is None
+        assert service.llm is None
 
-    def test_init_unknown_provider(self):
+    def test_init_unknown_provider(self, unknown_service):
         """LLMService returns None for unknown provider."""
-        from app.services.llm import LLMService
+        assert unknown_service.llm is None
 
-        service = LLMService(provider="unknown")
-
-        assert service.llm is None
-
-    @pytest.mark.asyncio
-    async def test_analyze_no_llm(self):
+    async def test_analyze_no_llm(self, unknown_service):
         """analyze yields error when LLM not configured."""
-        from app.services.llm import LLMService
-
-        service = LLMService(provider="unknown")
-
-        chunks = [c async for c in service.analyze("context", "query")]
+        chunks = await _collect(unknown_service.analyze("context", "query"))
 
         assert chunks == ["LLM not configured."]
 
-    @pytest.mark.asyncio
-    async def test_analyze_success(self):
+    async def test_analyze_success(self, gemini):
         """analyze streams response chunks."""
-        from app.services.llm import LLMService
+        gemini.return_value = FakeLLM(["Hello ", "World"])
 
-        async def mock_stream(*args, **kwargs):
-            for text in ["Hello ", "World"]:
-                chunk = MagicMock()
-                chunk.content = text
-                yield chunk
+        service = LLMService(provider="gemini")
+        chunks = await _collect(service.analyze("context", "What is this?"))
 
-        with patch.dict(os.environ, {"GOOGLE_API_KEY": "test-key"}):
-            with patch("langchain_google_genai.ChatGoogleGenerativeAI") as MockGemini:
-                mock_llm = MagicMock()
-                mock_llm.astream = mock_stream
-                MockGemini.return_value = mock_llm
+        assert chunks == ["Hello ", "World"]
 
-                service = LLMService(provider="gemini")
-                chunks = [c async for c in service.analyze("context", "What is this?")]
+    async def test_analyze_coalesces_chunks(self, gemini):
+        """analyze batches single-token chunks without losing or reordering text."""
+        text = "The quick brown fox jumps over the lazy dog. " * 4
+        gemini.return_value = FakeLLM(list(text))
 
-                assert chunks == ["Hello ", "World"]
+        service = LLMService(provider="gemini")
+        chunks = await _collect(service.analyze("context", "query"))
 
-    @pytest.mark.asyncio
-    async def test_analyze_with_image(self):
-        """analyze attaches image to message."""
-        from app.services.llm import LLMService
-
-        async def mock_stream(messages):
-            # Verify image was attached
-            last_msg = messages[-1]
-            assert isinstance(last_msg.content, list)
-            assert any(c.get("type") == "image_url" for c in last_msg.content)
-            chunk = MagicMock()
-            chunk.content = "Image analyzed"
-            yield chunk
-
-        with patch.dict(os.environ, {"GOOGLE_API_KEY": "test-key"}):
-            with patch("langchain_google_genai.ChatGoogleGenerativeAI") as MockGemini:
-                mock_llm = MagicMock()
-                mock_llm.astream = mock_stream
-                MockGemini.return_value = mock_llm
-
-                service = LLMService(provider="gemini")
-                image = Image.new("RGB", (100, 100), color="white")
-                chunks = [c async for c in service.analyze("context", "query", image)]
-
-                assert chunks == ["Image analyzed"]
-
-    @pytest.mark.asyncio
-    async def test_analyze_with_memory(self):
-        """analyze incorporates memory context."""
-        from app.services.llm import LLMService
-
-        captured_messages = []
+        assert "".join(chunks) == text
+        assert len(chunks) < len(text)
 
-        async def mock_stream(messages):
-            captured_messages.extend(messages)
-            chunk = MagicMock()
-            chunk.content = "Response"
-            yield chunk
+    async def test_analyze_flushes_buffered_text_during_stall(self, gemini):
+        """Text buffered before the provider stalls is delivered once the interval passes, not when the stall ends."""
+        release = asyncio.Event()
 
-        mock_memory = MagicMock()
-        mock_memory.query_memory.return_value = ["Previous coding session."]
+        class _StallingLLM(FakeLLM):
+            async def astream(self, messages):
+                for content in ("Hel", "lo"):
+                    yield SimpleNamespace(content=content, tool_call_chunks=[])
+                await release.wait()
+                yield SimpleNamespace(content=" world", tool_call_chunks=[])
 
-        with patch.dict(os.environ, {"GOOGLE_API_KEY": "test-key"}):
-            with patch("langchain_google_genai.ChatGoogleGenerativeAI") as MockGemini:
-                mock_llm = MagicMock()
-                mock_llm.astream = mock_stream
-                MockGemini.return_value = mock_llm
+        gemini.return_value = _StallingLLM([])
+        stream = LLMService(provider="gemini").analyze("context", "query")
 
-                service = LLMService(provider="gemini", memory_service=mock_memory)
-                chunks = [c async for c in service.analyze("context", "help with code")]
+        assert await anext(stream) == "Hel"
+        assert await asyncio.wait_for(anext(stream), timeout=1.0) == "lo"
+        release.set()
+        assert await _collect(stream) == [" world"]
 
-                mock_memory.query_memory.assert_called_once_with("help with code", n_results=5)
+    async def test_analyze_with_image(self, gemini, sample_image):
+        """analyze attaches image to message."""
+        fake_llm = FakeLLM(["Image analyzed"])
+        gemini.return_value = fake_llm
 
-    @pytest.mark.asyncio
-    async def test_analyze_truncates_context(self):
-        """analyze truncates long context text."""
-        from app.services.llm import LLMService
+        service = LLMService(provider="gemini")
+        chunks = await _collect(service.analyze("context", "query", sample_image))
 
-        captured_messages = []
+        assert chunks == ["Image analyzed"]
+        # Verify image was attached
+        last_msg = fake_llm.messages[-1]
+        assert isinstance(last_msg.content, list)
+        assert any(c.get("type") == "image_url" for c in last_msg.content)
 
-        async def mock_stream(messages):
-            captured_messages.extend(messages)
-            chunk = MagicMock()
-            chunk.content = "Done"
-            yield chunk
+    async def test_analyze_with_memory(self, gemini):
+        """analyze incorporates memory context."""
+        mock_memory = _MemStub(["Previous coding session."])
+        gemini.return_value = FakeLLM(["Response"])
 
-        with patch.dict(os.environ, {"GOOGLE_API_KEY": "test-key"}):
-            with patch("langchain_google_genai.ChatGoogleGenerativeAI") as MockGemini:
-                mock_llm = MagicMock()
-                mock_llm.astream = mock_stream
-                MockGemini.return_value = mock_llm
+        service = LLMService(provider="gemini", memory_service=mock_memory)
+        chunks = await _collect(service.analyze("context", "help with code"))
 
-                service = LLMService(provider="gemini")
-                long_context = "x" * 10000  # Over 5000 char limit
-                chunks = [c async for c in service.analyze(long_context, "query")]
+        assert mock_memory.calls == [("help with code", 5)]
 
-                # Context should be truncated in the prompt
-                assert chunks == ["Done"]
+    def test_build_prompt_truncates_context(self, unknown_service):
+        """_build_prompt truncates long context text."""
+        long_context = "x" * 10000  # Over 5000 char limit
 
-    @pytest.mark.asyncio
-    async def test_analyze_exception(self):
-        """analyze handles LLM exceptions."""
-        from app.services.llm import LLMService
+        prompt = unknown_service._build_prompt(long_context, "query")[-1].content
 
-        async def mock_stream_error(*args, **kwargs):
-            raise Exception("API Error")
-            yield  # Make it a generator
+        assert "x" * 5000 in prompt
+        assert "x" * 5001 not in prompt
 
-        with patch.dict(os.environ, {"GOOGLE_API_KEY": "test-key"}):
-            with patch("langchain_google_genai.ChatGoogleGenerativeAI") as MockGemini:
-                mock_llm = MagicMock()
-                mock_llm.astream = mock_stream_error
-                MockGemini.return_value = mock_llm
+    async def test_analyze_exception(self, gemini):
+        """analyze handles LLM exceptions."""
+        gemini.return_value = FailingLLM()
 
-                service = LLMService(provider="gemini")
-                chunks = [c async for c in service.analyze("context", "query")]
+        service = LLMService(provider="gemini")
+        chunks = await _collect(service.analyze("context", "query"))
 
-                assert any("Error" in c for c in chunks)
+        assert any("Error" in c for c in chunks)
 
-    def test_encode_image(self):
+    def test_encode_image(self, unknown_service, tiny_rgb_image, monkeypatch):
         """_encode_image converts to base64."""
-        import base64
-
-        from app.services.llm import LLMService
-
-        service = LLMService(provider="unknown")
-        image = Image.new("RGB", (10, 10), color="red")
+        # Only the base64 wrapping is under test; the real JPEG encode is covered below
+        monkeypatch.setattr(Image.Image, "save", lambda self, buf, format=None, **kw: buf.write(b"\xff\xd8stub"))
 
-        result = service._encode_image(image)
+        result = unknown_service._encode_image(tiny_rgb_image)
 
         # Should be valid base64
-        decoded = base64.b64decode(result)
-        assert len(decoded) > 0
+        decoded = pybase64.b64decode(result, validate=True)
+        assert decoded.startswith(b"\xff\xd8")
 
-    def test_get_memory_context_no_service(self):
+    def test_get_memory_context_no_service(self, unknown_service):
         """_get_memory_context returns empty when no service."""
-        from app.services.llm import LLMService
-
-        service = LLMService(provider="unknown")
-
-        result = service._get_memory_context("query")
+        result = unknown_service._get_memory_context("query")
 
         assert result == ""
 
-    def test_get_memory_context_no_query(self):
+    def test_get_memory_context_no_query(self, unknown_service, monkeypatch):
         """_get_memory_context returns empty for empty query."""
-        from app.services.llm import LLMService
-
-        mock_memory = MagicMock()
-        service = LLMService(provider="unknown", memory_service=mock_memory)
+        mock_memory = _MemStub()
+        monkeypatch.setattr(unknown_service, "memory_service", mock_memory)
 
-        result = service._get_memory_context("")
+        result = unknown_service._get_memory_context("")
 
         assert result == ""
-        mock_memory.query_memory.assert_not_called()
+        assert mock_memory.calls == []
 
-    def test_get_memory_context_with_results(self):
+    def test_get_memory_context_with_results(self, unknown_service, monkeypatch):
         """_get_memory_context formats memory results."""
-        from app.services.llm import LLMService
+        mock_memory = _MemStub(["Memory 1", "Memory 2"])
+        monkeypatch.setattr(unknown_service, "memory_service", mock_memory)
 
-        mock_memory = MagicMock()
-        mock_memory.query_memory.return_value = ["Memory 1", "Memory 2"]
-        service = LLMService(provider="unknown", memory_service=mock_memory)
-
-        result = service._get_memory_context("test query")
+        result = unknown_service._get_memory_context("test query")
 
         assert "Relevant Past Context" in result
         assert "- Memory 1" in result
@@ -240,262 +223,202 @@ class TestLLMService:
 class TestLLMServiceOllama:
     """Tests specific to Ollama provider."""
 
-    def test_init_ollama_custom_host(self):
+    def test_init_ollama_custom_host(self, monkeypatch):
         """LLMService uses custom Ollama host."""
-        from app.services.llm import LLMService
-
-        with patch.dict(os.environ, {"OLLAMA_HOST": "http://custom:11434"}):
-            with patch("langchain_ollama.ChatOllama") as MockOllama:
-                service = LLMService(provider="ollama", model_name="llama2")
+        monkeypatch.setenv("OLLAMA_HOST", "http://custom:11434")
+        with patch("langchain_ollama.ChatOllama") as MockOllama:
+            service = LLMService(provider="ollama", model_name="llama2")
 
-                MockOllama.assert_called_once()
-                call_kwargs = MockOllama.call_args.kwargs
-                assert call_kwargs["base_url"] == "http://custom:11434"
+            MockOllama.assert_called_once()
+            call_kwargs = MockOllama.call_args.kwargs
+            assert call_kwargs["base_url"] == "http://custom:11434"
 
-    def test_init_ollama_default_host(self):
+    def test_init_ollama_default_host(self, monkeypatch):
         """LLMService uses default Ollama host when not specified."""
-        from app.services.llm import LLMService
-
-        with patch.dict(os.environ, {}, clear=True):
-            os.environ.pop("OLLAMA_HOST", None)
-            with patch("langchain_ollama.ChatOllama") as MockOllama:
-                service = LLMService(provider="ollama", model_name="llama2")
+        monkeypatch.delenv("OLLAMA_HOST", raising=False)
+        with patch("langchain_ollama.ChatOllama") as MockOllama:
+            service = LLMService(provider="ollama", model_name="llama2")
 
-                call_kwargs = MockOllama.call_args.kwargs
-                assert call_kwargs["base_url"] == "http://localhost:11434"
+            call_kwargs = MockOllama.call_args.kwargs
+            assert call_kwargs["base_url"] == "http://localhost:11434"
 
 
 class TestLLMServiceImageProcessing:
     """Tests for image processing in LLM."""
 
-    def test_encode_image_jpeg_output(self):
+    def test_encode_image_jpeg_output(self, unknown_service, small_rgb_image):
         """_encode_image outputs JPEG-encoded base64."""
-        import base64
+        result = unknown_service._encode_image(small_rgb_image)
+        decoded = pybase64.b64decode(result, validate=True)
 
-        from app.services.llm import LLMService
+        # JPEG magic bytes
+        assert decoded[:2] == b"\xff\xd8"
 
-        service = LLMService(provider="unknown")
-        image = Image.new("RGB", (50, 50), color="blue")
+    @pytest.mark.parametrize(("mode", "expected"), [("RGBA", "RGB"), ("P", "RGB"), ("L", "L")])
+    def test_encode_image_non_rgb_modes(self, unknown_service, mode, expected):
+        """_encode_image flattens alpha/palette frames to RGB and keeps grayscale as-is."""
+        result = unknown_service._encode_image(Image.new(mode, (20, 10)))
+        encoded = Image.open(io.BytesIO(pybase64.b64decode(result)))
 
-        result = service._encode_image(image)
-        decoded = base64.b64decode(result)
+        assert encoded.format == "JPEG"
+        assert encoded.mode == expected
 
-        # JPEG magic bytes
-        assert decoded[:2] == b"\xff\xd8"
+    def test_encode_image_transparent_png_on_white(self, unknown_service):
+        """Transparent pixels of a PNG come out white, not the black stored under them."""
+        png = io.BytesIO()
+        frame = Image.new("RGBA", (20, 10), (0, 0, 0, 0))
+        frame.paste((255, 0, 0, 255), (0, 0, 10, 10))
+        frame.save(png, format="PNG")
 
-    def test_encode_image_large_image(self):
-        """_encode_image handles large images."""
-        from app.services.llm import LLMService
+        result = unknown_service._encode_image(Image.open(png))
+        encoded = Image.open(io.BytesIO(pybase64.b64decode(result))).convert("RGB")
 
-        service = LLMService(provider="unknown")
-        large_image = Image.new("RGB", (4000, 3000), color="green")
+        assert all(c > 240 for c in encoded.getpixel((15, 5)))
+        r, g, b = encoded.getpixel((5, 5))
+        assert r > 200 and g < 60 and b < 60
 
-        result = service._encode_image(large_image)
+    def test_encode_image_reused_buffer_has_no_stale_tail(self, unknown_service, small_rgb_image, tiny_rgb_image):
+        """A small frame encoded after a larger one carries none of the larger frame's bytes."""
+        fresh = unknown_service._encode_image(tiny_rgb_image)
+        unknown_service._encode_image(small_rgb_image)
 
-        assert len(result) > 0
+        assert unknown_service._encode_image(tiny_rgb_image) == fresh
+        assert len(pybase64.b64decode(fresh)) < len(pybase64.b64decode(unknown_service._encode_image(small_rgb_image)))
 
-    def test_analyze_with_image_preserves_text(self):
-        """analyze with image preserves original text content in message."""
-        from unittest.mock import AsyncMock
+    @pytest.mark.slow
+    def test_encode_image_large_image(self, unknown_service, large_rgb_image):
+        """_encode_image handles large images."""
+        result = unknown_service._encode_image(large_rgb_image)
 
-        from app.services.llm import LLMService
+        assert len(result) > 0
 
-        async def run_test():
-            service = LLMService(provider="unknown")
-            service.llm = AsyncMock()
-            service.llm.astream = AsyncMock(return_value=iter([]))
+    @pytest.mark.slow
+    def test_encode_image_downscales_large(self, unknown_service, large_rgb_image):
+        """_encode_image caps the longest side and leaves the input image untouched."""
+        result = unknown_service._encode_image(large_rgb_image)
+        encoded = Image.open(io.BytesIO(pybase64.b64decode(result)))
 
-            image = Image.new("RGB", (10, 10))
-            # Just verify no exception is raised when image is provided
-            async for _ in service.analyze("context", "query", image):
-                pass
+        assert max(encoded.size) <= IMAGE_MAX_DIM
+        assert large_rgb_image.size == (4000, 3000)
 
-        import asyncio
+    async def test_analyze_with_image_preserves_text(self, unknown_service, tiny_rgb_image, monkeypatch):
+        """analyze with image preserves original text content in message."""
+        monkeypatch.setattr(unknown_service, "llm", FakeLLM([]))
 
-        asyncio.get_event_loop().run_until_complete(run_test())
+        # Just verify no exception is raised when image is provided
+        await _collect(unknown_service.analyze("context", "query", tiny_rgb_image))
 
 
 class TestLLMServiceContextHandling:
     """Tests for context handling."""
 
-    @pytest.mark.asyncio
-    async def test_analyze_empty_context(self):
+    async def test_analyze_empty_context(self, gemini):
         """analyze handles empty context text."""
-        from app.services.llm import LLMService
-
-        async def mock_stream(*args):
-            chunk = MagicMock()
-            chunk.content = "Response"
-            yield chunk
+        gemini.return_value = FakeLLM(["Response"])
 
-        with patch.dict(os.environ, {"GOOGLE_API_KEY": "test-key"}):
-            with patch("langchain_google_genai.ChatGoogleGenerativeAI") as MockGemini:
-                mock_llm = MagicMock()
-                mock_llm.astream = mock_stream
-                MockGemini.return_value = mock_llm
+        service = LLMService(provider="gemini")
+        chunks = await _collect(service.analyze("", "query"))
 
-                service = LLMService(provider="gemini")
-                chunks = [c async for c in service.analyze("", "query")]
+        assert chunks == ["Response"]
 
-                assert chunks == ["Response"]
-
-    @pytest.mark.asyncio
-    async def test_analyze_uses_default_query(self):
+    async def test_analyze_uses_default_query(self, gemini):
         """analyze uses default query when empty."""
-        from app.services.llm import LLMService
+        fake_llm = FakeLLM(["Done"])
+        gemini.return_value = fake_llm
 
-        captured = []
+        service = LLMService(provider="gemini")
+        _ = await _collect(service.analyze("context", ""))  # Empty query
 
-        async def mock_stream(messages):
-            captured.extend(messages)
-            chunk = MagicMock()
-            chunk.content = "Done"
-            yield chunk
+        # Template should use "Analyze this screen." as default
+        assert "Analyze this screen." in fake_llm.messages[-1].content
 
-        with patch.dict(os.environ, {"GOOGLE_API_KEY": "test-key"}):
-            with patch("langchain_google_genai.ChatGoogleGenerativeAI") as MockGemini:
-                mock_llm = MagicMock()
-                mock_llm.astream = mock_stream
-                MockGemini.return_value = mock_llm
+    async def test_analyze_prefix_is_stable_across_calls(self, gemini):
+        """analyze keeps the system prompt and screen context ahead of the query so the prefix is cacheable."""
+        fake_llm = FakeLLM(["Done"])
+        gemini.return_value = fake_llm
 
-                service = LLMService(provider="gemini")
-                _ = [c async for c in service.analyze("context", "")]  # Empty query
+        service = LLMService(provider="gemini")
+        await _collect(service.analyze("context", "first question"))
+        first = fake_llm.messages
+        await _collect(service.analyze("context", "second question"))
+        second = fake_llm.messages
 
-                # Template should use "Analyze this screen." as default
+        assert first[0].content == second[0].content
+        prefix = first[-1].content.split("User Query:")[0]
+        assert "context" in prefix
+        assert second[-1].content.startswith(prefix)
 
-    @pytest.mark.asyncio
-    async def test_analyze_with_none_image(self):
+    async def test_analyze_with_none_image(self, gemini):
         """analyze works with None image."""
-        from app.services.llm import LLMService
-
-        async def mock_stream(*args):
-            chunk = MagicMock()
-            chunk.content = "Response"
-            yield chunk
+        gemini.return_value = FakeLLM(["Response"])
 
-        with patch.dict(os.environ, {"GOOGLE_API_KEY": "test-key"}):
-            with patch("langchain_google_genai.ChatGoogleGenerativeAI") as MockGemini:
-                mock_llm = MagicMock()
-                mock_llm.astream = mock_stream
-                MockGemini.return_value = mock_llm
+        service = LLMService(provider="gemini")
+        chunks = await _collect(service.analyze("context", "query", None))
 
-                service = LLMService(provider="gemini")
-                chunks = [c async for c in service.analyze("context", "query", None)]
-
-                assert chunks == ["Response"]
+        assert chunks == ["Response"]
 
 
 class TestLLMServiceProviders:
     """Tests for provider selection."""
 
-    def test_gemini_api_key_from_gemini_env(self):
+    def test_gemini_api_key_from_gemini_env(self, gemini, monkeypatch):
         """LLMService uses GEMINI_API_KEY when GOOGLE_API_KEY is missing."""
-        from app.services.llm import LLMService
+        monkeypatch.setenv("GEMINI_API_KEY", "gemini-key")
+        monkeypatch.delenv("GOOGLE_API_KEY", raising=False)
 
-        with patch.dict(os.environ, {"GEMINI_API_KEY": "gemini-key"}, clear=True):
-            os.environ.pop("GOOGLE_API_KEY", None)
-            with patch("langchain_google_genai.ChatGoogleGenerativeAI") as MockGemini:
-                service = LLMService(provider="gemini")
+        service = LLMService(provider="gemini")
 
-                assert service.api_key == "gemini-key"
+        assert service.api_key == "gemini-key"
 
-    def test_gemini_prefers_google_api_key(self):
+    def test_gemini_prefers_google_api_key(self, gemini, monkeypatch):
         """LLMService prefers GOOGLE_API_KEY over GEMINI_API_KEY."""
-        from app.services.llm import LLMService
+        monkeypatch.setenv("GOOGLE_API_KEY", "google-key")
+        monkeypatch.setenv("GEMINI_API_KEY", "gemini-key")
 
-        with patch.dict(os.environ, {"GOOGLE_API_KEY": "google-key", "GEMINI_API_KEY": "gemini-key"}):
-            with patch("langchain_google_genai.ChatGoogleGenerativeAI") as MockGemini:
-                service = LLMService(provider="gemini")
+        service = LLMService(provider="gemini")
 
-                assert service.api_key == "google-key"
+        assert service.api_key == "google-key"
 
 
 class TestLLMServiceSummarization:
     """Tests for transcript summarization."""
 
-    @pytest.mark.asyncio
-    async def test_summarize_no_llm(self):
+    async def test_summarize_no_llm(self, unknown_service):
         """summarize returns original when LLM not configured."""
-        from app.services.llm import LLMService
-
-        service = LLMService(provider="unknown")
-        result = await service.summarize("USER: Hello\nSYSTEM: Hi there")
+        result = await unknown_service.summarize("USER: Hello\nSYSTEM: Hi there")
 
         assert result == "USER: Hello\nSYSTEM: Hi there"
 
-    @pytest.mark.asyncio
-    async def test_summarize_empty_transcript(self):
+    async def test_summarize_empty_transcript(self, unknown_service):
         """summarize returns empty for empty input."""
-        from app.services.llm import LLMService
-
-        service = LLMService(provider="unknown")
-        result = await service.summarize("")
+        result = await unknown_service.summarize("")
 
         assert result == ""
 
-    @pytest.mark.asyncio
-    async def test_summarize_success(self):
+    async def test_summarize_success(self, gemini):
         """summarize compresses transcript text."""
-        from app.services.llm import LLMService
-
-        async def mock_stream(*args, **kwargs):
-            for text in ["Discussion about ", "Python programming."]:
-                chunk = MagicMock()
-                chunk.content = text
-                yield chunk
+        gemini.return_value = FakeLLM(["Discussion about ", "Python programming."])
 
-        with patch.dict(os.environ, {"GOOGLE_API_KEY": "test-key"}):
-            with patch("langchain_google_genai.ChatGoogleGenerativeAI") as MockGemini:
-                mock_llm = MagicMock()
-                mock_llm.astream = mock_stream
-                MockGemini.return_value = mock_llm
+        service = LLMService(provider="gemini")
+        result = await service.summarize("USER: Tell me about Python\nSYSTEM: Python is a programming language...")
 
-                service = LLMService(provider="gemini")
-                result = await service.summarize("USER: Tell me about Python\nSYSTEM: Python is a programming language...")
+        assert result == "Discussion about Python programming."
 
-                assert result == "Discussion about Python programming."
-
-    @pytest.mark.asyncio
-    async def test_summarize_handles_error(self):
+    async def test_summarize_handles_error(self, gemini):
         """summarize returns original on error."""
-        from app.services.llm import LLMService
-
-        async def mock_stream_error(*args, **kwargs):
-            raise Exception("API Error")
-            yield  # Make it a generator
+        gemini.return_value = FailingLLM()
 
-        with patch.dict(os.environ, {"GOOGLE_API_KEY": "test-key"}):
-            with patch("langchain_google_genai.ChatGoogleGenerativeAI") as MockGemini:
-                mock_llm = MagicMock()
-                mock_llm.astream = mock_stream_error
-                MockGemini.return_value = mock_llm
+        service = LLMService(provider="gemini")
+        original = "USER: Hello\nSYSTEM: Hi"
+        result = await service.summarize(original)
 
-                service = LLMService(provider="gemini")
-                original = "USER: Hello\nSYSTEM: Hi"
-                result = await service.summarize(original)
+        assert result == original  # Falls back to original
 
-                assert result == original  # Falls back to original
-
-    @pytest.mark.asyncio
-    async def test_summarize_with_max_length(self):
+    async def test_summarize_with_max_length(self, gemini):
         """summarize respects max_length parameter."""
-        from app.services.llm import LLMService
-
-        captured_messages = []
-
-        async def mock_stream(messages):
-            captured_messages.extend(messages)
-            chunk = MagicMock()
-            chunk.content = "Short summary"
-            yield chunk
-
-        with patch.dict(os.environ, {"GOOGLE_API_KEY": "test-key"}):
-            with patch("langchain_google_genai.ChatGoogleGenerativeAI") as MockGemini:
-                mock_llm = MagicMock()
-                mock_llm.astream = mock_stream
-                MockGemini.return_value = mock_llm
+        gemini.return_value = FakeLLM(["Short summary"])
 
-                service = LLMService(provider="gemini")
-                result = await service.summarize("x" * 1000, max_length=100)
+        service = LLMService(provider="gemini")
+        result = await service.summarize("x" * 1000, max_length=100)
 
-                assert result == "Short summary"
+        assert result == "Short summary"
@@ -0,0 +1,58 @@
+"""Tests for structured logging."""
+
+import json
+import logging
+from pathlib import Path
+
+import pytest
+
+from app.core.logging import JSONFormatter
+
+
+@pytest.fixture
+def record():
+    """INFO record with a non-ASCII message and extras that need the str() fallback."""
+    record = logging.LogRecord("app.test", logging.INFO, __file__, 1, "héllo %s", ("wörld",), None)
+    record.path = Path("/tmp/x")
+    record.items = [1, 2.5, None]
+    return record
+
+
+def _fields(line: str) -> dict:
+    data = json.loads(line)
+    data.pop("ts")
+    return data
+
+
+class TestJSONFormatter:
+    """Tests for JSON log lines."""
+
+    def test_stdlib_fallback(self, record, monkeypatch):
+        """Without orjson, lines are stdlib JSON with extras inlined and non-ASCII left unescaped."""
+        monkeypatch.setattr("app.core.logging.orjson", None)
+
+        line = JSONFormatter().format(record)
+
+        assert "héllo wörld" in line
+        assert _fields(line) == {
+            "level": "INFO", "logger": "app.test", "msg": "héllo wörld", "path": "/tmp/x", "items": [1, 2.5, None]
+        }
+
+    def test_orjson_matches_stdlib(self, record, monkeypatch):
+        """The orjson fast path emits the same fields and values as the stdlib fallback."""
+        pytest.importorskip("orjson")
+        fast = JSONFormatter().format(record)
+        monkeypatch.setattr("app.core.logging.orjson", None)
+
+        assert "héllo wörld" in fast
+        assert _fields(fast) == _fields(JSONFormatter().format(record))
+
+    def test_extras_orjson_rejects_by_default(self, record):
+        """Int-keyed and >64-bit extras format as they do with stdlib json instead of raising."""
+        record.counts = {1: 2}
+        record.big = 2**70
+
+        data = json.loads(JSONFormatter().format(record))
+
+        assert data["counts"] == {"1": 2}
+        assert data["big"] == 2**70
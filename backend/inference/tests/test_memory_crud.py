@@ -0,0 +1,371 @@
+"""Tests for MemoryService storage, queries and access tracking."""
+
+import sys
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.services.constants import HNSW_CONFIG_DEFAULT
+from app.services.memory import ChromaPool, MemoryError, MemoryService, QueryCache
+
+
+class TestMemoryService:
+    """Tests for vector memory storage."""
+
+    def test_init_success(self, memory_service):
+        """MemoryService initializes ChromaDB client."""
+        assert memory_service.client is not None
+        assert memory_service.collection is not None
+
+    def test_init_failure(self, failing_chromadb, tmp_path):
+        """MemoryService handles init failure gracefully."""
+        service = MemoryService(persistence_path=str(tmp_path))
+
+        assert service.client is None
+        assert service.collection is None
+
+    @pytest.mark.parametrize(
+        ("override", "expected"),
+        [
+            pytest.param(None, HNSW_CONFIG_DEFAULT, id="defaults"),
+            pytest.param(
+                {"hnsw:M": 32, "hnsw:sync_threshold": 50},
+                {**HNSW_CONFIG_DEFAULT, "hnsw:M": 32, "hnsw:sync_threshold": 50},
+                id="overrides",
+            ),
+        ],
+    )
+    def test_hnsw_config_overrides(self, monkeypatch, tmp_path, override, expected):
+        """Collection creation forwards HNSW settings, with per-key overrides."""
+        client_cls = MagicMock()
+        monkeypatch.setitem(sys.modules, "chromadb", SimpleNamespace(PersistentClient=client_cls))
+
+        ChromaPool(str(tmp_path), pool_size=1, hnsw_config=override)._create_client()
+
+        client_cls.return_value.get_or_create_collection.assert_called_once_with(name="user_context", metadata=expected)
+
+    def test_client_reused_for_same_path(self, monkeypatch, tmp_path):
+        """Pools on the same path (however spelled) share one PersistentClient."""
+        client_cls = MagicMock()
+        monkeypatch.setitem(sys.modules, "chromadb", SimpleNamespace(PersistentClient=client_cls))
+
+        ChromaPool(str(tmp_path), pool_size=2).initialize()
+        ChromaPool(str(tmp_path / "." / ""), pool_size=2).initialize()
+        ChromaPool(str(tmp_path / "other"), pool_size=1).initialize()
+
+        assert [c.kwargs["path"] for c in client_cls.call_args_list] == [str(tmp_path), str(tmp_path / "other")]
+        assert client_cls.return_value.get_or_create_collection.call_count == 5
+
+    def test_add_memory_success(self, memory_service, added):
+        """add_memory stores text in collection."""
+        memory_service.add_memory("Test memory content", "audio")
+        memory_service.flush()
+
+        assert len(added) == 1
+        documents, metadatas, _ = added[0]
+        assert documents == ["Test memory content"]
+        assert metadatas[0]["source"] == "audio"
+
+    def test_add_memory_empty_text(self, memory_service, mock_chromadb):
+        """add_memory skips empty text."""
+        memory_service.add_memory("   ", "audio")
+
+        mock_chromadb.add.assert_not_called()
+
+    def test_add_memory_no_collection(self, failing_chromadb, tmp_path):
+        """add_memory handles missing collection."""
+        service = MemoryService(persistence_path=str(tmp_path))
+        # Should not raise
+        service.add_memory("Test", "audio")
+
+    def test_add_memory_with_metadata(self, memory_service, added):
+        """add_memory includes custom metadata."""
+        custom_meta = {"topic": "code", "language": "python"}
+        memory_service.add_memory("Code snippet", "screen", metadata=custom_meta)
+        memory_service.flush()
+
+        metadata = added[0][1][0]
+        assert metadata["topic"] == "code"
+        assert metadata["language"] == "python"
+        assert metadata["source"] == "screen"
+
+    def test_add_memory_buffers_until_flush(self, memory_service, added):
+        """add_memory batches buffered writes into one collection.add."""
+        memory_service.add_memory("First", "audio")
+        memory_service.add_memory("Second", "screen")
+
+        assert added == []
+        assert memory_service.flush() == 2
+        assert len(added) == 1
+        assert added[0][0] == ["First", "Second"]
+
+    def test_add_memory_flushes_at_batch_size(self, patched_chromadb, added, tmp_path):
+        """batch_size=1 writes through on every add_memory call."""
+        service = MemoryService(persistence_path=str(tmp_path), batch_size=1)
+        service.add_memory("First", "audio")
+        service.add_memory("Second", "audio")
+
+        assert [docs for docs, _, _ in added] == [["First"], ["Second"]]
+
+    def test_add_memory_flushes_partial_buffer_after_interval(self, patched_chromadb, added, tmp_path):
+        """A partial buffer is written once flush_interval_ms passes, even with no further calls."""
+        service = MemoryService(persistence_path=str(tmp_path), flush_interval_ms=20)
+        service.add_memory("Lonely", "audio")
+        timer = service._flush_timer
+        timer.join(1.0)
+
+        assert added[0][0] == ["Lonely"]
+        assert service._flush_timer is None
+
+    def test_query_memory_flushes_pending(self, memory_service, added):
+        """query_memory writes buffered memories before searching."""
+        memory_service.add_memory("Pending", "audio")
+        memory_service.query_memory("pending")
+
+        assert added[0][0] == ["Pending"]
+
+    def test_failed_flush_keeps_entries_buffered(self, memory_service, mock_chromadb, added):
+        """A failed flush raises to flush() callers and leaves the entries queued for the next one."""
+        capture = mock_chromadb.add.side_effect
+        mock_chromadb.add.side_effect = Exception("add failed")
+        memory_service.add_memory("First", "audio")
+
+        with pytest.raises(MemoryError):
+            memory_service.flush()
+        memory_service.add_memory("Second", "audio")
+        mock_chromadb.add.side_effect = capture
+
+        assert memory_service.flush() == 2
+        assert added[0][0] == ["First", "Second"]
+
+    def test_add_memory_unbuffered_writes_through(self, memory_service, mock_chromadb, added):
+        """buffered=False stores immediately and surfaces write failures."""
+        memory_service.add_memory("Now", "audio", buffered=False)
+        assert added[0][0] == ["Now"]
+
+        mock_chromadb.add.side_effect = Exception("add failed")
+        with pytest.raises(MemoryError):
+            memory_service.add_memory("Lost", "audio", buffered=False)
+
+    def test_close_flushes_buffer(self, memory_service, added):
+        """close() writes pending memories and stops the flush timer."""
+        memory_service.add_memory("Pending", "audio")
+        memory_service.close()
+
+        assert added[0][0] == ["Pending"]
+        assert memory_service._flush_timer is None
+
+    def test_query_memory_success(self, memory_service, mock_chromadb):
+        """query_memory returns matching documents."""
+        results = memory_service.query_memory("coding help", n_results=3)
+
+        mock_chromadb.query.assert_called_once()
+        assert results == ["Relevant memory 1", "Relevant memory 2"]
+
+    def test_query_memory_with_filter(self, memory_service, mock_chromadb):
+        """query_memory passes metadata filter."""
+        memory_service.query_memory("test", filter_metadata={"source": "screen"})
+
+        call_args = mock_chromadb.query.call_args
+        assert call_args.kwargs["where"] == {"source": "screen"}
+
+    def test_query_memory_no_collection(self, failing_chromadb, tmp_path):
+        """query_memory returns empty list when no collection."""
+        service = MemoryService(persistence_path=str(tmp_path))
+        results = service.query_memory("test")
+
+        assert results == []
+
+    def test_query_memory_empty_results(self, memory_service, mock_chromadb):
+        """query_memory handles empty results."""
+        mock_chromadb.query.return_value = {"documents": [[]]}
+
+        results = memory_service.query_memory("nonexistent")
+
+        assert results == []
+
+    def test_query_memory_exception(self, memory_service, mock_chromadb):
+        """query_memory handles exceptions gracefully."""
+        mock_chromadb.query.side_effect = Exception("Query failed")
+
+        results = memory_service.query_memory("test")
+
+        assert results == []
+
+    def test_ensure_data_dir(self, patched_chromadb, tmp_path):
+        """MemoryService creates its persistence directory if missing."""
+        MemoryService(persistence_path=str(tmp_path / "new_dir" / "chroma"))
+
+        assert (tmp_path / "new_dir" / "chroma").is_dir()
+
+
+_LONG_QUERY = "how do i reset the password on the admin settings page"
+
+
+class TestQueryCache:
+    """Tests for the query result cache in front of collection.query."""
+
+    def test_query_memory_cache_hit(self, memory_service, mock_chromadb):
+        """Repeated queries (modulo case/whitespace) are served from the cache but still count access."""
+        first = memory_service.query_memory("Coding help", n_results=3)
+        second = memory_service.query_memory("  coding   HELP ", n_results=3)
+
+        mock_chromadb.query.assert_called_once()
+        assert first == second == ["Relevant memory 1", "Relevant memory 2"]
+        counts = [c.kwargs["metadatas"][0]["access_count"] for c in mock_chromadb.update.call_args_list]
+        assert counts == [1, 1, 2, 2]
+
+    @pytest.mark.parametrize(
+        "second_kwargs",
+        [
+            pytest.param({"n_results": 5}, id="n_results"),
+            pytest.param({"n_results": 3, "filter_metadata": {"source": "screen"}}, id="filter"),
+        ],
+    )
+    def test_query_memory_cache_miss(self, memory_service, mock_chromadb, second_kwargs):
+        """Different n_results or filters are cached separately."""
+        memory_service.query_memory("coding help", n_results=3)
+        memory_service.query_memory("coding help", **second_kwargs)
+
+        assert mock_chromadb.query.call_count == 2
+
+    def test_query_memory_cache_invalidated_on_add(self, memory_service, mock_chromadb):
+        """Flushed writes invalidate cached results."""
+        memory_service.query_memory("coding help")
+        memory_service.add_memory("New memory", "audio")
+        memory_service.query_memory("coding help")
+
+        assert mock_chromadb.query.call_count == 2
+
+    @pytest.mark.parametrize(
+        ("query", "expected"),
+        [
+            pytest.param(f"{_LONG_QUERY} now", "long", id="extra-word"),
+            pytest.param(f"{_LONG_QUERY} 2", None, id="digit"),
+            pytest.param(_LONG_QUERY.replace("reset", "not reset"), None, id="negation"),
+            pytest.param(_LONG_QUERY.replace("reset the password", "password the reset"), None, id="reordered"),
+        ],
+    )
+    def test_near_duplicate_match(self, query, expected):
+        """A miss reuses the previous result only for a same-order near-duplicate with no number or negation change."""
+        cache = QueryCache(token_threshold=0.9)
+        cache.put("b", _LONG_QUERY, "long")
+
+        assert cache.get("b", query) == expected
+        assert cache.get("other", query) is None
+
+    def test_near_duplicate_only_checks_previous_query(self):
+        """Older entries are never near-duplicate candidates, and short queries need an exact match."""
+        cache = QueryCache(token_threshold=0.9)
+        cache.put("b", _LONG_QUERY, "long")
+        cache.put("b", "open the login form", "short")
+
+        assert cache.get("b", f"{_LONG_QUERY} now") is None
+        assert cache.get("b", "open the logout form") is None
+        assert cache.get("b", "open the login form") == "short"
+
+    def test_lru_and_ttl_eviction(self, monkeypatch):
+        """Oldest entries are evicted past max_size and expired entries miss."""
+        cache = QueryCache(max_size=2, ttl=10.0)
+        cache.put("b", "a", 1)
+        cache.put("b", "b", 2)
+        cache.get("b", "a")
+        cache.put("b", "c", 3)
+
+        assert cache.get("b", "b") is None
+        assert cache.get("b", "a") == 1
+
+        monkeypatch.setattr("app.services.memory.query_cache.time", SimpleNamespace(monotonic=lambda: float("inf")))
+        assert cache.get("b", "c") is None
+        assert len(cache) == 1
+
+
+class TestMemoryServiceEdgeCases:
+    """Edge case tests for MemoryService."""
+
+    def test_add_memory_whitespace_only(self, memory_service, mock_chromadb):
+        """add_memory skips whitespace-only text."""
+        memory_service.add_memory("\t\n  ", "audio")
+
+        mock_chromadb.add.assert_not_called()
+
+    @pytest.mark.parametrize(
+        ("method", "args", "failing_call"),
+        [
+            pytest.param("add_memory", ("Test content", "audio"), "add", id="add_memory"),
+            pytest.param("_prune_smart", (5000,), "count", id="prune_smart"),
+        ],
+    )
+    def test_collection_errors_handled(self, memory_service, mock_chromadb, method, args, failing_call):
+        """Collection exceptions are handled gracefully."""
+        getattr(mock_chromadb, failing_call).side_effect = Exception(f"{failing_call} failed")
+
+        # Should not raise
+        getattr(memory_service, method)(*args)
+
+    def test_query_memory_with_special_characters(self, memory_service, mock_chromadb):
+        """query_memory handles special characters in query."""
+        memory_service.query_memory("def func(): return {}", n_results=3)
+
+        mock_chromadb.query.assert_called_once()
+
+    def test_query_memory_large_n_results(self, memory_service, mock_chromadb):
+        """query_memory handles large n_results."""
+        memory_service.query_memory("test", n_results=1000)
+
+        call_args = mock_chromadb.query.call_args
+        assert call_args.kwargs["n_results"] == 1000
+
+    def test_add_memory_preserves_custom_timestamp(self, memory_service, added):
+        """add_memory preserves custom timestamp in metadata."""
+        custom_meta = {"timestamp": 1234567890}
+        memory_service.add_memory("Test", "screen", metadata=custom_meta)
+        memory_service.flush()
+
+        assert added[0][1][0]["timestamp"] == 1234567890
+
+
+class TestMemoryServiceConcurrency:
+    """Tests for concurrent memory operations."""
+
+    def test_add_memory_generates_unique_ids(self, memory_service, added):
+        """add_memory generates unique IDs for back-to-back calls without relying on the clock."""
+        ids = [memory_service.add_memory(f"Memory {i}", "audio") for i in range(1000)]
+        memory_service.flush()
+
+        assert len(set(ids)) == 1000
+        assert sorted(id_ for _, _, batch in added for id_ in batch) == sorted(ids)
+
+    def test_query_memory_none_filter(self, memory_service, mock_chromadb):
+        """query_memory handles None filter_metadata."""
+        memory_service.query_memory("test", filter_metadata=None)
+
+        call_args = mock_chromadb.query.call_args
+        assert call_args.kwargs["where"] is None
+
+
+class TestAccessTracking:
+    """Tests for memory access tracking."""
+
+    @pytest.mark.parametrize(
+        ("metadatas", "update_error", "expected_counts"),
+        [
+            pytest.param([{"access_count": 5}, {"access_count": 2}], None, [6, 3], id="increments_each"),
+            pytest.param([{}], None, [1], id="missing_count"),
+            pytest.param([{"access_count": 0}], Exception("Update failed"), None, id="update_fails"),
+        ],
+    )
+    def test_query_updates_access_counts(self, memory_service, mock_chromadb, metadatas, update_error, expected_counts):
+        """query_memory increments access_count per retrieved memory and still returns results if updating fails."""
+        ids = [f"mem_{i}" for i in range(len(metadatas))]
+        docs = [f"Doc {i}" for i in range(len(metadatas))]
+        mock_chromadb.query.return_value = {"ids": [ids], "documents": [docs], "metadatas": [metadatas]}
+        mock_chromadb.update.side_effect = update_error
+
+        results = memory_service.query_memory("test query")
+
+        assert results == docs
+        if expected_counts is not None:
+            counts = [c.kwargs["metadatas"][0]["access_count"] for c in mock_chromadb.update.call_args_list]
+            assert counts == expected_counts
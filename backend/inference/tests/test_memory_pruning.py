@@ -0,0 +1,304 @@
+"""Tests for MemoryService pruning and deduplication."""
+
+from types import MappingProxyType
+
+import numpy as np
+import pytest
+
+from app.services.memory import EmbeddingStore, MemoryService
+
+# Read-only collection.query() results
+_QR_EMPTY = MappingProxyType({"ids": ((),), "distances": ((),)})
+
+
+class TestSmartPruning:
+    """Tests for importance-aware pruning."""
+
+    def test_add_memory_triggers_prune(self, patched_chromadb, paged_get, prune_payload_10k, tmp_path):
+        """add_memory prunes when the tracked count exceeds threshold."""
+        # 10001 memories: over threshold, with metadatas for smart pruning
+        mock_chromadb = paged_get(prune_payload_10k)
+        # Mock uniqueness query
+        mock_chromadb.query.return_value = _QR_EMPTY
+        service = MemoryService(persistence_path=str(tmp_path))
+        service._maint_debounce = 0
+
+        service.add_memory("Test", "audio")
+        service.flush()
+        # Pruning happens on the maintenance thread
+        service._maint_queue.join()
+
+        mock_chromadb.delete.assert_called_once()
+
+    def test_add_memory_does_not_prune_inline(self, patched_chromadb, tmp_path, monkeypatch):
+        """The write path only schedules pruning; it never runs it on the caller's thread."""
+        patched_chromadb.count.return_value = 10001
+        service = MemoryService(persistence_path=str(tmp_path), batch_size=1)
+        scheduled = []
+        monkeypatch.setattr(service, "_schedule_prune", lambda: scheduled.append(True))
+        monkeypatch.setattr(service, "_prune_smart", lambda *a, **kw: pytest.fail("pruned inline"))
+
+        service.add_memory("First", "audio")
+        service.add_memory("Second", "audio")
+
+        assert scheduled == [True, True]
+
+    def test_add_memory_tracks_count_without_polling(self, patched_chromadb, tmp_path):
+        """Writes only call count() at init and when a recheck interval is crossed."""
+        patched_chromadb.count.return_value = 998
+        service = MemoryService(persistence_path=str(tmp_path), batch_size=1)
+        patched_chromadb.count.return_value = 1000
+
+        for i in range(5):
+            service.add_memory(f"Memory {i}", "audio")
+
+        # Once at init, then one reconciliation as the tracked size reaches 1000
+        assert patched_chromadb.count.call_count == 2
+        assert service._approx_count == 1003
+
+    def test_prune_smart_removes_low_importance(self, memory_service, mock_chromadb, paged_get, prune_payload_6k):
+        """_prune_smart removes low-importance memories first."""
+        # Memories with varying importance
+        paged_get(prune_payload_6k)
+        # Mock uniqueness query (uniform uniqueness for simplicity)
+        mock_chromadb.query.return_value = _QR_EMPTY
+
+        memory_service._prune_smart(keep=5000)
+
+        mock_chromadb.delete.assert_called_once()
+        deleted_ids = mock_chromadb.delete.call_args.kwargs["ids"]
+        # Some may be protected due to access_count >= 5, so deletion count may vary
+        assert len(deleted_ids) >= 500  # At least some pruned
+
+    def test_prune_smart_preserves_high_access(self, memory_service, mock_chromadb, paged_get):
+        """_prune_smart preserves frequently accessed memories."""
+        # Old but frequently accessed should survive (and be protected)
+        ids = ["old_high_access", "new_low_access"]
+        metadatas = [
+            {"timestamp": 1000, "access_count": 100},  # Old but high access (protected)
+            {"timestamp": 9999, "access_count": 0},  # New but never accessed
+        ]
+        paged_get({"ids": ids, "metadatas": metadatas})
+        # Mock uniqueness query
+        mock_chromadb.query.return_value = {"ids": [["old_high_access"]], "distances": [[0.0, 0.3]]}
+
+        memory_service._prune_smart(keep=1)
+
+        deleted = mock_chromadb.delete.call_args.kwargs["ids"]
+        # The new but low-access memory should be pruned
+        assert "new_low_access" in deleted
+        assert "old_high_access" not in deleted
+
+    def test_prune_smart_protects_frequently_queried(self, memory_service, mock_chromadb, paged_get):
+        """_prune_smart protects memories above PROTECTED_ACCESS_COUNT threshold."""
+        # All have same recency, but different access counts
+        ids = ["protected_1", "protected_2", "pruneable"]
+        metadatas = [
+            {"timestamp": 1000, "access_count": 10},  # Protected
+            {"timestamp": 1000, "access_count": 5},  # Protected (at threshold)
+            {"timestamp": 9999, "access_count": 4},  # Below threshold, pruneable
+        ]
+        paged_get({"ids": ids, "metadatas": metadatas})
+        mock_chromadb.query.return_value = _QR_EMPTY
+
+        memory_service._prune_smart(keep=2)
+
+        deleted = mock_chromadb.delete.call_args.kwargs["ids"]
+        assert "pruneable" in deleted
+        assert "protected_1" not in deleted
+        assert "protected_2" not in deleted
+
+    def test_prune_smart_no_ids(self, memory_service, mock_chromadb, paged_get):
+        """_prune_smart handles empty ID list."""
+        paged_get({"ids": [], "metadatas": [], "documents": []})
+
+        memory_service._prune_smart(keep=5000)
+
+        mock_chromadb.delete.assert_not_called()
+
+    def test_prune_smart_under_threshold(self, memory_service, mock_chromadb):
+        """_prune_smart skips without scanning when count() is under threshold."""
+        mock_chromadb.count.return_value = 100
+
+        memory_service._prune_smart(keep=5000)
+
+        mock_chromadb.get.assert_not_called()
+        mock_chromadb.delete.assert_not_called()
+
+    def test_prune_smart_paginates_metadata(self, memory_service, mock_chromadb, paged_get, prune_payload_6k):
+        """_prune_smart reads metadata in bounded limit/offset pages."""
+        paged_get(prune_payload_6k)
+        mock_chromadb.query.return_value = _QR_EMPTY
+
+        memory_service._prune_smart(keep=5000)
+
+        pages = [c.kwargs for c in mock_chromadb.get.call_args_list if "limit" in c.kwargs]
+        assert [p["offset"] for p in pages] == [0, 2048, 4096]
+        assert {p["limit"] for p in pages} == {2048}
+
+
+class TestDeduplication:
+    """Tests for semantic deduplication."""
+
+    def test_prune_duplicates_removes_similar(self, memory_service, mock_chromadb):
+        """_prune_duplicates removes semantically similar memories."""
+        mock_chromadb.get.return_value = {
+            "ids": ["mem_1", "mem_2"],
+            "metadatas": [{"timestamp": 1000, "access_count": 10}, {"timestamp": 2000, "access_count": 5}],
+            # cosine ~0.999, above the 0.92 duplicate threshold
+            "embeddings": [[1.0, 0.0, 0.0], [0.99, 0.05, 0.0]],
+        }
+
+        memory_service._prune_duplicates(sample_size=10)
+
+        mock_chromadb.delete.assert_called_once()
+        mock_chromadb.query.assert_not_called()
+
+    def test_prune_duplicates_keeps_high_access(self, memory_service, mock_chromadb):
+        """_prune_duplicates keeps the memory with higher access count."""
+        mock_chromadb.get.return_value = {
+            "ids": ["mem_1", "mem_2"],
+            "metadatas": [
+                {"timestamp": 1000, "access_count": 100},  # Higher access
+                {"timestamp": 2000, "access_count": 5},
+            ],
+            "embeddings": [[0.3, 0.4, 0.5], [0.3, 0.4, 0.5]],
+        }
+
+        memory_service._prune_duplicates(sample_size=10)
+
+        deleted = mock_chromadb.delete.call_args.kwargs["ids"]
+        assert "mem_2" in deleted  # Lower access count removed
+        assert "mem_1" not in deleted
+
+    @pytest.mark.parametrize(
+        ("ids", "embeddings"),
+        [
+            pytest.param(["mem_1"], [[1.0, 0.0]], id="single"),
+            pytest.param(["mem_1", "mem_2"], [[1.0, 0.0], [0.0, 1.0]], id="orthogonal"),
+        ],
+    )
+    def test_prune_duplicates_no_similar(self, memory_service, mock_chromadb, ids, embeddings):
+        """_prune_duplicates skips when nothing but self-matches clears the threshold."""
+        mock_chromadb.get.return_value = {
+            "ids": ids,
+            "metadatas": [{"timestamp": 1000, "access_count": 0} for _ in ids],
+            "embeddings": embeddings,
+        }
+
+        memory_service._prune_duplicates(sample_size=10, threshold=0.92)
+
+        mock_chromadb.delete.assert_not_called()
+
+    def test_prune_duplicates_skips_already_removed(self, memory_service, mock_chromadb):
+        """A memory already marked as a duplicate is not used to remove a third one."""
+        mock_chromadb.get.return_value = {
+            "ids": ["a", "b", "c"],
+            "metadatas": [
+                {"timestamp": 3, "access_count": 10},
+                {"timestamp": 2, "access_count": 5},
+                {"timestamp": 1, "access_count": 1},
+            ],
+            # 20 degrees apart in a chain: a~b and b~c clear 0.92, a~c (cos 40deg = 0.77) does not
+            "embeddings": [[1.0, 0.0], [0.9397, 0.3420], [0.7660, 0.6428]],
+        }
+
+        memory_service._prune_duplicates(sample_size=10)
+
+        assert mock_chromadb.delete.call_args.kwargs["ids"] == ["b"]
+
+    def test_prune_duplicates_exact_text(self, memory_service, mock_chromadb):
+        """Byte-identical documents are deduplicated without fetching embeddings."""
+        mock_chromadb.get.return_value = {
+            "ids": ["new", "old", "popular"],
+            "documents": ["Same words", "Same words", "Same words"],
+            "metadatas": [
+                {"timestamp": 3, "access_count": 1},
+                {"timestamp": 1, "access_count": 1},
+                {"timestamp": 2, "access_count": 9},
+            ],
+        }
+
+        memory_service._prune_duplicates(sample_size=10)
+
+        assert sorted(mock_chromadb.delete.call_args.kwargs["ids"]) == ["new", "old"]
+        assert all("embeddings" not in c.kwargs["include"] for c in mock_chromadb.get.call_args_list)
+
+    def test_prune_duplicates_minimal_include(self, memory_service, mock_chromadb):
+        """Only the sample reads documents/embeddings; the full scan projects metadata alone."""
+        mock_chromadb.get.return_value = {
+            "ids": ["mem_1", "mem_2"],
+            "documents": ["Alpha", "Beta"],
+            "metadatas": [{"timestamp": 1}, {"timestamp": 2}],
+            "embeddings": [[1.0, 0.0], [0.0, 1.0]],
+        }
+
+        memory_service._prune_duplicates(sample_size=10)
+
+        calls = [(c.kwargs.get("ids"), c.kwargs["include"]) for c in mock_chromadb.get.call_args_list]
+        assert calls == [
+            (None, ["metadatas"]),
+            (["mem_2", "mem_1"], ["documents"]),
+            (["mem_2", "mem_1"], ["embeddings"]),
+        ]
+
+    def test_prune_duplicates_uses_mmap(self, memory_service, mock_chromadb):
+        """Embeddings read once from Chroma are served from the sidecar on later passes."""
+        mock_chromadb.get.return_value = {
+            "ids": ["mem_1", "mem_2"],
+            "documents": ["Alpha", "Beta"],
+            "metadatas": [{"timestamp": 1}, {"timestamp": 2}],
+            "embeddings": [[1.0, 0.0], [0.0, 1.0]],
+        }
+        memory_service._prune_duplicates(sample_size=10)
+        mock_chromadb.get.reset_mock()
+
+        memory_service._prune_duplicates(sample_size=10)
+
+        assert all("embeddings" not in c.kwargs["include"] for c in mock_chromadb.get.call_args_list)
+
+    def test_prune_duplicates_exception_handling(self, memory_service, mock_chromadb):
+        """_prune_duplicates handles exceptions gracefully."""
+        mock_chromadb.get.side_effect = Exception("Get failed")
+
+        # Should not raise
+        memory_service._prune_duplicates()
+
+
+class TestEmbeddingStore:
+    """Tests for the memory-mapped embedding sidecar."""
+
+    def test_round_trip_and_reload(self, tmp_path):
+        """Stored rows survive reopening the store from disk."""
+        store = EmbeddingStore(tmp_path)
+        store.put(["a", "b"], [[1.0, 2.0], [3.0, 4.0]])
+
+        reopened = EmbeddingStore(tmp_path)
+        rows = reopened.rows(["b", "missing", "a"])
+
+        assert rows[1] is None
+        assert reopened.matrix([rows[0], rows[2]]).tolist() == [[3.0, 4.0], [1.0, 2.0]]
+
+    def test_grows_and_reuses_freed_rows(self, tmp_path):
+        """The file grows past its initial capacity and discarded rows are recycled."""
+        store = EmbeddingStore(tmp_path)
+        ids = [f"m{i}" for i in range(1500)]
+        store.put(ids, np.arange(3000, dtype=np.float32).reshape(1500, 2))
+        (freed,) = store.rows(["m7"])
+        store.discard(["m7"])
+        store.put(["new"], [[-1.0, -1.0]])
+
+        assert store.rows(["new"]) == [freed]
+        assert len(store) == 1500
+        assert store.matrix(store.rows(["m1499", "new"])).tolist() == [[2998.0, 2999.0], [-1.0, -1.0]]
+
+    def test_shared_per_path(self, patched_chromadb, tmp_path):
+        """MemoryServices on one persistence path share a single store, so row allocations can't collide."""
+        first = MemoryService(persistence_path=str(tmp_path))
+        second = MemoryService(persistence_path=str(tmp_path / "." / ""))
+        other = MemoryService(persistence_path=str(tmp_path / "other"))
+        first._embeddings.put(["a"], [[1.0, 2.0]])
+
+        assert second._embeddings is first._embeddings
+        assert second._embeddings.rows(["a"]) == [0]
+        assert other._embeddings is not first._embeddings
@@ -0,0 +1,84 @@
+"""Tests for MemoryService importance and uniqueness scoring."""
+
+import pytest
+
+# Fixed reference time for importance scoring
+NOW = 1_700_000_000.0
+
+
+class TestImportanceScoring:
+    """Tests for importance-aware memory scoring."""
+
+    @pytest.mark.parametrize(
+        "case",
+        [
+            # (age, access_count, uniqueness, score_range, protected)
+            # 0.25*0(recency) + 0.50*1.0(access) + 0.25*0.5(unique) = 0.625
+            (10000, 100, 0.5, (0.5, 1.0), True),
+            # 0.25*1.0(recency) + 0.50*0(access) + 0.25*1.0(unique) = 0.5
+            (0, 0, 1.0, (0.45, 0.55), False),
+            # 0.25*0.5 + 0.50*0.5 + 0.25*0.5 = 0.5
+            (5000, 50, 0.5, (0.45, 0.55), True),
+            # PROTECTED_ACCESS_COUNT boundary
+            (0, 5, 0.5, None, True),
+            (0, 4, 0.5, None, False),
+        ],
+        ids=["high_access", "recent_low_access", "balanced", "at_protected_threshold", "below_protected_threshold"],
+    )
+    def test_compute_importance(self, memory_service, case):
+        """_compute_importance weighs recency, access and uniqueness; access >= PROTECTED_ACCESS_COUNT is protected."""
+        age, access_count, uniqueness, score_range, protected = case
+        score, is_protected = memory_service._compute_importance(
+            timestamp=NOW - age, access_count=access_count, uniqueness=uniqueness,
+            now=NOW, max_age=10000, max_access=100,
+        )
+
+        if score_range:
+            assert score_range[0] <= score <= score_range[1]
+        assert is_protected is protected
+
+
+class TestUniquenessScoring:
+    """Tests for semantic uniqueness scoring."""
+
+    @pytest.mark.parametrize(
+        "case",
+        [
+            # (ids, stored embeddings or get() error, query distances, expected score ranges)
+            # 0.8 distance / 0.25 = 3.2, capped to 1.0
+            pytest.param(
+                (["unique_mem", "distant_mem"], [[1.0, 0.0], [0.0, 1.0]], [[0.0, 0.8]], {"unique_mem": (0.5, 1.0)}),
+                id="high_distance",
+            ),
+            # 0.05 distance / 0.25 (1.0 - 0.75 threshold) = 0.2
+            pytest.param(
+                (["common_mem", "similar_mem"], [[1.0, 0.0], [0.99, 0.1]], [[0.0, 0.05]], {"common_mem": (0.0, 0.5)}),
+                id="low_distance",
+            ),
+            # Single memory is always unique; no lookups needed
+            pytest.param((["only_mem"], None, None, {"only_mem": (1.0, 1.0)}), id="single_memory"),
+            # Defaults returned when the collection lookup fails
+            pytest.param(
+                (["mem_1", "mem_2"], Exception("Get failed"), None, {"mem_1": (1.0, 1.0), "mem_2": (1.0, 1.0)}),
+                id="get_fails",
+            ),
+        ],
+    )
+    def test_compute_uniqueness(self, memory_service, mock_chromadb, case):
+        """_compute_uniqueness_scores scales with neighbour distance and defaults to 1.0."""
+        ids, stored, distances, expected = case
+        if isinstance(stored, Exception):
+            mock_chromadb.get.side_effect = stored
+        elif stored is not None:
+            mock_chromadb.get.return_value = {"ids": ids, "embeddings": stored}
+        if distances is not None:
+            mock_chromadb.query.return_value = {"ids": [ids], "distances": distances}
+
+        uniqueness = memory_service._compute_uniqueness_scores(ids, mock_chromadb)
+
+        for id_, (lo, hi) in expected.items():
+            assert lo <= uniqueness[id_] <= hi
+        if distances is not None:
+            # Whole sample searched in one batched call
+            mock_chromadb.query.assert_called_once()
+            assert mock_chromadb.query.call_args.kwargs["query_embeddings"] == stored
@@ -1,155 +1,217 @@
 """Tests for OCRService."""
 
-from unittest.mock import patch
-
+import asyncio
+import io
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import numpy as np
 import pytest
 from PIL import Image
 
+from app.core import OCRError
+from app.services.ocr import OCRService, decode_image
+from app.services.ocr.service import _box_rects, _extract_bytes, _to_engine_array
+
 
 class TestOCRService:
     """Tests for OCR text extraction."""
 
-    def test_init_success(self, mock_rapidocr):
+    def test_init_success(self, mock_rapidocr, monkeypatch):
         """OCRService initializes RapidOCR engine."""
-        from app.services.ocr import OCRService
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", mock_rapidocr)
+        service = OCRService()
+        assert service.engine is not None
 
-        with patch("app.services.ocr.service.RapidOCR", return_value=mock_rapidocr):
-            service = OCRService()
-            assert service.engine is not None
+    def test_engine_splits_cores_across_ocr_workers(self, mock_rapidocr, monkeypatch):
+        """The engine's ORT sessions get a share of the cores, not all of them per concurrent frame."""
+        created = []
+        stub = SimpleNamespace(RapidOCR=lambda **kw: created.append(kw) or mock_rapidocr)
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", None)
+        monkeypatch.setattr("app.services.ocr.service._OCR_WORKERS", 2)
+        monkeypatch.setattr("app.services.ocr.service.os.cpu_count", lambda: 8)
+        monkeypatch.setitem(sys.modules, "rapidocr_onnxruntime", stub)
 
-    def test_init_failure(self):
-        """OCRService handles init failure gracefully."""
-        from app.services.ocr import OCRService
+        assert OCRService().engine is mock_rapidocr
+        assert created == [{"intra_op_num_threads": 4, "inter_op_num_threads": 1}]
 
-        with patch("app.services.ocr.service.RapidOCR", side_effect=Exception("Init failed")):
-            service = OCRService()
-            assert service.engine is None
+    def test_warmup_runs_blank_frame(self, mock_rapidocr, monkeypatch):
+        """warmup pushes one blank frame through the engine."""
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", mock_rapidocr)
 
-    def test_extract_text_success(self, mock_rapidocr):
-        """extract_text returns formatted text with bounding boxes."""
-        from app.services.ocr import OCRService
+        OCRService().warmup()
 
-        with patch("app.services.ocr.service.RapidOCR", return_value=mock_rapidocr):
-            service = OCRService()
-            image = Image.new("RGB", (200, 100), color="white")
+        (arr,), _ = mock_rapidocr.call_args
+        assert arr.shape == (320, 320, 3)
 
-            result = service.extract_text(image)
+    def test_engine_shared_across_instances(self, mock_rapidocr, monkeypatch):
+        """All OCRService instances reuse the module-level engine."""
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", mock_rapidocr)
 
-            assert "[0, 0, 100, 20] Hello World" in result
-            assert "[0, 30, 150, 50] Test Text" in result
+        assert OCRService().engine is OCRService().engine is mock_rapidocr
 
-    def test_extract_text_no_engine(self):
-        """extract_text returns empty string when engine not initialized."""
-        from app.services.ocr import OCRService
+    def test_init_failure(self, monkeypatch):
+        """A RapidOCR init failure surfaces as OCRError."""
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", None)
+        stub = SimpleNamespace(RapidOCR=MagicMock(side_effect=Exception("Init failed")))
+        monkeypatch.setitem(sys.modules, "rapidocr_onnxruntime", stub)
 
-        with patch("app.services.ocr.service.RapidOCR", side_effect=Exception("Failed")):
-            service = OCRService()
-            image = Image.new("RGB", (100, 100))
+        with pytest.raises(OCRError):
+            _ = OCRService().engine
 
-            result = service.extract_text(image)
+    def test_extract_text_success(self, mock_rapidocr, monkeypatch, sample_image):
+        """extract_text returns formatted text with bounding boxes."""
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", mock_rapidocr)
+        service = OCRService()
 
-            assert result == ""
+        result = service.extract_text(sample_image)
 
-    def test_extract_text_no_image(self, mock_rapidocr):
-        """extract_text returns empty string for None image."""
-        from app.services.ocr import OCRService
+        assert "[0, 0, 100, 20] Hello World" in result
+        assert "[0, 30, 150, 50] Test Text" in result
+
+    def test_extract_text_no_engine(self, monkeypatch, sample_image):
+        """extract_text raises OCRError when the engine can't be loaded."""
+        monkeypatch.setattr("app.services.ocr.service._get_engine", MagicMock(side_effect=OCRError("Failed")))
 
-        with patch("app.services.ocr.service.RapidOCR", return_value=mock_rapidocr):
-            service = OCRService()
+        with pytest.raises(OCRError):
+            OCRService().extract_text(sample_image)
 
-            result = service.extract_text(None)
+    def test_extract_text_no_image(self, mock_rapidocr, monkeypatch):
+        """extract_text returns empty string for None image."""
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", mock_rapidocr)
+        service = OCRService()
 
-            assert result == ""
+        result = service.extract_text(None)
 
-    def test_extract_text_no_results(self, mock_rapidocr):
-        """extract_text handles empty OCR results."""
-        from app.services.ocr import OCRService
+        assert result == ""
 
+    def test_extract_text_no_results(self, mock_rapidocr, monkeypatch, sample_image):
+        """extract_text handles empty OCR results."""
         mock_rapidocr.return_value = (None, None)
 
-        with patch("app.services.ocr.service.RapidOCR", return_value=mock_rapidocr):
-            service = OCRService()
-            image = Image.new("RGB", (100, 100))
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", mock_rapidocr)
+        service = OCRService()
 
-            result = service.extract_text(image)
+        result = service.extract_text(sample_image)
 
-            assert result == ""
-
-    def test_extract_text_exception(self, mock_rapidocr):
-        """extract_text handles OCR exceptions."""
-        from app.services.ocr import OCRService
+        assert result == ""
 
+    def test_extract_text_exception(self, mock_rapidocr, monkeypatch, sample_image):
+        """Engine exceptions surface as OCRError."""
         mock_rapidocr.side_effect = Exception("OCR failed")
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", mock_rapidocr)
 
-        with patch("app.services.ocr.service.RapidOCR") as MockOCR:
-            MockOCR.return_value = mock_rapidocr
-            service = OCRService()
-            service.engine = mock_rapidocr
-            image = Image.new("RGB", (100, 100))
-
-            result = service.extract_text(image)
-
-            assert result == ""
+        with pytest.raises(OCRError):
+            OCRService().extract_text(sample_image)
 
     @pytest.mark.asyncio
-    async def test_extract_text_async(self, mock_rapidocr):
+    async def test_extract_text_async(self, mock_rapidocr, monkeypatch, sample_image):
         """extract_text_async runs OCR in executor."""
-        from app.services.ocr import OCRService
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", mock_rapidocr)
+        service = OCRService()
 
-        with patch("app.services.ocr.service.RapidOCR", return_value=mock_rapidocr):
-            service = OCRService()
-            image = Image.new("RGB", (200, 100))
+        result = await service.extract_text_async(sample_image)
 
-            result = await service.extract_text_async(image)
-
-            assert "Hello World" in result
+        assert "Hello World" in result
 
     @pytest.mark.asyncio
-    async def test_extract_text_async_none_image(self, mock_rapidocr):
+    async def test_extract_text_async_none_image(self, mock_rapidocr, monkeypatch):
         """extract_text_async returns empty for None image."""
-        from app.services.ocr import OCRService
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", mock_rapidocr)
+        service = OCRService()
+
+        result = await service.extract_text_async(None)
+
+        assert result == ""
+
+
+    async def test_extract_text_async_uses_dedicated_pool(self, mock_rapidocr, monkeypatch):
+        """extract_text_async runs on the OCR pool, not the loop's default executor."""
+        threads = []
+        mock_rapidocr.side_effect = lambda arr: threads.append(threading.current_thread().name) or (None, None)
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", mock_rapidocr)
+
+        await OCRService().extract_text_async(Image.new("RGB", (20, 10)))
+
+        assert threads[0].startswith("ocr")
+
+
+    async def test_extract_text_async_keeps_loop_responsive(self, mock_rapidocr, monkeypatch):
+        """The event loop keeps running while concurrent OCR calls are blocked inside the engine."""
+        loop, started = asyncio.get_running_loop(), asyncio.Event()
+        release, released = threading.Event(), []
+
+        def _blocking_engine(arr):
+            loop.call_soon_threadsafe(started.set)
+            released.append(release.wait(1.0))
+            return None, None
+
+        mock_rapidocr.side_effect = _blocking_engine
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", mock_rapidocr)
+        service, image = OCRService(), Image.new("RGB", (20, 10))
 
-        with patch("app.services.ocr.service.RapidOCR", return_value=mock_rapidocr):
-            service = OCRService()
+        calls = asyncio.gather(service.extract_text_async(image), service.extract_text_async(image))
+        await asyncio.wait_for(started.wait(), timeout=1.0)
+        # Only reachable from the loop thread; an engine running on the loop would time out in _blocking_engine instead
+        release.set()
+        await calls
 
-            result = await service.extract_text_async(None)
+        assert released == [True, True]
 
-            assert result == ""
+    async def test_extract_text_uses_process_pool_when_configured(self, mock_rapidocr, monkeypatch):
+        """use_processes ships raw pixels to the process pool instead of the OCR thread pool."""
+        threads = []
+        mock_rapidocr.side_effect = lambda arr: threads.append(threading.current_thread().name) or (None, None)
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", mock_rapidocr)
+        # Stand-in executor: real worker processes would each load their own engine
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="procpool") as pool:
+            monkeypatch.setattr("app.services.ocr.service._get_procpool", lambda: pool)
+
+            await OCRService(use_processes=True).extract_text_async(Image.new("RGB", (20, 10)))
+
+        assert threads[0].startswith("procpool")
+
+    def test_extract_bytes_round_trips_image(self, mock_rapidocr, monkeypatch):
+        """The process entry point rebuilds the frame from raw bytes."""
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", mock_rapidocr)
+        image = Image.new("RGB", (4, 2), color=(255, 0, 0))
+
+        result = _extract_bytes(image.tobytes(), image.mode, image.size, 1920)
+
+        assert "Hello World" in result
+        (arr,), _ = mock_rapidocr.call_args
+        assert arr.shape == (2, 4, 3)
+        assert arr[0, 0].tolist() == [0, 0, 255]
 
 
 class TestOCRBoundingBoxes:
     """Tests for bounding box formatting."""
 
-    def test_bounding_box_format(self, mock_rapidocr):
+    def test_bounding_box_format(self, mock_rapidocr, monkeypatch, sample_image):
         """extract_text formats bounding boxes correctly."""
-        from app.services.ocr import OCRService
-
-        with patch("app.services.ocr.service.RapidOCR", return_value=mock_rapidocr):
-            service = OCRService()
-            image = Image.new("RGB", (200, 100))
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", mock_rapidocr)
+        service = OCRService()
 
-            result = service.extract_text(image)
+        result = service.extract_text(sample_image)
 
-            # Should contain [x1, y1, x2, y2] format
-            assert "[0, 0, 100, 20]" in result
+        # Should contain [x1, y1, x2, y2] format
+        assert "[0, 0, 100, 20]" in result
 
-    def test_multiple_text_regions(self, mock_rapidocr):
+    def test_multiple_text_regions(self, mock_rapidocr, monkeypatch, sample_image):
         """extract_text handles multiple text regions."""
-        from app.services.ocr import OCRService
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", mock_rapidocr)
+        service = OCRService()
 
-        with patch("app.services.ocr.service.RapidOCR", return_value=mock_rapidocr):
-            service = OCRService()
-            image = Image.new("RGB", (200, 100))
+        result = service.extract_text(sample_image)
+        lines = result.split("\n")
 
-            result = service.extract_text(image)
-            lines = result.split("\n")
+        assert len(lines) == 2
 
-            assert len(lines) == 2
-
-    def test_empty_text_region_skipped(self, mock_rapidocr):
+    def test_empty_text_region_skipped(self, mock_rapidocr, monkeypatch, sample_image):
         """extract_text skips regions with empty text."""
-        from app.services.ocr import OCRService
-
         mock_rapidocr.return_value = (
             [
                 [[[0, 0], [100, 0], [100, 20], [0, 20]], "Valid", 0.95],
@@ -159,98 +221,169 @@ class TestOCRBoundingBoxes:
             None,
         )
 
-        with patch("app.services.ocr.service.RapidOCR", return_value=mock_rapidocr):
-            service = OCRService()
-            image = Image.new("RGB", (200, 100))
-
-            result = service.extract_text(image)
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", mock_rapidocr)
+        service = OCRService()
 
-            assert "Valid" in result
-            assert result.count("\n") == 0  # Only one valid line
+        result = service.extract_text(sample_image)
 
+        assert "Valid" in result
+        assert result.count("\n") == 0  # Only one valid line
 
-class TestOCRImageFormats:
-    """Tests for different image formats."""
 
-    def test_extract_text_rgba_image(self, mock_rapidocr):
-        """extract_text handles RGBA images."""
-        from app.services.ocr import OCRService
+    def test_extract_text_many_regions_join(self, mock_rapidocr, monkeypatch):
+        """extract_text emits one line per region for screenshot-sized result sets."""
+        regions = [[[[0, i], [10, i], [10, i + 5], [0, i + 5]], f"line {i}", 0.9] for i in range(500)]
+        mock_rapidocr.return_value = (regions, None)
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", mock_rapidocr)
 
-        with patch("app.services.ocr.service.RapidOCR", return_value=mock_rapidocr):
-            service = OCRService()
-            image = Image.new("RGBA", (100, 100), color=(255, 0, 0, 128))
+        lines = OCRService().extract_text(Image.new("RGB", (100, 600))).split("\n")
 
-            result = service.extract_text(image)
+        assert len(lines) == 500
+        assert lines[-1] == "[0, 499, 10, 504] line 499"
 
-            assert "Hello World" in result
 
-    def test_extract_text_grayscale_image(self, mock_rapidocr):
-        """extract_text handles grayscale images."""
-        from app.services.ocr import OCRService
+    @pytest.mark.parametrize("inv_scale", [1.0, 2.0833])
+    def test_box_rects_matches_reference(self, inv_scale):
+        """Vectorized box reduction matches per-polygon int(min/max * scale)."""
+        rng = np.random.default_rng(0)
+        boxes = rng.uniform(0, 1920, size=(300, 4, 2)).tolist()
+        expected = [
+            [int(min(p[0] for p in b) * inv_scale), int(min(p[1] for p in b) * inv_scale),
+             int(max(p[0] for p in b) * inv_scale), int(max(p[1] for p in b) * inv_scale)]
+            for b in boxes
+        ]
 
-        with patch("app.services.ocr.service.RapidOCR", return_value=mock_rapidocr):
-            service = OCRService()
-            image = Image.new("L", (100, 100), color=128)
+        assert _box_rects(boxes, inv_scale).tolist() == expected
 
-            result = service.extract_text(image)
 
-            assert "Hello World" in result
+class TestOCRImageFormats:
+    """Tests for different image formats."""
 
-    def test_extract_text_large_image(self, mock_rapidocr):
+    @pytest.mark.parametrize(
+        ("mode", "size", "color"),
+        [
+            pytest.param("RGBA", (100, 100), (255, 0, 0, 128), id="rgba"),
+            pytest.param("L", (100, 100), 128, id="grayscale"),
+            pytest.param("RGB", (10, 10), 0, id="small"),
+        ],
+    )
+    def test_extract_text_image_modes(self, mock_rapidocr, monkeypatch, mode, size, color):
+        """extract_text handles RGBA, grayscale and very small images."""
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", mock_rapidocr)
+        service = OCRService()
+
+        result = service.extract_text(Image.new(mode, size, color=color))
+
+        assert "Hello World" in result
+
+    @pytest.mark.parametrize(
+        ("mode", "color", "expected_pixel"),
+        [
+            pytest.param("RGB", (255, 0, 0), [0, 0, 255], id="rgb_to_bgr"),
+            pytest.param("RGBA", (255, 0, 0, 128), [255, 0, 0, 128], id="rgba_passthrough"),
+            pytest.param("L", 128, 128, id="grayscale_passthrough"),
+            pytest.param("P", 0, [0, 0, 0], id="palette_to_bgr"),
+        ],
+    )
+    def test_extract_text_engine_input(self, mock_rapidocr, monkeypatch, mode, color, expected_pixel):
+        """extract_text hands the engine a contiguous uint8 array in a layout it accepts."""
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", mock_rapidocr)
+        OCRService().extract_text(Image.new(mode, (4, 2), color=color))
+
+        (arr,), _ = mock_rapidocr.call_args
+        assert isinstance(arr, np.ndarray)
+        assert arr.dtype == np.uint8
+        assert arr.flags["C_CONTIGUOUS"]
+        assert arr[0, 0].tolist() == expected_pixel
+
+    def test_engine_array_matches_channel_reversal(self):
+        """The packed BGR buffer equals reversing the RGB array's channels, pixel for pixel."""
+        rgb = np.random.default_rng(0).integers(0, 256, size=(2160, 3840, 3), dtype=np.uint8)
+
+        arr = _to_engine_array(Image.fromarray(rgb))
+
+        assert arr.shape == rgb.shape
+        assert np.array_equal(arr, rgb[..., ::-1])
+
+    def test_extract_text_large_image(self, mock_rapidocr, monkeypatch, large_rgb_image):
         """extract_text handles large images."""
-        from app.services.ocr import OCRService
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", mock_rapidocr)
+        service = OCRService()
+
+        result = service.extract_text(large_rgb_image)
+
+        assert isinstance(result, str)
+
+    def test_extract_text_downscales_large_image(self, mock_rapidocr, monkeypatch, large_rgb_image):
+        """Frames above max_dim are downscaled for the engine and boxes map back to original pixels."""
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", mock_rapidocr)
+        result = OCRService(max_dim=1000).extract_text(large_rgb_image)
+
+        (arr,), _ = mock_rapidocr.call_args
+        assert arr.shape[:2] == (750, 1000)
+        # Engine boxes are in the 0.25x frame
+        assert "[0, 0, 400, 80] Hello World" in result
+        assert "[0, 120, 600, 200] Test Text" in result
 
-        with patch("app.services.ocr.service.RapidOCR", return_value=mock_rapidocr):
-            service = OCRService()
-            image = Image.new("RGB", (4000, 3000))
+    def test_extract_text_ndarray_passthrough(self, mock_rapidocr, monkeypatch):
+        """BGR arrays reach the engine as-is: no channel reversal and no copy."""
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", mock_rapidocr)
+        frame = np.zeros((2, 4, 3), dtype=np.uint8)
+        frame[0, 0] = (1, 2, 3)
 
-            result = service.extract_text(image)
+        result = OCRService().extract_text(frame)
 
-            assert isinstance(result, str)
+        (arr,), _ = mock_rapidocr.call_args
+        assert arr is frame
+        assert "[0, 0, 100, 20] Hello World" in result
 
-    def test_extract_text_small_image(self, mock_rapidocr):
-        """extract_text handles very small images."""
-        from app.services.ocr import OCRService
+    def test_extract_text_ndarray_downscales(self, mock_rapidocr, monkeypatch):
+        """Large arrays are area-downscaled with cv2 and boxes map back to original pixels."""
+        pytest.importorskip("cv2")
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", mock_rapidocr)
 
-        with patch("app.services.ocr.service.RapidOCR", return_value=mock_rapidocr):
-            service = OCRService()
-            image = Image.new("RGB", (10, 10))
+        result = OCRService(max_dim=1000).extract_text(np.zeros((3000, 4000, 3), dtype=np.uint8))
 
-            result = service.extract_text(image)
+        (arr,), _ = mock_rapidocr.call_args
+        assert arr.shape == (750, 1000, 3)
+        assert "[0, 0, 400, 80] Hello World" in result
 
-            assert isinstance(result, str)
+    def test_decode_image(self):
+        """decode_image yields a BGR uint8 array and rejects undecodable bytes."""
+        pytest.importorskip("cv2")
+        buf = io.BytesIO()
+        Image.new("RGB", (4, 2), color=(255, 0, 0)).save(buf, format="PNG")
+
+        arr = decode_image(buf.getvalue())
+
+        assert arr.shape == (2, 4, 3)
+        assert arr[0, 0].tolist() == [0, 0, 255]
+        with pytest.raises(OCRError):
+            decode_image(b"not an image")
 
 
 class TestOCRAsync:
     """Tests for async OCR operations."""
 
     @pytest.mark.asyncio
-    async def test_extract_text_async_concurrent(self, mock_rapidocr):
+    async def test_extract_text_async_concurrent(self, mock_rapidocr, monkeypatch, sample_image):
         """extract_text_async can run concurrently."""
-        import asyncio
-
-        from app.services.ocr import OCRService
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", mock_rapidocr)
+        service = OCRService()
 
-        with patch("app.services.ocr.service.RapidOCR", return_value=mock_rapidocr):
-            service = OCRService()
-            image = Image.new("RGB", (100, 100))
+        # Run multiple async extractions
+        tasks = [service.extract_text_async(sample_image) for _ in range(5)]
+        results = await asyncio.gather(*tasks)
 
-            # Run multiple async extractions
-            tasks = [service.extract_text_async(image) for _ in range(5)]
-            results = await asyncio.gather(*tasks)
-
-            assert all("Hello World" in r for r in results)
+        assert all("Hello World" in r for r in results)
 
     @pytest.mark.asyncio
-    async def test_extract_text_async_preserves_result(self, mock_rapidocr):
+    async def test_extract_text_async_preserves_result(self, mock_rapidocr, monkeypatch, sample_image):
         """extract_text_async preserves result from sync method."""
-        from app.services.ocr import OCRService
-
-        with patch("app.services.ocr.service.RapidOCR", return_value=mock_rapidocr):
-            service = OCRService()
-            image = Image.new("RGB", (200, 100))
+        monkeypatch.setattr("app.services.ocr.service._ENGINE", mock_rapidocr)
+        service = OCRService()
 
-            sync_result = service.extract_text(image)
-            async_result = await service.extract_text_async(image)
+        sync_result = service.extract_text(sample_image)
+        async_result = await service.extract_text_async(sample_image)
 
-            assert sync_result == async_result
+        assert sync_result == async_result
@@ -8,6 +8,24 @@ import pytest
 from app.services.audio.speaker_detection import SpeakerDetectionService, SpeakerProfile
 
 
+class _EmbStub:
+    """Stands in for a pyannote embedding tensor: .cpu().numpy().flatten() yields the vector."""
+
+    __slots__ = ("_v",)
+
+    def __init__(self, v):
+        self._v = v
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self
+
+    def flatten(self):
+        return self._v
+
+
 class TestSpeakerDetectionService:
     """Tests for fast speaker detection."""
 
@@ -16,7 +34,7 @@ class TestSpeakerDetectionService:
         """Mock pyannote Inference model."""
         model = MagicMock()
         # Return normalized embeddings
-        model.return_value = MagicMock(cpu=lambda: MagicMock(numpy=lambda: MagicMock(flatten=lambda: np.array([0.6, 0.8]))))
+        model.return_value = _EmbStub(np.array([0.6, 0.8], dtype=np.float32))
         return model
 
     def test_init(self):
@@ -25,46 +43,38 @@ class TestSpeakerDetectionService:
         assert service._model is None
         assert service._next_speaker_id == 0
 
-    def test_detect_speaker_new_speaker(self, mock_embedding_model):
+    def test_detect_speaker_new_speaker(self, mock_embedding_model, sample_audio):
         """detect_speaker creates new speaker for first audio."""
         with patch("pyannote.audio.Inference", return_value=mock_embedding_model):
             service = SpeakerDetectionService()
-            audio = np.random.randn(16000).astype(np.float32)  # 1 second
             
-            speaker_id = service.detect_speaker(audio, sample_rate=16000, source="system")
+            speaker_id = service.detect_speaker(sample_audio, sample_rate=16000, source="system")
             
             assert speaker_id == "Speaker 1"
             assert service.get_speaker_count("system") == 1
 
-    def test_detect_speaker_same_speaker(self, mock_embedding_model):
+    def test_detect_speaker_same_speaker(self, mock_embedding_model, sample_audio):
         """detect_speaker recognizes same speaker with similar embedding."""
         with patch("pyannote.audio.Inference", return_value=mock_embedding_model):
             service = SpeakerDetectionService()
-            audio1 = np.random.randn(16000).astype(np.float32)
-            audio2 = np.random.randn(16000).astype(np.float32)
             
             # Mock to return very similar embeddings
             embeddings = [
                 np.array([0.6, 0.8]),
                 np.array([0.62, 0.78])  # Very similar
             ]
-            mock_embedding_model.side_effect = [
-                MagicMock(cpu=lambda: MagicMock(numpy=lambda: MagicMock(flatten=lambda: e)))
-                for e in embeddings
-            ]
+            mock_embedding_model.side_effect = [_EmbStub(e) for e in embeddings]
             
-            speaker1 = service.detect_speaker(audio1, source="system")
-            speaker2 = service.detect_speaker(audio2, source="system")
+            speaker1 = service.detect_speaker(sample_audio, source="system")
+            speaker2 = service.detect_speaker(sample_audio, source="system")
             
             assert speaker1 == speaker2  # Same speaker detected
             assert service.get_speaker_count("system") == 1
 
-    def test_detect_speaker_different_speakers(self):
+    def test_detect_speaker_different_speakers(self, sample_audio):
         """detect_speaker creates new speaker for different embedding."""
         with patch("pyannote.audio.Inference") as mock_inference:
             service = SpeakerDetectionService()
-            audio1 = np.random.randn(16000).astype(np.float32)
-            audio2 = np.random.randn(16000).astype(np.float32)
             
             # Mock to return very different embeddings (orthogonal = cosine similarity ~0)
             def mock_call(audio_dict):
@@ -78,27 +88,24 @@ class TestSpeakerDetectionService:
                 else:
                     embedding = np.array([0.0, 1.0])
                 
-                result = MagicMock()
-                result.cpu.return_value.numpy.return_value.flatten.return_value = embedding
-                return result
+                return _EmbStub(embedding)
             
             mock_inference.return_value = mock_call
             
-            speaker1 = service.detect_speaker(audio1, source="system")
-            speaker2 = service.detect_speaker(audio2, source="system")
+            speaker1 = service.detect_speaker(sample_audio, source="system")
+            speaker2 = service.detect_speaker(sample_audio, source="system")
             
             assert speaker1 == "Speaker 1"
             assert speaker2 == "Speaker 2"
             assert service.get_speaker_count("system") == 2
 
-    def test_detect_speaker_multiple_sources(self, mock_embedding_model):
+    def test_detect_speaker_multiple_sources(self, mock_embedding_model, sample_audio):
         """detect_speaker tracks speakers separately per source."""
         with patch("pyannote.audio.Inference", return_value=mock_embedding_model):
             service = SpeakerDetectionService()
-            audio = np.random.randn(16000).astype(np.float32)
             
-            speaker1 = service.detect_speaker(audio, source="system")
-            speaker2 = service.detect_speaker(audio, source="user")
+            speaker1 = service.detect_speaker(sample_audio, source="system")
+            speaker2 = service.detect_speaker(sample_audio, source="user")
             
             assert speaker1 == "Speaker 1"
             assert speaker2 == "Speaker 2"  # Different source = new speaker
@@ -106,37 +113,33 @@ class TestSpeakerDetectionService:
             assert service.get_speaker_count("user") == 1
             assert service.get_speaker_count() == 2
 
-    def test_detect_speaker_short_audio(self, mock_embedding_model):
+    def test_detect_speaker_short_audio(self, mock_embedding_model, short_audio):
         """detect_speaker handles short audio gracefully."""
         with patch("pyannote.audio.Inference", return_value=mock_embedding_model):
             service = SpeakerDetectionService()
-            short_audio = np.random.randn(1000).astype(np.float32)  # 0.0625 seconds
-            
             # Should return default for short audio
             speaker_id = service.detect_speaker(short_audio, source="system")
             assert speaker_id == "Speaker 1"
 
-    def test_reset_all(self, mock_embedding_model):
+    def test_reset_all(self, mock_embedding_model, sample_audio):
         """reset clears all speaker profiles."""
         with patch("pyannote.audio.Inference", return_value=mock_embedding_model):
             service = SpeakerDetectionService()
-            audio = np.random.randn(16000).astype(np.float32)
             
-            service.detect_speaker(audio, source="system")
+            service.detect_speaker(sample_audio, source="system")
             assert service.get_speaker_count() == 1
             
             service.reset()
             assert service.get_speaker_count() == 0
             assert service._next_speaker_id == 0
 
-    def test_reset_source(self, mock_embedding_model):
+    def test_reset_source(self, mock_embedding_model, sample_audio):
         """reset clears speakers for specific source only."""
         with patch("pyannote.audio.Inference", return_value=mock_embedding_model):
             service = SpeakerDetectionService()
-            audio = np.random.randn(16000).astype(np.float32)
             
-            service.detect_speaker(audio, source="system")
-            service.detect_speaker(audio, source="user")
+            service.detect_speaker(sample_audio, source="system")
+            service.detect_speaker(sample_audio, source="user")
             assert service.get_speaker_count() == 2
             
             service.reset(source="system")
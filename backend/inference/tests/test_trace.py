@@ -19,6 +19,12 @@ from app.core.trace import (
 )
 
 
+@pytest.fixture
+def fixed_ctx():
+    """Deterministic context for tests that only need some context, not fresh random IDs."""
+    return TraceContext("a" * 32, "b" * 16)
+
+
 class TestTraceIdGeneration:
     """Test trace and span ID generation."""
 
@@ -104,22 +110,20 @@ class TestContextVars:
         """Clear trace context before each test."""
         clear_trace_context()
 
-    def test_set_and_get_trace_context(self):
+    def test_set_and_get_trace_context(self, fixed_ctx):
         """Should store and retrieve trace context."""
-        ctx = TraceContext.new()
-        set_trace_context(ctx)
+        set_trace_context(fixed_ctx)
 
-        assert get_trace_id() == ctx.trace_id
-        assert get_span_id() == ctx.span_id
+        assert get_trace_id() == fixed_ctx.trace_id
+        assert get_span_id() == fixed_ctx.span_id
 
-    def test_current_returns_context(self):
+    def test_current_returns_context(self, fixed_ctx):
         """TraceContext.current() should return stored context."""
-        ctx = TraceContext.new()
-        set_trace_context(ctx)
+        set_trace_context(fixed_ctx)
 
         current = TraceContext.current()
         assert current is not None
-        assert current.trace_id == ctx.trace_id
+        assert current.trace_id == fixed_ctx.trace_id
 
     def test_current_returns_none_if_not_set(self):
         """TraceContext.current() should return None if not set."""
@@ -1,8 +1,25 @@
 """Tests for TranscriptionService."""
 
+import hashlib
+import io
+import sys
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
 import numpy as np
+import pytest
+
+from app.core import TranscriptionError, VADError
+from app.services.audio import StreamingTranscriber, TranscriptionService, VADService, vad
+from app.services.constants import SAMPLES_PER_SECOND, WHISPER_BATCH_MIN_SECONDS, WHISPER_BATCH_SIZE
+
+
+@pytest.fixture(scope="module")
+def transcription_service(_whisper_model):
+    """One TranscriptionService per module with the shared Whisper mock preloaded, so no model load is attempted."""
+    service = TranscriptionService()
+    service._model = _whisper_model
+    return service
 
 
 class TestTranscriptionService:
@@ -11,102 +28,234 @@ class TestTranscriptionService:
     def test_init(self, mock_whisper_model):
         """TranscriptionService initializes Whisper model."""
         with patch("app.services.audio.transcription.WhisperModel", return_value=mock_whisper_model):
-            from app.services.audio.transcription import TranscriptionService
-
             service = TranscriptionService(model_size="tiny", device="cpu")
             assert service.model is not None
 
-    def test_transcribe_success(self, mock_whisper_model):
-        """transcribe returns text from audio."""
-        with patch("app.services.audio.transcription.WhisperModel", return_value=mock_whisper_model):
-            from app.services.audio.transcription import TranscriptionService
-
-            service = TranscriptionService()
-
-            audio = np.zeros(16000, dtype=np.float32)
-            text, confidence = service.transcribe(audio)
-
-            assert text == "Hello, this is a test."
-            mock_whisper_model.transcribe.assert_called_once()
-
-    def test_transcribe_with_language(self, mock_whisper_model):
-        """transcribe passes language hint."""
-        with patch("app.services.audio.transcription.WhisperModel", return_value=mock_whisper_model):
-            from app.services.audio.transcription import TranscriptionService
-
-            service = TranscriptionService()
-
-            audio = np.zeros(16000, dtype=np.float32)
-            service.transcribe(audio, language="en")
-
-            call_kwargs = mock_whisper_model.transcribe.call_args.kwargs
-            assert call_kwargs.get("language") == "en"
-
-    def test_transcribe_empty_result(self):
-        """transcribe handles empty segments."""
-        mock_model = MagicMock()
-        mock_model.transcribe = MagicMock(return_value=([], MagicMock()))
-
-        with patch("app.services.audio.transcription.WhisperModel", return_value=mock_model):
-            from app.services.audio.transcription import TranscriptionService
-
-            service = TranscriptionService()
-
-            audio = np.zeros(16000, dtype=np.float32)
-            text, _ = service.transcribe(audio)
-
-            assert text == ""
+    @pytest.mark.parametrize("lang", [None, "en"])
+    def test_transcribe_success(self, transcription_service, mock_whisper_model, sample_audio, lang):
+        """transcribe returns text from audio and passes the language hint through."""
+        text, confidence = transcription_service.transcribe(sample_audio, lang=lang)
+
+        assert text == "Hello, this is a test."
+        assert confidence == 0.98
+        mock_whisper_model.transcribe.assert_called_once()
+        assert mock_whisper_model.transcribe.call_args.kwargs["language"] == lang
+
+    @pytest.mark.parametrize(
+        ("texts", "expected"),
+        [
+            pytest.param([], "", id="no-segments"),
+            pytest.param(["Hello,", "world. "], "Hello, world.", id="joined"),
+        ],
+    )
+    def test_transcribe_segments(self, transcription_service, mock_whisper_model, sample_audio, texts, expected):
+        """transcribe joins segment text and strips the ends."""
+        mock_whisper_model.transcribe.return_value = ([SimpleNamespace(text=t) for t in texts], SimpleNamespace())
+
+        text, _ = transcription_service.transcribe(sample_audio)
+
+        assert text == expected
+
+    def test_transcribe_long_audio_uses_batched_pipeline(self, mock_whisper_model):
+        """Audio longer than one Whisper window goes through the batched pipeline, not model.transcribe."""
+        service = TranscriptionService()
+        service._model = mock_whisper_model
+        service._batched = MagicMock()
+        service._batched.transcribe.return_value = ([SimpleNamespace(text="a"), SimpleNamespace(text="b")], SimpleNamespace())
+
+        text, confidence = service.transcribe(np.zeros((WHISPER_BATCH_MIN_SECONDS + 1) * SAMPLES_PER_SECOND, np.float32))
+
+        assert (text, confidence) == ("a b", 1.0)
+        assert service._batched.transcribe.call_args.kwargs["batch_size"] == WHISPER_BATCH_SIZE
+        mock_whisper_model.transcribe.assert_not_called()
+
+    def test_warmup_runs_one_unfiltered_decode(self, transcription_service, mock_whisper_model):
+        """warmup decodes a silent second with VAD off so the encoder actually runs."""
+        transcription_service.warmup()
+
+        (audio,), kwargs = mock_whisper_model.transcribe.call_args
+        assert audio.shape == (SAMPLES_PER_SECOND,)
+        assert kwargs["vad_filter"] is False
+
+    def test_transcribe_model_error(self, transcription_service, mock_whisper_model, sample_audio):
+        """Model failures surface as TranscriptionError."""
+        mock_whisper_model.transcribe.side_effect = RuntimeError("decode failed")
+
+        with pytest.raises(TranscriptionError):
+            transcription_service.transcribe(sample_audio)
+
+
+def _pass(*words):
+    """One decoder pass: (start, end, text) triples as a single segment with word timestamps."""
+    return [SimpleNamespace(words=[SimpleNamespace(start=s, end=e, word=w) for s, e, w in words])], SimpleNamespace()
+
+
+class TestStreamingTranscriber:
+    """Tests for LocalAgreement-2 incremental transcription."""
+
+    def test_commits_words_two_passes_agree_on(self, transcription_service, mock_whisper_model, short_audio):
+        """Words surface mid-stream once two passes agree, before any end-of-speech flush."""
+        mock_whisper_model.transcribe.side_effect = [
+            _pass((0.0, 0.4, " Hello"), (0.5, 0.9, " there")),
+            _pass((0.0, 0.4, " Hello"), (0.5, 0.9, " there,"), (1.0, 1.4, " general")),
+            _pass((1.0, 1.4, " general"), (1.5, 1.9, " Kenobi")),
+        ]
+        stream = StreamingTranscriber(transcription_service)
+        stream.insert(short_audio)
+
+        assert stream.process() == []
+        assert [w.text for w in stream.process()] == [" Hello", " there,"]
+        assert [w.text for w in stream.process()] == [" general"]
+        assert [w.text for w in stream.finish()] == [" Kenobi"]
+        assert mock_whisper_model.transcribe.call_args.kwargs["initial_prompt"] == "Hello there,"
+
+    def test_drops_repeated_boundary_words(self, transcription_service, mock_whisper_model, short_audio):
+        """A pass that re-emits the committed tail does not commit it twice."""
+        mock_whisper_model.transcribe.side_effect = [
+            _pass((0.0, 0.4, " one"), (0.5, 0.9, " two")),
+            _pass((0.0, 0.4, " one"), (0.5, 0.9, " two")),
+            _pass((0.55, 0.9, " two"), (1.0, 1.4, " three")),
+        ]
+        stream = StreamingTranscriber(transcription_service)
+        stream.insert(short_audio)
+
+        stream.process()
+        stream.process()
+        stream.process()
+
+        assert [w.text for w in stream.finish()] == [" three"]
+
+    def test_finish_decodes_audio_after_last_pass(self, transcription_service, mock_whisper_model, short_audio):
+        """A stream that ends mid-window gets one last pass over the tail instead of dropping it."""
+        mock_whisper_model.transcribe.side_effect = [
+            _pass((0.0, 0.4, " one"), (0.5, 0.9, " two")),
+            _pass((0.0, 0.4, " one"), (0.5, 0.9, " two"), (1.0, 1.4, " three")),
+        ]
+        stream = StreamingTranscriber(transcription_service)
+        stream.insert(short_audio)
+        stream.process()
+        stream.insert(short_audio)
+
+        assert [w.text for w in stream.finish()] == [" one", " two", " three"]
+        assert mock_whisper_model.transcribe.call_count == 2
+        assert stream.finish() == []
+
+    def test_buffer_grows_and_trims_in_place(self, transcription_service, mock_whisper_model):
+        """Chunks land in order past the initial capacity, and a trim keeps exactly the uncommitted tail."""
+        audio = np.arange(40 * SAMPLES_PER_SECOND, dtype=np.float32)
+        chunks = np.split(audio, 40)
+        stream = StreamingTranscriber(transcription_service)
+        for chunk in chunks:
+            stream.insert(chunk)
+
+        assert np.array_equal(stream._audio, audio)
+        mock_whisper_model.transcribe.side_effect = [_pass((0.0, 0.4, " a"), (10.0, 10.5, " b"))] * 2
+        stream.process()
+        stream.process()
+
+        assert stream._offset == 10.5
+        assert np.array_equal(stream._audio, audio[int(10.5 * SAMPLES_PER_SECOND) :])
+
+    def test_model_error(self, transcription_service, mock_whisper_model, short_audio):
+        """Decoder failures surface as TranscriptionError."""
+        mock_whisper_model.transcribe.side_effect = RuntimeError("decode failed")
+        stream = StreamingTranscriber(transcription_service)
+        stream.insert(short_audio)
+
+        with pytest.raises(TranscriptionError):
+            stream.process()
 
 
 class TestVADService:
     """Tests for Silero VAD."""
 
-    def test_init(self, mock_vad_model):
-        """VADService initializes Silero model."""
-        with patch("torch.hub.load", return_value=(mock_vad_model, None)):
-            from app.services.audio.vad import VADService
-
-            service = VADService(threshold=0.5)
-            assert service.model is not None
-            assert service.threshold == 0.5
-
-    def test_detect_speech_positive(self, mock_vad_model):
-        """detect_speech returns True for speech."""
-        mock_vad_model.return_value = MagicMock(item=MagicMock(return_value=0.8))
-
-        with patch("torch.hub.load", return_value=(mock_vad_model, None)):
-            from app.services.audio.vad import VADService
-
-            service = VADService(threshold=0.5)
-
-            audio = np.zeros(512, dtype=np.float32)
-            prob, is_speech = service.detect_speech(audio)
-
-            assert prob == 0.8
-            assert is_speech is True
-
-    def test_detect_speech_negative(self, mock_vad_model):
-        """detect_speech returns False for silence."""
-        mock_vad_model.return_value = MagicMock(item=MagicMock(return_value=0.1))
-
-        with patch("torch.hub.load", return_value=(mock_vad_model, None)):
-            from app.services.audio.vad import VADService
-
-            service = VADService(threshold=0.5)
-
-            audio = np.zeros(512, dtype=np.float32)
-            prob, is_speech = service.detect_speech(audio)
-
-            assert prob == 0.1
-            assert is_speech is False
-
-    def test_reset_state(self, mock_vad_model):
-        """reset_state calls model reset."""
-        with patch("torch.hub.load", return_value=(mock_vad_model, None)):
-            from app.services.audio.vad import VADService
-
-            service = VADService()
-
-            service.reset_state()
-
-            mock_vad_model.reset_states.assert_called()
+    def test_init(self, mock_vad_session):
+        """VADService loads the Silero ONNX model on a single-threaded CPU session."""
+        service = VADService(threshold=0.5)
+
+        assert service.model is not None
+        assert service.threshold == 0.5
+        ort = sys.modules["onnxruntime"]
+        (path,), kwargs = ort.InferenceSession.call_args
+        assert path == "silero_vad.onnx"
+        assert kwargs["providers"] == ["CPUExecutionProvider"]
+        assert kwargs["sess_options"].intra_op_num_threads == 1
+
+    def test_init_failure(self, monkeypatch):
+        """Model load failures surface as VADError."""
+        monkeypatch.setattr("app.services.audio.vad._model_path", MagicMock(side_effect=OSError("offline")))
+
+        with pytest.raises(VADError):
+            VADService().detect_speech(np.zeros(512, dtype=np.float32))
+
+    @pytest.mark.parametrize(("payload", "cached"), [(b"onnx", True), (b"tampered", False)], ids=["match", "mismatch"])
+    def test_model_download_checks_sha256(self, monkeypatch, tmp_path, payload, cached):
+        """The downloaded model is only moved into the cache when it matches the pinned hash."""
+        path = tmp_path / "silero.onnx"
+        urlopen = MagicMock(return_value=io.BytesIO(payload))
+        monkeypatch.setattr(vad, "VAD_MODEL_CACHE", str(path))
+        monkeypatch.setattr(vad, "VAD_ONNX_SHA256", hashlib.sha256(b"onnx").hexdigest())
+        monkeypatch.setattr(vad.urllib.request, "urlopen", urlopen)
+
+        if cached:
+            assert vad._model_path() == str(path)
+        else:
+            with pytest.raises(ValueError, match="checksum"):
+                vad._model_path()
+        assert path.exists() == cached
+        assert not path.with_suffix(".part").exists()
+        assert urlopen.call_args.kwargs["timeout"] > 0
+
+    @pytest.mark.parametrize(("prob", "expected"), [(0.8, True), (0.1, False)], ids=["speech", "silence"])
+    def test_detect_speech(self, mock_vad_session, vad_chunk, prob, expected):
+        """detect_speech compares the model probability against the threshold."""
+        mock_vad_session.run.return_value = (np.array([[prob]]), np.zeros((2, 1, 128), dtype=np.float32))
+
+        assert VADService(threshold=0.5).detect_speech(vad_chunk) == (prob, expected)
+
+    def test_detect_speech_carries_context_and_state(self, mock_vad_session):
+        """Each chunk is fed after the previous chunk's last 64 samples, with the state the last run returned."""
+        frozen = np.frombuffer(np.full(512, 0.25, np.float32).tobytes(), dtype=np.float32)
+        next_state = np.ones((2, 1, 128), dtype=np.float32)
+        mock_vad_session.run.return_value = (np.array([[0.1]]), next_state)
+        service = VADService()
+
+        service.detect_speech(frozen)
+        first = mock_vad_session.run.call_args.args[1]["input"]
+        assert first.shape == (1, 576)
+        service.detect_speech(frozen)
+        feeds = mock_vad_session.run.call_args.args[1]
+
+        assert feeds["input"] is first
+        assert np.all(feeds["input"] == 0.25)
+        assert feeds["state"] is next_state
+        assert feeds["sr"] == 16000
+
+    def test_warmup(self, mock_vad_session):
+        """warmup scores one silent chunk on its own buffers and leaves the live stream's state alone."""
+        service = VADService()
+        service.detect_speech(np.ones(512, dtype=np.float32))
+        state, context = service.model._state, service.model._input[0, :64].copy()
+
+        service.warmup()
+
+        assert mock_vad_session.run.call_count == 2
+        feeds = mock_vad_session.run.call_args.args[1]
+        assert feeds["input"].shape == (1, 576) and not feeds["input"].any()
+        assert service.model._state is state
+        assert np.array_equal(service.model._input[0, :64], context)
+
+    def test_reset_state(self, mock_vad_session):
+        """reset_state clears the recurrent state and the carried context."""
+        seen = []
+        mock_vad_session.run.side_effect = lambda _, feeds: seen.append(
+            {k: np.copy(v) for k, v in feeds.items()}
+        ) or (np.array([[0.9]]), np.ones((2, 1, 128), dtype=np.float32))
+        service = VADService()
+        service.detect_speech(np.ones(512, dtype=np.float32))
+
+        service.reset_state()
+        service.detect_speech(np.ones(512, dtype=np.float32))
+
+        assert not seen[-1]["state"].any()
+        assert not seen[-1]["input"][0, :64].any()
@@ -123,15 +123,19 @@ func (c *Capturer) Start(ctx context.Context) error {
 	return nil
 }
 
+// Device name keywords, matched case-insensitively; built once rather than per classified device.
+var (
+	systemKeywords = [...]string{"blackhole", "vb-cable", "loopback", "monitor", "soundflower"}
+	micKeywords    = [...]string{"microphone", "input", "mic", "built-in"}
+)
+
 func (c *Capturer) classifyDevice(name string) string {
-	systemKeywords := []string{"blackhole", "vb-cable", "loopback", "monitor", "soundflower"}
 	for _, kw := range systemKeywords {
 		if containsIgnoreCase(name, kw) {
 			return "system"
 		}
 	}
 
-	micKeywords := []string{"microphone", "input", "mic", "built-in"}
 	for _, kw := range micKeywords {
 		if containsIgnoreCase(name, kw) {
 			return "user"
@@ -8,6 +8,9 @@
 	// VAD window size - required by Silero VAD model
 	VADWindowSamples = 512
 
+	// Windows with mean power below this (RMS ~ -80 dBFS) are silence without asking the VAD model
+	SilencePowerThreshold = 1e-8
+
 	// Stale state cleanup timeout
 	StaleStateTimeout = 5 * time.Minute
 
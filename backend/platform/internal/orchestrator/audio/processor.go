@@ -88,13 +88,18 @@ func (p *Processor) ProcessChunk(ctx context.Context, chunk audiocap.Chunk) {
 		vadChunk := state.buffer[:VADWindowSamples]
 		state.buffer = state.buffer[VADWindowSamples:]
 
-		audioBytes := Float32ToBytes(vadChunk)
-		prob, isSpeech, err := p.vad.DetectSpeech(ctx, audioBytes, int32(p.cfg.SampleRate))
-		if err != nil {
-			if !errors.Is(err, resilience.ErrOpen) {
-				slog.Debug("VAD error", "error", err)
+		// Digital silence is common between utterances; skip the gRPC round trip for it
+		var prob float32
+		var isSpeech bool
+		if meanPower(vadChunk) >= SilencePowerThreshold {
+			var err error
+			prob, isSpeech, err = p.vad.DetectSpeech(ctx, Float32ToBytes(vadChunk), int32(p.cfg.SampleRate))
+			if err != nil {
+				if !errors.Is(err, resilience.ErrOpen) {
+					slog.Debug("VAD error", "error", err)
+				}
+				continue
 			}
-			continue
 		}
 
 		// Emit VAD event for visualization
@@ -143,6 +148,15 @@ func (p *Processor) Reset() {
 	p.vadState = make(map[string]*vadState)
 }
 
+// meanPower returns the mean squared amplitude of samples.
+func meanPower(samples []float32) float64 {
+	var sum float64
+	for _, s := range samples {
+		sum += float64(s) * float64(s)
+	}
+	return sum / float64(len(samples))
+}
+
 // Float32ToBytes converts float32 samples to bytes.
 func Float32ToBytes(samples []float32) []byte {
 	buf := make([]byte, len(samples)*Float32ByteSize)
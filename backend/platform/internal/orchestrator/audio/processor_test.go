@@ -100,3 +100,34 @@ func TestProcessChunkCreatesState(t *testing.T) {
 	}
 	p.mu.Unlock()
 }
+
+type countingVAD struct {
+	mockVAD
+	calls int
+}
+
+func (c *countingVAD) DetectSpeech(ctx context.Context, audio []byte, sr int32) (float32, bool, error) {
+	c.calls++
+	return c.mockVAD.DetectSpeech(ctx, audio, sr)
+}
+
+func TestProcessChunkSkipsVADOnSilence(t *testing.T) {
+	vad := &countingVAD{mockVAD: mockVAD{prob: 0.9, speech: true}}
+	cfg := Config{SampleRate: 16000, VADThreshold: 0.5, MaxSilenceChunks: 15}
+	var events []bool
+	p := NewProcessor(vad, cfg, func(_ context.Context, _ []float32, _ string) {}, func(_ float32, s bool, _ string) { events = append(events, s) })
+
+	loud := make([]float32, VADWindowSamples)
+	for i := range loud {
+		loud[i] = 0.1
+	}
+	p.ProcessChunk(context.Background(), audiocap.Chunk{Data: make([]float32, VADWindowSamples), DeviceID: "d"})
+	p.ProcessChunk(context.Background(), audiocap.Chunk{Data: loud, DeviceID: "d"})
+
+	if vad.calls != 1 {
+		t.Errorf("DetectSpeech calls = %d, want 1", vad.calls)
+	}
+	if len(events) != 2 || events[0] || !events[1] {
+		t.Errorf("VAD events = %v, want [false true]", events)
+	}
+}
@@ -2,6 +2,7 @@
 package transcript
 
 import (
+	"sort"
 	"strings"
 	"sync"
 	"time"
@@ -91,11 +92,14 @@ func (s *MemoryStore) GetRecent(seconds int) string {
 		}
 	}
 
-	// Add raw entries not yet summarized
-	for _, e := range s.entries {
-		if !e.Timestamp.Before(cutoff) && e.Timestamp.After(s.summarized) {
-			parts = append(parts, strings.ToUpper(e.Source)+": "+e.Text)
-		}
+	// Add raw entries not yet summarized. Entries are appended in time order,
+	// so binary search for the first one inside the window instead of scanning.
+	i := sort.Search(len(s.entries), func(i int) bool {
+		ts := s.entries[i].Timestamp
+		return !ts.Before(cutoff) && ts.After(s.summarized)
+	})
+	for _, e := range s.entries[i:] {
+		parts = append(parts, strings.ToUpper(e.Source)+": "+e.Text)
 	}
 	return strings.Join(parts, "\n")
 }
@@ -4,7 +4,6 @@ Proto compatibility tests - ensure Python and Go use compatible proto definition
 
 import os
 import sys
-import subprocess
 from pathlib import Path
 
 # Add inference to path
@@ -58,9 +57,29 @@ def test_proto_messages_defined():
         assert f"message {msg}" in content, f"Message {msg} not defined in proto"
 
 
+def _generate_python_proto(pb_dir: Path) -> None:
+    """Run protoc in-process (same invocation as `make proto-python`) and fix up the grpc module's import."""
+    from grpc_tools import protoc
+
+    proto_dir = backend_dir / "proto"
+    rc = protoc.main([
+        "",
+        f"-I{proto_dir}",
+        f"--python_out={pb_dir}",
+        f"--grpc_python_out={pb_dir}",
+        str(proto_dir / "cognition.proto"),
+    ])
+    if rc != 0:
+        print(f"Proto generation failed with exit code {rc}")
+        return
+    grpc_file = pb_dir / "cognition_pb2_grpc.py"
+    grpc_file.write_text(grpc_file.read_text().replace("import cognition_pb2", "from app.pb import cognition_pb2"))
+
+
 def test_python_proto_generated():
     """Python proto files are generated."""
     pb_dir = backend_dir / "inference" / "app" / "pb"
+    proto_mtime = (backend_dir / "proto" / "cognition.proto").stat().st_mtime
     
     # These files should exist after running `make proto`
     expected_files = [
@@ -68,20 +87,14 @@ def test_python_proto_generated():
         "cognition_pb2_grpc.py",
     ]
     
-    for fname in expected_files:
-        fpath = pb_dir / fname
-        if not fpath.exists():
-            # Try to generate
-            print(f"Proto file {fname} not found, attempting to generate...")
-            result = subprocess.run(
-                ["make", "proto-python"],
-                cwd=backend_dir,
-                capture_output=True,
-                text=True,
-            )
-            if result.returncode != 0:
-                print(f"Proto generation failed: {result.stderr}")
-            break
+    # Regenerate only when a file is missing or older than the proto
+    stale = [f for f in expected_files if not (pb_dir / f).exists() or (pb_dir / f).stat().st_mtime < proto_mtime]
+    if stale:
+        print(f"Proto files {stale} missing or stale, attempting to generate...")
+        try:
+            _generate_python_proto(pb_dir)
+        except ImportError as e:
+            print(f"grpc_tools not installed (run 'make backend-install' first): {e}")
     
     # Check again after potential generation
     for fname in expected_files:
@@ -114,6 +127,10 @@ def test_python_imports_work():
         if (pb_dir / "cognition_pb2.py").exists():
             sys.path.insert(0, str(backend_dir / "inference"))
             from app.pb import cognition_pb2
+            from google.protobuf.internal import api_implementation
+            
+            # Native parser (upb wheels, or cpp builds); pure Python decodes varints in bytecode
+            assert api_implementation.Type() in ("upb", "cpp"), api_implementation.Type()
             
             # Verify some message types exist
             assert hasattr(cognition_pb2, "TranscribeRequest")